@@ -1,6 +1,12 @@
 from django.contrib import admin
 
-from .models import AnalyticsEvent
+from .models import (
+    AnalyticsEvent,
+    AnalyticsEventRollup,
+    AnalyticsExport,
+    DailyTenantMetrics,
+    ExecutiveSnapshot,
+)
 
 
 @admin.register(AnalyticsEvent)
@@ -8,3 +14,57 @@ class AnalyticsEventAdmin(admin.ModelAdmin):
     list_display = ("event_type", "tenant", "user_id", "timestamp")
     search_fields = ("event_type", "user_id")
     list_filter = ("event_type", "tenant")
+
+
+@admin.register(AnalyticsEventRollup)
+class AnalyticsEventRollupAdmin(admin.ModelAdmin):
+    list_display = ("bucket", "granularity", "event_type", "tenant", "user_id", "count")
+    list_filter = ("granularity", "event_type", "tenant")
+    date_hierarchy = "bucket"
+
+
+@admin.register(DailyTenantMetrics)
+class DailyTenantMetricsAdmin(admin.ModelAdmin):
+    list_display = (
+        "day",
+        "tenant",
+        "patients_created",
+        "appointments",
+        "clinical_records",
+        "lab_results",
+        "payments",
+        "revenue",
+    )
+    list_filter = ("tenant",)
+    date_hierarchy = "day"
+
+
+@admin.register(ExecutiveSnapshot)
+class ExecutiveSnapshotAdmin(admin.ModelAdmin):
+    list_display = (
+        "day",
+        "tenant",
+        "total_patients",
+        "patients_month_to_date",
+        "revenue_month_to_date",
+        "revenue_year_to_date",
+        "appointments_month_to_date",
+        "active_users_30d",
+    )
+    list_filter = ("tenant",)
+    date_hierarchy = "day"
+
+
+@admin.register(AnalyticsExport)
+class AnalyticsExportAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "tenant",
+        "report",
+        "file_format",
+        "status",
+        "row_count",
+        "requested_by",
+    )
+    list_filter = ("status", "report", "tenant")
+    readonly_fields = ("file", "row_count", "completed_at")
@@ -0,0 +1,182 @@
+"""
+Retention and compaction for ``AnalyticsEvent``.
+
+Raw events older than ``ANALYTICS_EVENT_RAW_RETENTION_DAYS`` are folded into
+hourly ``AnalyticsEventRollup`` rows, hourly rows older than
+``ANALYTICS_EVENT_HOURLY_RETENTION_DAYS`` into daily rows, and daily rows
+older than ``ANALYTICS_RETENTION_DAYS`` are expired. Every chunk of
+``ANALYTICS_COMPACTION_CHUNK_SIZE`` source rows is rolled up and deleted in
+its own transaction, so the job never holds long locks on the hot table and
+can stop at any point without losing or double-counting events.
+
+``event_counts`` and ``daily_event_counts`` read raw and compacted rows
+together, so the activity analytics report the same totals before and
+after compaction.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import AnalyticsEvent, AnalyticsEventRollup
+
+GROUP_FIELDS = ("tenant_id", "event_type", "user_id")
+
+
+def _merge_into_rollups(rows, granularity):
+    """Add grouped ``rows`` (``GROUP_FIELDS``, ``period`` and ``n``) to the rollups."""
+    totals = Counter()
+    for row in rows:
+        key = tuple(row[field] for field in GROUP_FIELDS) + (row["period"],)
+        totals[key] += row["n"]
+    if not totals:
+        return
+
+    existing = AnalyticsEventRollup.objects.filter(
+        granularity=granularity,
+        tenant_id__in={key[0] for key in totals},
+        bucket__in={key[3] for key in totals},
+    )
+    by_key = {
+        (rollup.tenant_id, rollup.event_type, rollup.user_id, rollup.bucket): rollup
+        for rollup in existing
+    }
+    updated, created = [], []
+    for key, count in totals.items():
+        rollup = by_key.get(key)
+        if rollup is not None:
+            rollup.count += count
+            updated.append(rollup)
+        else:
+            created.append(
+                AnalyticsEventRollup(
+                    tenant_id=key[0],
+                    event_type=key[1],
+                    user_id=key[2],
+                    granularity=granularity,
+                    bucket=key[3],
+                    count=count,
+                )
+            )
+    AnalyticsEventRollup.objects.bulk_update(updated, ["count"], batch_size=1000)
+    AnalyticsEventRollup.objects.bulk_create(created, batch_size=1000)
+
+
+def _compact(source, bucket, count, granularity, chunk_size):
+    """
+    Roll ``source`` rows into ``granularity`` rollups and delete them, one
+    chunk per transaction. Returns the number of source rows compacted.
+    """
+    compacted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(source.order_by("pk").values_list("pk", flat=True)[:chunk_size])
+            if not ids:
+                return compacted
+            chunk = source.model.objects.filter(pk__in=ids)
+            _merge_into_rollups(
+                chunk.values(*GROUP_FIELDS, period=bucket).annotate(n=count).order_by(),
+                granularity,
+            )
+            deleted, _ = chunk.delete()
+            if deleted != len(ids):
+                # A concurrent run compacted part of this chunk first.
+                transaction.set_rollback(True)
+                continue
+        compacted += deleted
+
+
+def compact_raw_events(before, chunk_size=None):
+    """Fold raw events older than ``before`` into hourly rollups."""
+    return _compact(
+        AnalyticsEvent.objects.filter(timestamp__lt=before),
+        TruncHour("timestamp"),
+        Count("pk"),
+        "hour",
+        chunk_size or settings.ANALYTICS_COMPACTION_CHUNK_SIZE,
+    )
+
+
+def compact_hourly_rollups(before, chunk_size=None):
+    """Fold hourly rollups older than ``before`` into daily rollups."""
+    return _compact(
+        AnalyticsEventRollup.objects.filter(granularity="hour", bucket__lt=before),
+        TruncDay("bucket"),
+        Sum("count"),
+        "day",
+        chunk_size or settings.ANALYTICS_COMPACTION_CHUNK_SIZE,
+    )
+
+
+def expire_daily_rollups(before, chunk_size=None):
+    """Delete daily rollups older than ``before`` in chunks."""
+    chunk_size = chunk_size or settings.ANALYTICS_COMPACTION_CHUNK_SIZE
+    expired = AnalyticsEventRollup.objects.filter(granularity="day", bucket__lt=before)
+    deleted = 0
+    while True:
+        ids = list(expired.values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += AnalyticsEventRollup.objects.filter(pk__in=ids).delete()[0]
+
+
+def compact_events(now=None):
+    """Apply the whole retention policy; returns the rows processed per stage."""
+    now = now or timezone.now()
+    return {
+        "raw_events": compact_raw_events(
+            now - timedelta(days=settings.ANALYTICS_EVENT_RAW_RETENTION_DAYS)
+        ),
+        "hourly_rollups": compact_hourly_rollups(
+            now - timedelta(days=settings.ANALYTICS_EVENT_HOURLY_RETENTION_DAYS)
+        ),
+        "expired_rollups": expire_daily_rollups(
+            now - timedelta(days=settings.ANALYTICS_RETENTION_DAYS)
+        ),
+    }
+
+
+def event_counts(tenant, *fields, since=None):
+    """
+    Event counts for ``tenant`` over raw and compacted events, grouped by
+    ``fields`` (``event_type`` and/or ``user_id``). Returns a ``Counter``
+    keyed by tuples of the field values.
+    """
+    raw = AnalyticsEvent.objects.filter(tenant=tenant)
+    compacted = AnalyticsEventRollup.objects.filter(tenant=tenant)
+    if since is not None:
+        raw = raw.filter(timestamp__gte=since)
+        compacted = compacted.filter(bucket__gte=since)
+
+    totals = Counter()
+    for rows in (
+        raw.values(*fields).annotate(n=Count("pk")).order_by(),
+        compacted.values(*fields).annotate(n=Sum("count")).order_by(),
+    ):
+        for row in rows:
+            totals[tuple(row[field] for field in fields)] += row["n"]
+    return totals
+
+
+def daily_event_counts(tenant, since):
+    """Events per calendar day for ``tenant`` since ``since``, raw and compacted."""
+    totals = Counter()
+    for rows in (
+        AnalyticsEvent.objects.filter(tenant=tenant, timestamp__gte=since)
+        .annotate(day=TruncDate("timestamp"))
+        .values("day")
+        .annotate(n=Count("pk"))
+        .order_by(),
+        AnalyticsEventRollup.objects.filter(tenant=tenant, bucket__gte=since)
+        .annotate(day=TruncDate("bucket"))
+        .values("day")
+        .annotate(n=Sum("count"))
+        .order_by(),
+    ):
+        for row in rows:
+            totals[row["day"]] += row["n"]
+    return totals
@@ -8,6 +8,9 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect
 
+# Subscription plans that include the analytics features.
+ANALYTICS_PLANS = ("professional", "enterprise")
+
 
 def subscription_required(*allowed_plans):
     """
@@ -43,7 +46,7 @@ def analytics_access_required(view_func):
     Convenience decorator for analytics-specific access control.
     Restricts to Professional and Enterprise plans only.
     """
-    return subscription_required("professional", "enterprise")(view_func)
+    return subscription_required(*ANALYTICS_PLANS)(view_func)
 
 
 def admin_or_analytics_access(view_func):
@@ -63,7 +66,7 @@ def admin_or_analytics_access(view_func):
             return redirect("dashboard")
 
         # Check if tenant has analytics subscription
-        if tenant.plan not in ("professional", "enterprise"):
+        if tenant.plan not in ANALYTICS_PLANS:
             messages.error(
                 request,
                 f"Analytics features are only available for Professional and Enterprise plans. "
@@ -0,0 +1,140 @@
+"""
+Vectorised patient demographics.
+
+``patient_demographics`` fetches a tenant's patients once as
+(date_of_birth, gender, count) groups - at most a few tens of thousands of
+rows however many patients there are - and computes exact ages, the age
+histogram, the gender split and the age x gender cross-tab with NumPy in a
+single pass. Age buckets are given as ascending lower edges in years, e.g.
+``(0, 19, 36)`` means 0-18, 19-35 and 36+.
+"""
+import numpy as np
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from patients.models import Patient
+
+UNKNOWN_GENDER = ("", "Not recorded")
+GENDERS = Patient.GENDER_CHOICES + [UNKNOWN_GENDER]
+
+
+def parse_age_edges(value):
+    """
+    Parse comma-separated bucket edges such as ``"0,18,65"``.
+
+    Raises ``ValueError`` unless they are non-negative, strictly ascending
+    whole years.
+    """
+    edges = tuple(int(edge) for edge in str(value).split(","))
+    if not edges or edges[0] < 0 or any(a >= b for a, b in zip(edges, edges[1:])):
+        raise ValueError("Age bucket edges must be ascending non-negative integers")
+    return edges
+
+
+def age_bucket_labels(edges):
+    """Human readable labels for ``edges``: ``["0-18", "19-35", "36+"]``."""
+    labels = [f"{low}-{high - 1}" for low, high in zip(edges, edges[1:])]
+    return labels + [f"{edges[-1]}+"]
+
+
+def exact_ages(birth_dates, today):
+    """
+    Completed years of age on ``today`` for an array of ``datetime64[D]``
+    birth dates: the year difference, minus one if the birthday has not
+    come round yet this year.
+    """
+    years = birth_dates.astype("datetime64[Y]")
+    months = birth_dates.astype("datetime64[M]")
+    month_of_year = (months - years.astype("datetime64[M]")).astype(np.int64) + 1
+    day_of_month = (birth_dates - months.astype("datetime64[D]")).astype(np.int64) + 1
+    birthday_pending = (month_of_year * 100 + day_of_month) > (
+        today.month * 100 + today.day
+    )
+    return (today.year - 1970 - years.astype(np.int64)) - birthday_pending
+
+
+def compute_demographics(birth_dates, genders, counts, edges, today):
+    """
+    Demographics from parallel arrays of birth dates (``datetime64[D]``),
+    gender codes and the number of patients sharing each pair.
+
+    Patients born after ``today`` or younger than the first edge are left
+    out of the age figures but still counted in the gender split.
+    """
+    edges = np.asarray(edges, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    codes = [code for code, _ in GENDERS]
+    # Missing or unexpected codes fall into the trailing "not recorded" column.
+    column = {code: index for index, code in enumerate(codes)}
+    gender_index = np.fromiter(
+        (column.get(code or "", len(codes) - 1) for code in genders),
+        dtype=np.int64,
+        count=len(genders),
+    )
+
+    ages = exact_ages(np.asarray(birth_dates, dtype="datetime64[D]"), today)
+    bucket_index = np.searchsorted(edges, ages, side="right") - 1
+    in_range = bucket_index >= 0
+
+    cells = (
+        np.bincount(
+            bucket_index[in_range] * len(codes) + gender_index[in_range],
+            weights=counts[in_range],
+            minlength=len(edges) * len(codes),
+        )
+        .astype(np.int64)
+        .reshape(len(edges), len(codes))
+    )
+    by_gender = np.bincount(gender_index, weights=counts, minlength=len(codes))
+
+    labels = age_bucket_labels(list(edges))
+    return {
+        "total": int(counts.sum()),
+        "age_distribution": [
+            {
+                "label": label,
+                "min_age": int(edges[index]),
+                "max_age": int(edges[index + 1] - 1)
+                if index + 1 < len(edges)
+                else None,
+                "count": int(cells[index].sum()),
+            }
+            for index, label in enumerate(labels)
+        ],
+        "gender_distribution": [
+            {"gender": code, "label": label, "count": int(by_gender[index])}
+            for index, (code, label) in enumerate(GENDERS)
+        ],
+        "age_by_gender": [
+            {
+                "label": label,
+                "counts": {
+                    code: int(cells[index, position])
+                    for position, code in enumerate(codes)
+                },
+            }
+            for index, label in enumerate(labels)
+        ],
+        "mean_age": (
+            round(float(np.average(ages[in_range], weights=counts[in_range])), 1)
+            if counts[in_range].sum()
+            else None
+        ),
+    }
+
+
+def patient_demographics(queryset, edges=None, today=None):
+    """Demographics of the patients in ``queryset`` (one grouped query)."""
+    edges = edges or settings.ANALYTICS_AGE_BUCKET_EDGES
+    today = today or timezone.now().date()
+    rows = list(
+        queryset.values_list("date_of_birth", "gender")
+        .annotate(n=Count("pk"))
+        .order_by()
+    )
+    birth_dates = np.array([row[0] for row in rows], dtype="datetime64[D]")
+    genders = [row[1] for row in rows]
+    counts = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+    return compute_demographics(birth_dates, genders, counts, edges, today)
@@ -0,0 +1,232 @@
+"""
+CSV / XLSX exports of the analytics reports.
+
+Each report in ``EXPORT_REPORTS`` is a header plus one or more ``values_list``
+querysets whose rows are read with ``.iterator(chunk_size=...)``, so an
+export holds one chunk in memory however many years of data the tenant has.
+Small exports are streamed straight into the response; exports with more
+than ``ANALYTICS_EXPORT_ASYNC_ROWS`` rows are written to the export storage
+by a Celery task and the requesting user is emailed when the file is ready.
+"""
+import csv
+import io
+import logging
+import tempfile
+from datetime import date, datetime
+from itertools import chain
+
+import openpyxl
+from django.conf import settings
+from django.core.files import File
+from django.core.mail import send_mail
+from django.db.models import Count, DateField, IntegerField, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import Appointment
+from billing.models import Payment
+
+from .models import AnalyticsEvent, AnalyticsEventRollup, DailyTenantMetrics
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def export_formats():
+    """File formats a report can be exported in."""
+    return list(CONTENT_TYPES)
+
+
+def _monthly_rollups(tenant, **sums):
+    return (
+        DailyTenantMetrics.objects.filter(tenant=tenant)
+        .annotate(month=TruncMonth("day"))
+        .values_list("month")
+        .annotate(**{name: Sum(field) for name, field in sums.items()})
+        .order_by("month")
+    )
+
+
+def patient_growth_rows(tenant):
+    return [_monthly_rollups(tenant, new_patients="patients_created")]
+
+
+def appointment_distribution_rows(tenant):
+    return [
+        Appointment.objects.filter(tenant=tenant)
+        .annotate(month=TruncMonth("scheduled_for", output_field=DateField()))
+        .values_list("month", "status")
+        .annotate(n=Count("id"))
+        .order_by("month", "status")
+    ]
+
+
+def revenue_by_month_rows(tenant):
+    return [_monthly_rollups(tenant, payments="payments", revenue="revenue")]
+
+
+def top_patients_rows(tenant):
+    return [
+        Payment.objects.filter(tenant=tenant)
+        .values_list("patient_id", "patient__first_name", "patient__last_name")
+        .annotate(payments=Count("id"), total=Sum("amount"))
+        .order_by("-total", "patient_id")
+    ]
+
+
+def activity_timeline_rows(tenant):
+    # Compacted events are older than every raw event, so the two
+    # chronological sequences concatenate into one timeline.
+    return [
+        AnalyticsEventRollup.objects.filter(tenant=tenant)
+        .order_by("bucket", "pk")
+        .values_list("bucket", "granularity", "event_type", "user_id", "count"),
+        AnalyticsEvent.objects.filter(tenant=tenant)
+        .annotate(
+            granularity=Value("event"), events=Value(1, output_field=IntegerField())
+        )
+        .order_by("timestamp", "pk")
+        .values_list("timestamp", "granularity", "event_type", "user_id", "events"),
+    ]
+
+
+EXPORT_REPORTS = {
+    "patient-growth": (["month", "new_patients"], patient_growth_rows),
+    "appointment-distribution": (
+        ["month", "status", "appointments"],
+        appointment_distribution_rows,
+    ),
+    "revenue-by-month": (["month", "payments", "revenue"], revenue_by_month_rows),
+    "top-patients": (
+        ["patient_id", "first_name", "last_name", "payments", "total"],
+        top_patients_rows,
+    ),
+    "activity-timeline": (
+        ["period_start", "granularity", "event_type", "user_id", "events"],
+        activity_timeline_rows,
+    ),
+}
+
+
+def count_rows(report, tenant):
+    """Number of data rows ``report`` would export for ``tenant``."""
+    return sum(queryset.count() for queryset in EXPORT_REPORTS[report][1](tenant))
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if value.tzinfo else value
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        # Keep spreadsheet applications from evaluating names as formulas
+        return "'" + value
+    return value
+
+
+def iter_rows(report, tenant, chunk_size=None):
+    """The header, then every data row of ``report``, fetched in chunks."""
+    chunk_size = chunk_size or settings.ANALYTICS_EXPORT_CHUNK_SIZE
+    header, build = EXPORT_REPORTS[report]
+    yield header
+    for row in chain.from_iterable(
+        queryset.iterator(chunk_size=chunk_size) for queryset in build(tenant)
+    ):
+        yield [_cell(value) for value in row]
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(report, tenant):
+    """CSV lines of ``report``, for a ``StreamingHttpResponse``."""
+    writer = csv.writer(_Echo())
+    return (writer.writerow(row) for row in iter_rows(report, tenant))
+
+
+def write_export(report, tenant, file_format, fileobj):
+    """Write ``report`` to the binary ``fileobj``; returns the data row count."""
+    rows = iter_rows(report, tenant)
+    written = -1  # the header
+    if file_format == "xlsx":
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet(report)
+        for row in rows:
+            sheet.append(row)
+            written += 1
+        workbook.save(fileobj)
+    else:
+        text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+        text.flush()
+        text.detach()
+    return written
+
+
+def export_filename(report, tenant, file_format):
+    return f"{report}-{tenant.subdomain or tenant.id}-{timezone.now():%Y%m%d}.{file_format}"
+
+
+def run_export(export):
+    """Generate the file of a queued ``AnalyticsExport`` and notify its owner."""
+    export.status = "running"
+    export.save(update_fields=["status"])
+    try:
+        with tempfile.TemporaryFile() as fileobj:
+            rows = write_export(
+                export.report, export.tenant, export.file_format, fileobj
+            )
+            fileobj.seek(0)
+            export.file.save(
+                export_filename(export.report, export.tenant, export.file_format),
+                File(fileobj),
+                save=False,
+            )
+    except Exception:
+        logger.exception("Analytics export failed", extra={"export_id": export.id})
+        export.status = "failed"
+        export.completed_at = timezone.now()
+        export.save(update_fields=["status", "completed_at"])
+        raise
+
+    export.status = "ready"
+    export.row_count = rows
+    export.completed_at = timezone.now()
+    export.save(update_fields=["file", "status", "row_count", "completed_at"])
+    notify_export_ready(export)
+    return rows
+
+
+def notify_export_ready(export):
+    """Email the user who requested ``export`` a link to download it."""
+    user = export.requested_by
+    if user is None or not user.email:
+        return
+
+    site_url = getattr(settings, "SITE_URL", "https://your-domain.com")
+    subject = "[ClinicCloud] Your analytics export is ready"
+    message = (
+        f"Hello {user.username},\n\n"
+        f"Your {export.get_report_display()} export ({export.row_count} rows) "
+        f"is ready to download:\n"
+        f"{site_url}{reverse('analytics_export_download', args=[export.id])}\n\n"
+        f"All your exports are listed at {site_url}{reverse('analytics_exports')}\n\n"
+        f"The ClinicCloud Team"
+    )
+    from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@cliniccloud.com")
+    try:
+        send_mail(subject, message, from_email, [user.email], fail_silently=False)
+    except Exception as e:
+        logger.error(f"Failed to send analytics export email: {str(e)}")
@@ -0,0 +1,81 @@
+"""
+HyperLogLog sketches for approximate distinct counts.
+
+A sketch of ``2 ** PRECISION`` one-byte registers estimates the number of
+distinct integers added to it with a relative standard error of
+``1.04 / sqrt(2 ** PRECISION)`` - about 0.81% at the default precision of
+14, i.e. roughly two thirds of estimates fall within 0.81% of the true
+count and 95% within 1.6%. Counts below about 40,000 use linear counting
+and are usually much closer. Sketches built with the same precision merge
+losslessly (register-wise maximum), so per-day sketches can answer
+"distinct over any window" by merging the days in that window.
+"""
+import math
+import zlib
+
+import numpy as np
+
+PRECISION = 14
+RELATIVE_ERROR = 1.04 / math.sqrt(2**PRECISION)
+
+
+def _hash64(values):
+    """SplitMix64 finaliser: spreads sequential ids over all 64 bits."""
+    with np.errstate(over="ignore"):
+        z = np.asarray(values, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch over non-negative integer ids."""
+
+    def __init__(self, precision=PRECISION, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            registers = np.zeros(self.size, dtype=np.uint8)
+        self.registers = registers
+
+    def add(self, values):
+        """Add an iterable of integer ids to the sketch."""
+        hashes = _hash64(np.fromiter(values, dtype=np.uint64))
+        if not hashes.size:
+            return
+        value_bits = 64 - self.precision
+        index = (hashes >> np.uint64(value_bits)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << value_bits) - 1)
+        # The remainder has fewer than 53 bits, so the float conversion is
+        # exact and frexp's exponent is its bit length (0 for zero).
+        bit_length = np.frexp(remainder.astype(np.float64))[1]
+        rank = (value_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """Fold ``other`` into this sketch in place; returns ``self``."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        """Estimated number of distinct ids added."""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and empty:
+            # Linear counting is more accurate while many registers are empty.
+            estimate = m * math.log(m / empty)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        """Compact serialisation (mostly-empty sketches compress well)."""
+        return zlib.compress(bytes([self.precision]) + self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        raw = zlib.decompress(bytes(data))
+        registers = np.frombuffer(raw, dtype=np.uint8, offset=1).copy()
+        return cls(precision=raw[0], registers=registers)
@@ -0,0 +1,76 @@
+"""
+Management command to rebuild the daily analytics rollups from raw records.
+Usage: python manage.py backfill_daily_metrics [--tenant-id 3] [--since 2024-01-01]
+
+Without --since the backfill starts at the tenant's oldest record. The
+history is processed one month at a time so memory stays bounded.
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from analytics.queries import next_month_start
+from analytics.rollups import refresh_daily_metrics
+from appointments.models import Appointment
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+
+
+class Command(BaseCommand):
+    help = "Backfill DailyTenantMetrics rollups for all history (or since a date)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tenant-id",
+            type=int,
+            help="Optional tenant ID to scope the backfill",
+        )
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="First day to rebuild (YYYY-MM-DD); defaults to the oldest record",
+        )
+
+    def handle(self, *args, **options):
+        tenant_ids = [options["tenant_id"]] if options.get("tenant_id") else None
+        today = timezone.now().date()
+        start = options.get("since") or self._oldest_day(tenant_ids)
+        if start is None:
+            self.stdout.write(self.style.SUCCESS("No records to roll up."))
+            return
+        if start > today:
+            raise CommandError("--since must not be in the future")
+
+        total = 0
+        chunk_start = start
+        while chunk_start <= today:
+            chunk_end = min(next_month_start(chunk_start) - timedelta(days=1), today)
+            written = refresh_daily_metrics(chunk_start, chunk_end, tenant_ids)
+            total += written
+            self.stdout.write(f"  {chunk_start:%Y-%m}: {written} day rows")
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfilled {total} day rows from {start} to {today}.")
+        )
+
+    def _oldest_day(self, tenant_ids):
+        candidates = []
+        for model, field in [
+            (Patient, "created_at"),
+            (Appointment, "scheduled_for"),
+            (ClinicalRecord, "created_at"),
+            (LabResult, "created_at"),
+            (Payment, "timestamp"),
+        ]:
+            queryset = model.objects.all()
+            if tenant_ids is not None:
+                queryset = queryset.filter(tenant_id__in=tenant_ids)
+            oldest = queryset.aggregate(oldest=Min(field))["oldest"]
+            if oldest is not None:
+                candidates.append(timezone.localtime(oldest).date())
+        return min(candidates) if candidates else None
@@ -0,0 +1,58 @@
+"""
+Management command to build executive KPI snapshots for past days.
+Usage: python manage.py backfill_executive_snapshots [--tenant-id 3] [--days 90]
+       [--since 2024-01-01]
+
+Snapshots are built from the daily rollups, so run backfill_daily_metrics
+first if those are missing. Active-user counts can only be taken from the
+users' current last login, so they are approximate for past days.
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from analytics.snapshots import take_executive_snapshots
+
+
+class Command(BaseCommand):
+    help = "Backfill ExecutiveSnapshot rows for past days (default: the last 90)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tenant-id",
+            type=int,
+            help="Optional tenant ID to scope the backfill",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Number of days to snapshot, ending yesterday (default: 90)",
+        )
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="First day to snapshot (YYYY-MM-DD); overrides --days",
+        )
+
+    def handle(self, *args, **options):
+        tenant_ids = [options["tenant_id"]] if options.get("tenant_id") else None
+        yesterday = timezone.now().date() - timedelta(days=1)
+        start = options.get("since") or yesterday - timedelta(
+            days=max(1, options["days"]) - 1
+        )
+        if start > yesterday:
+            raise CommandError("--since must be before today")
+
+        total = 0
+        day = start
+        while day <= yesterday:
+            total += take_executive_snapshots(
+                day, tenant_ids=tenant_ids, refresh_rollups=False
+            )
+            day += timedelta(days=1)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Took {total} snapshots from {start} to {yesterday}.")
+        )
@@ -0,0 +1,56 @@
+"""
+Management command to benchmark the analytics pages for one tenant.
+Usage: python manage.py benchmark_analytics <tenant_id> [--repeat 5]
+
+Reports the number of SQL queries and the mean wall-clock time needed to
+build each analytics page's context against the configured database. The
+tenant result cache is bypassed so every run measures the real queries.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from analytics import reports
+from tenants.models import Tenant
+
+BENCHMARKED_PAGES = [
+    ("analytics_dashboard", reports.dashboard_context),
+    ("patient_analytics", reports.patient_context),
+    ("appointment_analytics", reports.appointment_context),
+    ("revenue_analytics", reports.revenue_context),
+    ("user_activity_analytics", reports.user_activity_context),
+    ("executive_summary", reports.executive_context),
+]
+
+
+class Command(BaseCommand):
+    help = "Measure query count and latency of the analytics pages for a tenant"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tenant_id", type=int, help="Tenant ID")
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of timed runs per page (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(id=options["tenant_id"])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant_id']} does not exist")
+
+        repeat = max(1, options["repeat"])
+        self.stdout.write(f"{'page':<26}{'queries':>8}{'mean ms':>10}")
+        for name, builder in BENCHMARKED_PAGES:
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    builder(tenant)
+                    timings.append(time.perf_counter() - started)
+            mean_ms = sum(timings) / len(timings) * 1000
+            self.stdout.write(f"{name:<26}{len(queries):>8}{mean_ms:>10.1f}")
@@ -0,0 +1,102 @@
+"""
+Management command to benchmark analytics event ingestion.
+Usage: python manage.py benchmark_event_ingestion <tenant_id> [--events 5000]
+       [--buffer local|redis]
+
+Compares writing events one INSERT at a time with the buffered recorder
+(``analytics.recorder``): the time a request spends queueing an event, and
+the queries and time needed to flush the buffer in bulk batches. Everything
+runs in a transaction that is rolled back, and the recorder benchmark uses
+its own buffer, so live events are left untouched.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from analytics.models import AnalyticsEvent
+from analytics.recorder import REDIS_KEY, LocalBuffer, RedisBuffer, flush_buffer
+from tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure analytics event throughput: per-event INSERTs vs buffered bulk flushes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("tenant_id", type=int, help="Tenant ID")
+        parser.add_argument(
+            "--events",
+            type=int,
+            default=5000,
+            help="Number of events to write (default: 5000)",
+        )
+        parser.add_argument(
+            "--buffer",
+            choices=["local", "redis"],
+            default="local",
+            help="Buffer backend to benchmark (default: local)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(id=options["tenant_id"])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant_id']} does not exist")
+
+        count = max(1, options["events"])
+        if options["buffer"] == "redis":
+            if not settings.ANALYTICS_EVENT_REDIS_URL:
+                raise CommandError("No Redis configured (set CACHE_URL or REDIS_URL)")
+            buffer = RedisBuffer(
+                settings.ANALYTICS_EVENT_REDIS_URL, key=f"{REDIS_KEY}:benchmark"
+            )
+            buffer.clear()
+        else:
+            buffer = LocalBuffer()
+
+        self.stdout.write(
+            f"{'strategy':<22}{'queries':>8}{'request ms':>12}{'flush ms':>10}"
+            f"{'events/s':>11}"
+        )
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for index in range(count):
+                    AnalyticsEvent.objects.create(
+                        tenant=tenant, event_type="other", metadata={"n": index}
+                    )
+                elapsed = time.perf_counter() - started
+            self._report("per-event INSERT", len(queries), elapsed, 0, count)
+
+            started = time.perf_counter()
+            for index in range(count):
+                buffer.push(
+                    {
+                        "tenant_id": tenant.id,
+                        "event_type": "other",
+                        "user_id": None,
+                        "timestamp": timezone.now(),
+                        "metadata": {"n": index},
+                    }
+                )
+            queued = time.perf_counter() - started
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                flush_buffer(buffer=buffer)
+                flushed = time.perf_counter() - started
+            self._report(
+                f"buffered ({options['buffer']})", len(queries), queued, flushed, count
+            )
+            transaction.set_rollback(True)
+
+    def _report(self, name, queries, request_seconds, flush_seconds, count):
+        rate = count / (request_seconds + flush_seconds)
+        self.stdout.write(
+            f"{name:<22}{queries:>8}{request_seconds * 1000:>12.1f}"
+            f"{flush_seconds * 1000:>10.1f}{rate:>11.0f}"
+        )
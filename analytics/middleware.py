@@ -0,0 +1,40 @@
+from .recorder import current_request, record_event
+
+# Successful GETs of these URL names are recorded as the given event type.
+VIEW_EVENTS = {
+    "patient_detail": "patient_view",
+    "clinicalrecord_detail": "clinical_record_view",
+    "labresult_detail": "lab_result_view",
+}
+
+
+class AnalyticsEventMiddleware:
+    """
+    Records page-view events for the detail pages in ``VIEW_EVENTS`` and
+    exposes the current request to the model signal handlers in
+    ``analytics.signals``. Events are only buffered here; see
+    ``analytics.recorder`` for how they reach the database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+
+        match = request.resolver_match
+        event_type = match and VIEW_EVENTS.get(match.url_name)
+        if event_type and request.method == "GET" and response.status_code == 200:
+            user = request.user
+            if user.is_authenticated:
+                record_event(
+                    event_type,
+                    user.tenant_id,
+                    user.pk,
+                    {"object_id": match.kwargs.get("pk")},
+                )
+        return response
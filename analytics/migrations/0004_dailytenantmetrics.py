@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenants", "0005_alter_tenant_id"),
+        ("analytics", "0003_alter_analyticsevent_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyTenantMetrics",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("patients_created", models.PositiveIntegerField(default=0)),
+                (
+                    "appointments",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Appointments scheduled for this day (any status)",
+                    ),
+                ),
+                ("appointments_completed", models.PositiveIntegerField(default=0)),
+                ("appointments_cancelled", models.PositiveIntegerField(default=0)),
+                (
+                    "appointment_status_counts",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Appointments for this day by status",
+                    ),
+                ),
+                ("clinical_records", models.PositiveIntegerField(default=0)),
+                ("lab_results", models.PositiveIntegerField(default=0)),
+                ("payments", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("refreshed_at", models.DateTimeField(auto_now=True)),
+                (
+                    "tenant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_metrics",
+                        to="tenants.tenant",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "daily tenant metrics",
+                "ordering": ["-day"],
+                "unique_together": {("tenant", "day")},
+            },
+        ),
+    ]
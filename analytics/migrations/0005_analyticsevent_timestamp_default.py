@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analytics", "0004_dailytenantmetrics"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="analyticsevent",
+            name="timestamp",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+    ]
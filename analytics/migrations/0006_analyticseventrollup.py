@@ -0,0 +1,89 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenants", "0005_alter_tenant_id"),
+        ("analytics", "0005_analyticsevent_timestamp_default"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalyticsEventRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "event_type",
+                    models.CharField(
+                        choices=[
+                            ("login", "User Login"),
+                            ("logout", "User Logout"),
+                            ("patient_view", "Patient View"),
+                            ("patient_create", "Patient Create"),
+                            ("patient_edit", "Patient Edit"),
+                            ("appointment_create", "Appointment Create"),
+                            ("appointment_edit", "Appointment Edit"),
+                            ("appointment_cancel", "Appointment Cancel"),
+                            ("clinical_record_create", "Clinical Record Create"),
+                            ("clinical_record_view", "Clinical Record View"),
+                            ("lab_result_create", "Lab Result Create"),
+                            ("lab_result_view", "Lab Result View"),
+                            ("document_upload", "Document Upload"),
+                            ("referral_create", "Referral Create"),
+                            ("payment_received", "Payment Received"),
+                            ("report_generated", "Report Generated"),
+                            ("other", "Other Event"),
+                        ],
+                        max_length=64,
+                    ),
+                ),
+                ("user_id", models.IntegerField(blank=True, null=True)),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("hour", "Hourly"), ("day", "Daily")], max_length=4
+                    ),
+                ),
+                (
+                    "bucket",
+                    models.DateTimeField(help_text="Start of the hour or day counted"),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "tenant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="analytics_event_rollups",
+                        to="tenants.tenant",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-bucket"],
+                "indexes": [
+                    models.Index(
+                        fields=["tenant", "bucket"],
+                        name="analytics_a_tenant__9407c8_idx",
+                    ),
+                    models.Index(
+                        fields=["granularity", "bucket"],
+                        name="analytics_a_granula_94ae57_idx",
+                    ),
+                ],
+                "unique_together": {
+                    ("tenant", "granularity", "bucket", "event_type", "user_id")
+                },
+            },
+        ),
+    ]
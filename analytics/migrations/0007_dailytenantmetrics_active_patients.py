@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analytics", "0006_analyticseventrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailytenantmetrics",
+            name="active_patients",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Distinct patients with an appointment or chart activity this day",
+            ),
+        ),
+        migrations.AddField(
+            model_name="dailytenantmetrics",
+            name="active_patients_sketch",
+            field=models.BinaryField(
+                blank=True,
+                help_text="HyperLogLog sketch of the active patient ids (analytics.hll)",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenants", "0005_alter_tenant_id"),
+        ("analytics", "0007_dailytenantmetrics_active_patients"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExecutiveSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("total_patients", models.PositiveIntegerField(default=0)),
+                ("patients_month_to_date", models.PositiveIntegerField(default=0)),
+                ("patients_last_month", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue_month_to_date",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "revenue_last_month",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "revenue_year_to_date",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "appointments_month_to_date",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Appointments scheduled from the 1st through this day",
+                    ),
+                ),
+                (
+                    "completed_appointments_month_to_date",
+                    models.PositiveIntegerField(default=0),
+                ),
+                (
+                    "active_users_30d",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Users whose last login fell in the 30 days before the snapshot (only exact for snapshots taken on the following night)",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "tenant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="executive_snapshots",
+                        to="tenants.tenant",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-day"],
+                "unique_together": {("tenant", "day")},
+            },
+        ),
+    ]
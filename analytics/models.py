@@ -1,4 +1,9 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
+from django.utils import timezone
 
 from tenants.models import Tenant
 
@@ -34,7 +39,9 @@ class AnalyticsEvent(models.Model):
     )
     event_type = models.CharField(max_length=64, choices=EVENT_TYPES, db_index=True)
     user_id = models.IntegerField(null=True, blank=True, db_index=True)
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # A default rather than auto_now_add, so buffered events keep the time
+    # they happened at when analytics.recorder bulk-inserts them later.
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     metadata = models.JSONField(
         blank=True, null=True, help_text="Additional event data (JSON format)"
     )
@@ -48,3 +55,189 @@ class AnalyticsEvent(models.Model):
 
     def __str__(self):
         return f"{self.get_event_type_display()} at {self.timestamp} (tenant {self.tenant_id})"
+
+
+class DailyTenantMetrics(models.Model):
+    """
+    Per-tenant, per-day counters rolled up from the operational tables.
+    Trend charts read these rows instead of grouping raw records, so their
+    cost grows with the number of days shown rather than with tenant size.
+    Maintained by ``analytics.rollups.refresh_daily_metrics``.
+    """
+
+    tenant = models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, related_name="daily_metrics"
+    )
+    day = models.DateField()
+    patients_created = models.PositiveIntegerField(default=0)
+    appointments = models.PositiveIntegerField(
+        default=0, help_text="Appointments scheduled for this day (any status)"
+    )
+    appointments_completed = models.PositiveIntegerField(default=0)
+    appointments_cancelled = models.PositiveIntegerField(default=0)
+    appointment_status_counts = models.JSONField(
+        default=dict, blank=True, help_text="Appointments for this day by status"
+    )
+    clinical_records = models.PositiveIntegerField(default=0)
+    lab_results = models.PositiveIntegerField(default=0)
+    payments = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    active_patients = models.PositiveIntegerField(
+        default=0,
+        help_text="Distinct patients with an appointment or chart activity this day",
+    )
+    active_patients_sketch = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text="HyperLogLog sketch of the active patient ids (analytics.hll)",
+    )
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-day"]
+        unique_together = ("tenant", "day")
+        verbose_name_plural = "daily tenant metrics"
+
+    def __str__(self):
+        return f"Metrics for tenant {self.tenant_id} on {self.day}"
+
+
+class AnalyticsEventRollup(models.Model):
+    """
+    Compacted ``AnalyticsEvent`` counts for one tenant, event type and user
+    within an hour or a day. Raw events past their retention window are
+    folded into these rows by ``analytics.compaction``, and the activity
+    analytics add them to the counts of the remaining raw events.
+    """
+
+    GRANULARITIES = [
+        ("hour", "Hourly"),
+        ("day", "Daily"),
+    ]
+
+    tenant = models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, related_name="analytics_event_rollups"
+    )
+    event_type = models.CharField(max_length=64, choices=AnalyticsEvent.EVENT_TYPES)
+    user_id = models.IntegerField(null=True, blank=True)
+    granularity = models.CharField(max_length=4, choices=GRANULARITIES)
+    bucket = models.DateTimeField(help_text="Start of the hour or day counted")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-bucket"]
+        unique_together = ("tenant", "granularity", "bucket", "event_type", "user_id")
+        indexes = [
+            models.Index(fields=["tenant", "bucket"]),
+            models.Index(fields=["granularity", "bucket"]),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.count} x {self.event_type} in {self.granularity} "
+            f"{self.bucket} (tenant {self.tenant_id})"
+        )
+
+
+class ExecutiveSnapshot(models.Model):
+    """
+    A tenant's executive KPIs as of the end of ``day``, materialised nightly
+    by ``analytics.snapshots.take_executive_snapshots``. The executive
+    summary reads yesterday's snapshot plus today's activity, and the
+    history feeds KPI trend charts without re-scanning the source tables.
+    """
+
+    tenant = models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, related_name="executive_snapshots"
+    )
+    day = models.DateField()
+    total_patients = models.PositiveIntegerField(default=0)
+    patients_month_to_date = models.PositiveIntegerField(default=0)
+    patients_last_month = models.PositiveIntegerField(default=0)
+    revenue_month_to_date = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0
+    )
+    revenue_last_month = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    revenue_year_to_date = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+    appointments_month_to_date = models.PositiveIntegerField(
+        default=0, help_text="Appointments scheduled from the 1st through this day"
+    )
+    completed_appointments_month_to_date = models.PositiveIntegerField(default=0)
+    active_users_30d = models.PositiveIntegerField(
+        default=0,
+        help_text="Users whose last login fell in the 30 days before the snapshot "
+        "(only exact for snapshots taken on the following night)",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-day"]
+        unique_together = ("tenant", "day")
+
+    def __str__(self):
+        return f"Executive snapshot for tenant {self.tenant_id} on {self.day}"
+
+
+class ExportStorage(FileSystemStorage):
+    """
+    Private local storage for generated exports (never served from
+    MEDIA_URL), rooted at ``ANALYTICS_EXPORT_ROOT`` when it is accessed.
+    """
+
+    @property
+    def base_location(self):
+        return settings.ANALYTICS_EXPORT_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+def export_storage():
+    return ExportStorage()
+
+
+class AnalyticsExport(models.Model):
+    """
+    An analytics report export too large to stream in the request; generated
+    to ``export_storage`` by the ``generate_analytics_export`` task.
+    """
+
+    REPORT_CHOICES = [
+        ("patient-growth", "Patient Growth"),
+        ("appointment-distribution", "Appointment Distribution"),
+        ("revenue-by-month", "Revenue by Month"),
+        ("top-patients", "Top Patients"),
+        ("activity-timeline", "Activity Timeline"),
+    ]
+    FORMAT_CHOICES = [("csv", "CSV"), ("xlsx", "Excel (XLSX)")]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+    ]
+
+    tenant = models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, related_name="analytics_exports"
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    report = models.CharField(max_length=32, choices=REPORT_CHOICES)
+    file_format = models.CharField(max_length=8, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="pending")
+    row_count = models.PositiveIntegerField(null=True, blank=True)
+    file = models.FileField(
+        storage=export_storage, upload_to="%Y/%m/", blank=True, max_length=255
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.get_report_display()} export for tenant {self.tenant_id} ({self.status})"
@@ -0,0 +1,87 @@
+"""
+Analytics query layer.
+
+Every KPI shown on the analytics pages is a count, sum or average over one
+tenant-scoped table. Instead of issuing one query per metric, the helpers
+here compile all metrics for a table into a single ``aggregate()`` call using
+conditional aggregates (``Count(filter=Q(...))``), so each page costs one
+round trip per table no matter how many KPIs it displays.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Aggregate, Count, Q
+from django.utils import timezone
+
+# Condition matching every row; ``aggregate_metrics(qs, total=ALL)`` is a COUNT(*).
+ALL = Q()
+
+WEEKDAY_NAMES = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+
+def aggregate_metrics(queryset, **metrics):
+    """
+    Evaluate several metrics over ``queryset`` in one query.
+
+    Each keyword maps a result key to either a ``Q`` object (the number of
+    rows matching it is counted) or a ready-made aggregate expression such as
+    ``Sum("amount", filter=Q(...))`` which is passed through unchanged.
+
+    Usage:
+        aggregate_metrics(
+            Patient.objects.filter(tenant=tenant),
+            total_patients=ALL,
+            new_patients_30d=Q(created_at__gte=since),
+        )
+    """
+    expressions = {}
+    for name, metric in metrics.items():
+        if isinstance(metric, Aggregate):
+            expressions[name] = metric
+        else:
+            expressions[name] = Count("pk", filter=metric)
+    return queryset.aggregate(**expressions)
+
+
+def start_of_day(day):
+    """Timezone-aware midnight at the start of ``day``."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def month_start(day):
+    """First day of the month containing ``day``."""
+    return day.replace(day=1)
+
+
+def previous_month_start(day):
+    """First day of the month before the one containing ``day``."""
+    return (month_start(day) - timedelta(days=1)).replace(day=1)
+
+
+def next_month_start(day):
+    """First day of the month after the one containing ``day``."""
+    return (month_start(day) + timedelta(days=32)).replace(day=1)
+
+
+def weekday_counts(queryset, field):
+    """
+    Count rows per day of week of ``field`` in one query.
+
+    Returns ``[{"day": "Monday", "count": n}, ...]`` ordered Monday first.
+    """
+    counts = aggregate_metrics(
+        queryset,
+        # Django's week_day lookup numbers Sunday as 1 and Saturday as 7.
+        **{
+            name: Q(**{f"{field}__week_day": (index + 1) % 7 + 1})
+            for index, name in enumerate(WEEKDAY_NAMES)
+        },
+    )
+    return [{"day": name, "count": counts[name]} for name in WEEKDAY_NAMES]
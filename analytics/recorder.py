@@ -0,0 +1,184 @@
+"""
+Buffered recorder for ``AnalyticsEvent`` rows.
+
+``record_event`` only appends to a buffer, so request threads never wait on
+an INSERT. Buffered events are written with ``bulk_create`` in batches of
+``ANALYTICS_EVENT_FLUSH_SIZE``:
+
+* ``redis`` buffer: events are pushed onto a Redis list shared by every
+  process and drained by the ``flush_analytics_events`` Celery task every
+  ``ANALYTICS_EVENT_FLUSH_INTERVAL`` seconds.
+* ``local`` buffer (no Redis configured): events are kept in process and
+  written from ``request_finished``, i.e. after the response has been sent,
+  once a batch is full or the flush interval has elapsed.
+
+Which requests and writes become events is decided by
+``analytics.middleware.AnalyticsEventMiddleware`` and ``analytics.signals``.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+import redis
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AnalyticsEvent
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = "analytics:event-buffer"
+
+# The request being served by the current thread, set by the middleware so
+# model signal handlers can attribute writes to the acting user.
+current_request = ContextVar("analytics_current_request", default=None)
+
+
+class LocalBuffer:
+    """Thread-safe in-process event buffer."""
+
+    def __init__(self):
+        self._events = deque()
+        self._lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def push(self, event):
+        self._events.append(event)
+
+    def drain(self, limit):
+        """Remove and return up to ``limit`` of the oldest events."""
+        with self._lock:
+            batch = []
+            while self._events and len(batch) < limit:
+                batch.append(self._events.popleft())
+        return batch
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self.last_flush = time.monotonic()
+
+    def __len__(self):
+        return len(self._events)
+
+
+class RedisBuffer:
+    """Event buffer kept on a Redis list, shared by all web and worker processes."""
+
+    def __init__(self, url, key=REDIS_KEY):
+        self.url = url
+        self.key = key
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def push(self, event):
+        self.client.rpush(self.key, json.dumps(event, cls=DjangoJSONEncoder))
+
+    def drain(self, limit):
+        """Atomically pop up to ``limit`` of the oldest events."""
+        pipe = self.client.pipeline()
+        pipe.lrange(self.key, 0, limit - 1)
+        pipe.ltrim(self.key, limit, -1)
+        raw, _ = pipe.execute()
+        events = [json.loads(item) for item in raw]
+        for event in events:
+            event["timestamp"] = parse_datetime(event["timestamp"])
+        return events
+
+    def clear(self):
+        self.client.delete(self.key)
+
+    def __len__(self):
+        return self.client.llen(self.key)
+
+
+_buffers = {}
+
+
+def get_buffer():
+    """The buffer selected by ``ANALYTICS_EVENT_BUFFER`` (one per process)."""
+    backend = settings.ANALYTICS_EVENT_BUFFER
+    if backend not in _buffers:
+        if backend == "redis":
+            _buffers[backend] = RedisBuffer(settings.ANALYTICS_EVENT_REDIS_URL)
+        else:
+            _buffers[backend] = LocalBuffer()
+    return _buffers[backend]
+
+
+def record_event(event_type, tenant_id, user_id=None, metadata=None):
+    """Queue an analytics event for the next flush; never touches the database."""
+    if not settings.ANALYTICS_EVENTS_ENABLED or tenant_id is None:
+        return
+    event = {
+        "tenant_id": tenant_id,
+        "event_type": event_type,
+        "user_id": user_id,
+        "timestamp": timezone.now(),
+        "metadata": metadata,
+    }
+    try:
+        get_buffer().push(event)
+    except redis.RedisError:
+        # Analytics are best effort: an unavailable buffer must not fail the request.
+        logger.warning("Analytics event dropped", exc_info=True)
+
+
+def store_events(events):
+    """Insert buffered events with one bulk INSERT per batch; returns the count."""
+    if not events:
+        return 0
+    AnalyticsEvent.objects.bulk_create(
+        [AnalyticsEvent(**event) for event in events],
+        batch_size=settings.ANALYTICS_EVENT_FLUSH_SIZE,
+    )
+    return len(events)
+
+
+def flush_buffer(max_batches=None, buffer=None):
+    """
+    Drain the buffer into the database in ``ANALYTICS_EVENT_FLUSH_SIZE`` batches.
+
+    ``max_batches`` bounds the work done by one call so a backlog cannot make
+    a single flush run indefinitely. Returns the number of events written.
+    """
+    if buffer is None:
+        buffer = get_buffer()
+    written = batches = 0
+    while max_batches is None or batches < max_batches:
+        events = buffer.drain(settings.ANALYTICS_EVENT_FLUSH_SIZE)
+        if not events:
+            break
+        try:
+            written += store_events(events)
+        except DatabaseError:
+            logger.exception("Failed to store %d analytics events", len(events))
+        batches += 1
+    if isinstance(buffer, LocalBuffer):
+        buffer.last_flush = time.monotonic()
+    return written
+
+
+def flush_local_buffer_if_due(**kwargs):
+    """``request_finished`` receiver: flush the in-process buffer when due."""
+    buffer = get_buffer()
+    if not isinstance(buffer, LocalBuffer) or not len(buffer):
+        return
+    interval = settings.ANALYTICS_EVENT_FLUSH_INTERVAL
+    if (
+        len(buffer) >= settings.ANALYTICS_EVENT_FLUSH_SIZE
+        or time.monotonic() - buffer.last_flush >= interval
+    ):
+        flush_buffer()
@@ -0,0 +1,375 @@
+"""
+Context builders for the analytics pages.
+
+Each ``*_context(tenant)`` function computes the template context for one
+analytics page, and each ``*_series(tenant)`` function one chart's labels and
+data for the JSON chart endpoint. Both return plain values (querysets are
+evaluated into lists), so results can be cached per tenant and reused
+outside the HTML views.
+"""
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from appointments.models import Appointment
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+from users.models import CustomUser
+
+from .compaction import daily_event_counts, event_counts
+from .demographics import patient_demographics
+from .models import DailyTenantMetrics
+from .queries import (
+    ALL,
+    aggregate_metrics,
+    month_start,
+    next_month_start,
+    previous_month_start,
+    start_of_day,
+    weekday_counts,
+)
+from .rollups import active_patient_count, monthly_series
+from .snapshots import kpi_trend, snapshot_figures
+
+
+def dashboard_context(tenant, exact=False):
+    """
+    Key performance indicators for the main analytics dashboard.
+    The active patient count is a sketch estimate unless ``exact`` is set.
+    """
+    now = timezone.now()
+    today = now.date()
+    thirty_days_ago = now - timedelta(days=30)
+    ninety_days_ago = now - timedelta(days=90)
+    this_month = start_of_day(month_start(today))
+    next_month = start_of_day(next_month_start(today))
+
+    # Key Performance Indicators (KPIs), one aggregate query per table
+    context = {}
+    # Patient Metrics
+    context.update(
+        aggregate_metrics(
+            Patient.objects.filter(tenant=tenant),
+            total_patients=ALL,
+            new_patients_30d=Q(created_at__gte=thirty_days_ago),
+        )
+    )
+    # Appointment Metrics
+    context.update(
+        aggregate_metrics(
+            Appointment.objects.filter(tenant=tenant),
+            total_appointments=ALL,
+            appointments_this_month=Q(
+                scheduled_for__gte=this_month, scheduled_for__lt=next_month
+            ),
+            upcoming_appointments=Q(scheduled_for__gte=now, status="scheduled"),
+            completed_appointments_30d=Q(
+                scheduled_for__gte=thirty_days_ago, status="completed"
+            ),
+        )
+    )
+    # Distinct active patients, merged from the daily HyperLogLog sketches
+    context["active_patients_90d"] = active_patient_count(
+        tenant, today - timedelta(days=89), today, exact=exact
+    )
+    context["active_patients_exact"] = exact
+    # Clinical Records Metrics
+    context.update(
+        aggregate_metrics(
+            ClinicalRecord.objects.filter(tenant=tenant),
+            total_clinical_records=ALL,
+            records_this_month=Q(created_at__gte=this_month, created_at__lt=next_month),
+        )
+    )
+    # Lab Results Metrics
+    context.update(
+        aggregate_metrics(
+            LabResult.objects.filter(tenant=tenant), total_lab_results=ALL
+        )
+    )
+    # User Activity Metrics
+    context.update(
+        aggregate_metrics(
+            CustomUser.objects.filter(tenant=tenant, is_active=True),
+            total_users=ALL,
+            admin_count=Q(role="admin"),
+        )
+    )
+
+    # Revenue Analytics (if applicable)
+    revenue_data = aggregate_metrics(
+        Payment.objects.filter(tenant=tenant, timestamp__gte=ninety_days_ago),
+        total_revenue=Sum("amount"),
+        avg_payment=Avg("amount"),
+        payment_count=Count("id"),
+    )
+    context.update(revenue_data)
+
+    return context
+
+
+def patient_context(tenant):
+    """Patient demographics analytics; growth is served by ``patient_growth_series``."""
+    # Age and gender breakdown from a single grouped query
+    demographics = patient_demographics(Patient.objects.filter(tenant=tenant))
+
+    context = {
+        "age_distribution": demographics["age_distribution"],
+        "gender_distribution": demographics["gender_distribution"],
+        "mean_age": demographics["mean_age"],
+        "total_patients": demographics["total"],
+    }
+
+    return context
+
+
+def appointment_context(tenant):
+    """
+    Appointment scheduling patterns and efficiency metrics; the monthly trend
+    is served by ``monthly_appointments_series``.
+    """
+    # Appointments by status
+    status_distribution = list(
+        Appointment.objects.filter(tenant=tenant)
+        .values("status")
+        .annotate(count=Count("id"))
+        .order_by("-count")
+    )
+
+    # Appointments by day of week (last 90 days)
+    ninety_days_ago = timezone.now() - timedelta(days=90)
+    appointments_by_day = weekday_counts(
+        Appointment.objects.filter(tenant=tenant, scheduled_for__gte=ninety_days_ago),
+        "scheduled_for",
+    )
+
+    context = {
+        "status_distribution": status_distribution,
+        "appointments_by_day": appointments_by_day,
+        # Every appointment has a status, so the total falls out of the breakdown.
+        "total_appointments": sum(item["count"] for item in status_distribution),
+    }
+
+    return context
+
+
+def revenue_context(tenant):
+    """
+    Financial performance and revenue analytics; the monthly trend is served
+    by ``monthly_revenue_series``.
+    """
+    # Payment method distribution
+    payment_methods = list(
+        Payment.objects.filter(tenant=tenant)
+        .values("currency")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by("-total")
+    )
+
+    # Revenue by patient (top 10)
+    top_patients = list(
+        Payment.objects.filter(tenant=tenant, patient__isnull=False)
+        .values("patient__first_name", "patient__last_name")
+        .annotate(total=Sum("amount"))
+        .order_by("-total")[:10]
+    )
+
+    # Key metrics
+    totals = aggregate_metrics(
+        Payment.objects.filter(tenant=tenant),
+        total_revenue=Sum("amount"),
+        avg_payment=Avg("amount"),
+        payment_count=Count("id"),
+    )
+
+    context = {
+        "payment_methods": payment_methods,
+        "top_patients": top_patients,
+        "total_revenue": totals["total_revenue"] or 0,
+        "avg_payment": totals["avg_payment"] or 0,
+        "payment_count": totals["payment_count"],
+    }
+
+    return context
+
+
+def user_activity_context(tenant):
+    """
+    User activity and system usage analytics; the timeline is served by
+    ``daily_activity_series``.
+    """
+    # Activity events by type, counting raw and compacted events alike; there
+    # are only a handful of types, so the breakdown also yields the total.
+    event_type_counts = [
+        {"event_type": event_type, "count": count}
+        for (event_type,), count in event_counts(tenant, "event_type").most_common()
+    ]
+    event_counts_top = event_type_counts[:15]
+
+    # User activity ranking
+    user_activity = [
+        {"user_id": user_id, "count": count}
+        for (user_id,), count in event_counts(tenant, "user_id").most_common()
+        if user_id is not None
+    ][:10]
+
+    users = {
+        u.id: u
+        for u in CustomUser.objects.filter(
+            id__in=[ua["user_id"] for ua in user_activity]
+        )
+    }
+
+    context = {
+        "event_counts": event_counts_top,
+        "user_activity": user_activity,
+        "users": users,
+        "total_events": sum(item["count"] for item in event_type_counts),
+    }
+
+    return context
+
+
+def patient_growth_series(tenant):
+    """New patients per month over the last 12 months, from the daily rollups."""
+    labels, data = monthly_series(
+        tenant, "patients_created", timezone.now().date() - timedelta(days=365)
+    )
+    return {"labels": labels, "data": data}
+
+
+def monthly_appointments_series(tenant):
+    """Appointments per month over the last 12 months, from the daily rollups."""
+    labels, data = monthly_series(
+        tenant, "appointments", timezone.now().date() - timedelta(days=365)
+    )
+    return {"labels": labels, "data": data}
+
+
+def monthly_revenue_series(tenant):
+    """Revenue per month over the last 12 months, from the daily rollups."""
+    labels, amounts = monthly_series(
+        tenant, "revenue", timezone.now().date() - timedelta(days=365)
+    )
+    return {"labels": labels, "data": [float(amount) for amount in amounts]}
+
+
+def daily_activity_series(tenant):
+    """Recorded events per day over the last 30 days, raw and compacted."""
+    thirty_days_ago = timezone.now() - timedelta(days=30)
+    daily_activity = sorted(daily_event_counts(tenant, thirty_days_ago).items())
+    return {
+        "labels": [day.strftime("%b %d") for day, _ in daily_activity],
+        "data": [count for _, count in daily_activity],
+    }
+
+
+def live_executive_figures(tenant, today):
+    """
+    The executive summary's raw figures computed from the daily rollups and
+    the source tables; used until the first nightly snapshot exists.
+    """
+    current_month_start = month_start(today)
+    last_month_start = previous_month_start(today)
+    current_year_start = today.replace(month=1, day=1)
+
+    # Month-over-month and year-to-date figures come from the daily rollups
+    period_metrics = aggregate_metrics(
+        DailyTenantMetrics.objects.filter(
+            tenant=tenant, day__gte=min(last_month_start, current_year_start)
+        ),
+        patients_current_month=Sum(
+            "patients_created", filter=Q(day__gte=current_month_start)
+        ),
+        patients_last_month=Sum(
+            "patients_created",
+            filter=Q(day__gte=last_month_start, day__lt=current_month_start),
+        ),
+        revenue_current_month=Sum("revenue", filter=Q(day__gte=current_month_start)),
+        revenue_last_month=Sum(
+            "revenue", filter=Q(day__gte=last_month_start, day__lt=current_month_start)
+        ),
+        total_revenue_ytd=Sum("revenue", filter=Q(day__gte=current_year_start)),
+    )
+    figures = {key: value or 0 for key, value in period_metrics.items()}
+
+    figures.update(
+        aggregate_metrics(
+            Appointment.objects.filter(
+                tenant=tenant, scheduled_for__gte=start_of_day(current_month_start)
+            ),
+            total_appointments=ALL,
+            completed_appointments=Q(status="completed"),
+        )
+    )
+    figures["total_patients"] = Patient.objects.filter(tenant=tenant).count()
+    return figures
+
+
+def executive_context(tenant):
+    """
+    High-level KPIs for the executive summary, from yesterday's nightly
+    snapshot plus today's activity when there is one.
+    """
+    today = timezone.now().date()
+    figures = snapshot_figures(tenant, today) or live_executive_figures(tenant, today)
+
+    # Patient Growth Metrics
+    patients_current_month = figures["patients_current_month"]
+    patients_last_month = figures["patients_last_month"]
+    patient_growth_rate = (
+        ((patients_current_month - patients_last_month) / patients_last_month * 100)
+        if patients_last_month > 0
+        else 0
+    )
+
+    # Revenue Metrics
+    revenue_current_month = figures["revenue_current_month"]
+    revenue_last_month = figures["revenue_last_month"]
+
+    revenue_growth_rate = (
+        ((revenue_current_month - revenue_last_month) / revenue_last_month * 100)
+        if revenue_last_month > 0
+        else 0
+    )
+
+    # Appointment Efficiency
+    completed_appointments = figures["completed_appointments"]
+    total_appointments = figures["total_appointments"]
+
+    completion_rate = (
+        (completed_appointments / total_appointments * 100)
+        if total_appointments > 0
+        else 0
+    )
+
+    # System Usage
+    active_users = aggregate_metrics(
+        CustomUser.objects.filter(tenant=tenant, is_active=True),
+        active_users=Q(last_login__gte=timezone.now() - timedelta(days=30)),
+    )["active_users"]
+
+    context = {
+        "patients_current_month": patients_current_month,
+        "patient_growth_rate": round(patient_growth_rate, 1),
+        "revenue_current_month": revenue_current_month,
+        "revenue_growth_rate": round(revenue_growth_rate, 1),
+        "completion_rate": round(completion_rate, 1),
+        "active_users": active_users,
+        "total_patients": figures["total_patients"],
+        "total_revenue_ytd": figures["total_revenue_ytd"],
+    }
+
+    return context
+
+
+def patients_trend_series(tenant):
+    """Total patients at the end of each day over the last 90 days, from snapshots."""
+    trend = kpi_trend(tenant, "total_patients", days=90)
+    return {
+        "labels": [day.strftime("%b %d") for day, _ in trend],
+        "data": [value for _, value in trend],
+    }
@@ -0,0 +1,267 @@
+"""
+Daily per-tenant metric rollups.
+
+``refresh_daily_metrics`` recomputes the ``DailyTenantMetrics`` rows for a
+window of days from the operational tables with one grouped query per
+source table, then replaces the window's rows in a single transaction.
+The Celery beat task refreshes only the last few days; the
+``backfill_daily_metrics`` command walks a tenant's whole history month by
+month.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from appointments.models import Appointment
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from common.tenant_cache import bump_tenant_version
+from labs.models import LabResult
+from patients.models import Patient
+
+from .hll import HyperLogLog
+from .models import AnalyticsEvent, DailyTenantMetrics
+from .queries import start_of_day
+
+# Event types whose metadata ``object_id`` is a patient id.
+PATIENT_EVENT_TYPES = ["patient_view", "patient_create", "patient_edit"]
+
+ROLLUP_FIELDS = [
+    "patients_created",
+    "appointments",
+    "appointments_completed",
+    "appointments_cancelled",
+    "appointment_status_counts",
+    "clinical_records",
+    "lab_results",
+    "payments",
+    "revenue",
+    "active_patients",
+    "active_patients_sketch",
+]
+
+
+def _grouped(queryset, field, start, end, tenant_ids, *extra, **aggregates):
+    """Group ``queryset`` by tenant and calendar day of ``field`` within [start, end]."""
+    queryset = queryset.filter(
+        **{
+            f"{field}__gte": start_of_day(start),
+            f"{field}__lt": start_of_day(end + timedelta(days=1)),
+        }
+    )
+    if tenant_ids is not None:
+        queryset = queryset.filter(tenant_id__in=tenant_ids)
+    return (
+        queryset.annotate(day=TruncDate(field))
+        .values("tenant_id", "day", *extra)
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+
+def collect_daily_metrics(start, end, tenant_ids=None):
+    """
+    Compute rollup rows for every tenant/day with activity in [start, end].
+
+    Returns unsaved ``DailyTenantMetrics`` instances.
+    """
+    rows = defaultdict(dict)
+
+    for item in _grouped(
+        Patient.objects, "created_at", start, end, tenant_ids, n=Count("id")
+    ):
+        rows[item["tenant_id"], item["day"]]["patients_created"] = item["n"]
+
+    for item in _grouped(
+        Appointment.objects,
+        "scheduled_for",
+        start,
+        end,
+        tenant_ids,
+        "status",
+        n=Count("id"),
+    ):
+        row = rows[item["tenant_id"], item["day"]]
+        row.setdefault("appointment_status_counts", {})[item["status"]] = item["n"]
+        row["appointments"] = row.get("appointments", 0) + item["n"]
+        if item["status"] == "completed":
+            row["appointments_completed"] = item["n"]
+        elif item["status"] == "cancelled":
+            row["appointments_cancelled"] = item["n"]
+
+    for item in _grouped(
+        ClinicalRecord.objects, "created_at", start, end, tenant_ids, n=Count("id")
+    ):
+        rows[item["tenant_id"], item["day"]]["clinical_records"] = item["n"]
+
+    for item in _grouped(
+        LabResult.objects, "created_at", start, end, tenant_ids, n=Count("id")
+    ):
+        rows[item["tenant_id"], item["day"]]["lab_results"] = item["n"]
+
+    for item in _grouped(
+        Payment.objects,
+        "timestamp",
+        start,
+        end,
+        tenant_ids,
+        n=Count("id"),
+        total=Sum("amount"),
+    ):
+        row = rows[item["tenant_id"], item["day"]]
+        row["payments"] = item["n"]
+        row["revenue"] = item["total"] or Decimal("0")
+
+    for (tenant_id, day), patient_ids in _active_patient_ids(
+        start, end, tenant_ids
+    ).items():
+        sketch = HyperLogLog()
+        sketch.add(patient_ids)
+        row = rows[tenant_id, day]
+        row["active_patients"] = len(patient_ids)
+        row["active_patients_sketch"] = sketch.to_bytes()
+
+    return [
+        DailyTenantMetrics(tenant_id=tenant_id, day=day, **values)
+        for (tenant_id, day), values in rows.items()
+    ]
+
+
+def _active_patient_ids(start, end, tenant_ids=None):
+    """
+    Ids of the patients with an appointment or a patient view/create/edit
+    event in [start, end], keyed by (tenant id, day).
+    """
+    seen = defaultdict(set)
+    appointments = _grouped(
+        Appointment.objects, "scheduled_for", start, end, tenant_ids, "patient_id"
+    ).distinct()
+    events = _grouped(
+        AnalyticsEvent.objects.filter(event_type__in=PATIENT_EVENT_TYPES),
+        "timestamp",
+        start,
+        end,
+        tenant_ids,
+        "metadata__object_id",
+    ).distinct()
+    for item in appointments:
+        seen[item["tenant_id"], item["day"]].add(item["patient_id"])
+    for item in events:
+        if item["metadata__object_id"] is not None:
+            seen[item["tenant_id"], item["day"]].add(int(item["metadata__object_id"]))
+    return seen
+
+
+def refresh_daily_metrics(start, end=None, tenant_ids=None):
+    """
+    Rebuild the rollup rows for days ``start`` through ``end`` (inclusive).
+
+    Days that no longer have any activity lose their row, so the window is
+    always an exact mirror of the source tables. Tenants whose figures
+    changed get their cached analytics invalidated. Returns the number of
+    rows written.
+    """
+    end = end or timezone.now().date()
+    metrics = collect_daily_metrics(start, end, tenant_ids)
+    with transaction.atomic():
+        stale = DailyTenantMetrics.objects.filter(day__gte=start, day__lte=end)
+        if tenant_ids is not None:
+            stale = stale.filter(tenant_id__in=tenant_ids)
+        previous = {
+            (row["tenant_id"], row["day"]): _comparable(row)
+            for row in stale.values("tenant_id", "day", *ROLLUP_FIELDS)
+        }
+        stale.delete()
+        DailyTenantMetrics.objects.bulk_create(metrics, batch_size=1000)
+
+        current = {
+            (row.tenant_id, row.day): _comparable(
+                {field: getattr(row, field) for field in ROLLUP_FIELDS}
+            )
+            for row in metrics
+        }
+        changed_tenants = {
+            tenant_id
+            for tenant_id, day in previous.keys() | current.keys()
+            if previous.get((tenant_id, day)) != current.get((tenant_id, day))
+        }
+
+        def invalidate_changed_tenants():
+            for tenant_id in changed_tenants:
+                bump_tenant_version(tenant_id)
+
+        transaction.on_commit(invalidate_changed_tenants)
+    return len(metrics)
+
+
+def _comparable(values):
+    """Rollup values normalised so freshly built and stored rows compare equal."""
+    normalise = {"revenue": Decimal, "active_patients_sketch": bytes}
+    return tuple(
+        normalise[field](values[field] or 0)
+        if field in normalise
+        else values[field] or 0
+        for field in ROLLUP_FIELDS
+    )
+
+
+def refresh_recent_daily_metrics(days, tenant_ids=None):
+    """Incrementally refresh the last ``days`` days, today included."""
+    today = timezone.now().date()
+    return refresh_daily_metrics(
+        today - timedelta(days=max(days, 1) - 1), today, tenant_ids
+    )
+
+
+def monthly_series(tenant, field, since):
+    """
+    Monthly totals of a rollup ``field`` for ``tenant`` from ``since`` onward.
+
+    Returns ``(labels, values)`` for chart rendering; months without any
+    activity for the field are omitted, matching the raw-table charts.
+    """
+    series = (
+        DailyTenantMetrics.objects.filter(
+            tenant=tenant, day__gte=since, **{f"{field}__gt": 0}
+        )
+        .annotate(month=TruncMonth("day"))
+        .values("month")
+        .annotate(total=Sum(field))
+        .order_by("month")
+    )
+    labels = [item["month"].strftime("%b %Y") for item in series]
+    values = [item["total"] for item in series]
+    return labels, values
+
+
+def active_patient_count(tenant, since, until=None, exact=False):
+    """
+    Distinct patients with an appointment or chart activity on days
+    ``since`` through ``until`` (default today).
+
+    By default the per-day HyperLogLog sketches in the rollups are merged,
+    which costs one small query for any window; the result is within about
+    0.81% of the true count (one standard error, see ``analytics.hll``) and
+    lags the source tables by up to one rollup refresh. ``exact=True`` counts
+    the source rows instead, for audits; it only sees events that have not
+    been compacted yet (see ``analytics.compaction``).
+    """
+    until = until or timezone.now().date()
+    if exact:
+        return len(
+            set().union(*_active_patient_ids(since, until, [tenant.id]).values())
+        )
+    merged = HyperLogLog()
+    for data in DailyTenantMetrics.objects.filter(
+        tenant=tenant,
+        day__gte=since,
+        day__lte=until,
+        active_patients_sketch__isnull=False,
+    ).values_list("active_patients_sketch", flat=True):
+        merged.merge(HyperLogLog.from_bytes(data))
+    return merged.count()
@@ -0,0 +1,70 @@
+"""
+Signal handlers that turn logins and model writes into analytics events.
+
+Model writes are only recorded while a request is being served (see
+``analytics.middleware``), so data imports, seed scripts and background
+jobs do not show up as user activity.
+"""
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.core.signals import request_finished
+from django.db.models.signals import post_save
+
+from appointments.models import Appointment
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+from referrals.models import Referral
+
+from .recorder import current_request, flush_local_buffer_if_due, record_event
+
+# model -> (event type on create, event type on update or None)
+MODEL_EVENTS = {
+    Patient: ("patient_create", "patient_edit"),
+    Appointment: ("appointment_create", "appointment_edit"),
+    ClinicalRecord: ("clinical_record_create", None),
+    LabResult: ("lab_result_create", None),
+    Payment: ("payment_received", None),
+    Referral: ("referral_create", None),
+}
+
+
+def record_login(sender, request, user, **kwargs):
+    record_event("login", getattr(user, "tenant_id", None), user.pk)
+
+
+def record_logout(sender, request, user, **kwargs):
+    if user is not None:
+        record_event("logout", getattr(user, "tenant_id", None), user.pk)
+
+
+def record_model_event(sender, instance, created, **kwargs):
+    request = current_request.get()
+    if request is None:
+        return
+    create_event, update_event = MODEL_EVENTS[sender]
+    if created:
+        event_type = create_event
+    elif sender is Appointment and instance.status == "cancelled":
+        event_type = "appointment_cancel"
+    else:
+        event_type = update_event
+    if event_type is None:
+        return
+    user = getattr(request, "user", None)
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    record_event(event_type, instance.tenant_id, user_id, {"object_id": instance.pk})
+
+
+def connect_signals():
+    user_logged_in.connect(record_login, dispatch_uid="analytics_login")
+    user_logged_out.connect(record_logout, dispatch_uid="analytics_logout")
+    request_finished.connect(
+        flush_local_buffer_if_due, dispatch_uid="analytics_flush_local_buffer"
+    )
+    for model in MODEL_EVENTS:
+        post_save.connect(
+            record_model_event,
+            sender=model,
+            dispatch_uid=f"analytics_event_{model._meta.label_lower}",
+        )
@@ -0,0 +1,191 @@
+"""
+Nightly executive KPI snapshots.
+
+``take_executive_snapshots`` materialises the executive figures of every
+analytics tenant as of the end of a day into ``ExecutiveSnapshot`` rows,
+using the daily rollups plus one grouped query per source table for all
+tenants at once. ``snapshot_figures`` answers the executive summary from
+yesterday's snapshot plus today's activity, which only touches today's rows.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from appointments.models import Appointment
+from billing.models import Payment
+from patients.models import Patient
+from tenants.models import Tenant
+from users.models import CustomUser
+
+from .decorators import ANALYTICS_PLANS
+from .models import DailyTenantMetrics, ExecutiveSnapshot
+from .queries import (
+    ALL,
+    aggregate_metrics,
+    month_start,
+    previous_month_start,
+    start_of_day,
+)
+from .rollups import refresh_daily_metrics
+
+
+def collect_executive_snapshots(day, tenant_ids):
+    """Unsaved ``ExecutiveSnapshot`` rows for ``tenant_ids`` as of the end of ``day``."""
+    this_month = month_start(day)
+    last_month = previous_month_start(day)
+    this_year = day.replace(month=1, day=1)
+    day_end = start_of_day(day + timedelta(days=1))
+    rows = defaultdict(dict)
+
+    in_month = Q(day__gte=this_month)
+    in_last_month = Q(day__gte=last_month, day__lt=this_month)
+    for item in (
+        DailyTenantMetrics.objects.filter(
+            tenant_id__in=tenant_ids,
+            day__gte=min(last_month, this_year),
+            day__lte=day,
+        )
+        .values("tenant_id")
+        .annotate(
+            patients_month_to_date=Sum("patients_created", filter=in_month),
+            patients_last_month=Sum("patients_created", filter=in_last_month),
+            revenue_month_to_date=Sum("revenue", filter=in_month),
+            revenue_last_month=Sum("revenue", filter=in_last_month),
+            revenue_year_to_date=Sum("revenue", filter=Q(day__gte=this_year)),
+            appointments_month_to_date=Sum("appointments", filter=in_month),
+            completed_appointments_month_to_date=Sum(
+                "appointments_completed", filter=in_month
+            ),
+        )
+        .order_by()
+    ):
+        tenant_id = item.pop("tenant_id")
+        rows[tenant_id].update({key: value or 0 for key, value in item.items()})
+
+    for item in (
+        Patient.objects.filter(tenant_id__in=tenant_ids, created_at__lt=day_end)
+        .values("tenant_id")
+        .annotate(n=Count("pk"))
+        .order_by()
+    ):
+        rows[item["tenant_id"]]["total_patients"] = item["n"]
+
+    for item in (
+        CustomUser.objects.filter(
+            tenant_id__in=tenant_ids,
+            is_active=True,
+            last_login__gte=day_end - timedelta(days=30),
+            last_login__lt=day_end,
+        )
+        .values("tenant_id")
+        .annotate(n=Count("pk"))
+        .order_by()
+    ):
+        rows[item["tenant_id"]]["active_users_30d"] = item["n"]
+
+    return [
+        ExecutiveSnapshot(tenant_id=tenant_id, day=day, **rows[tenant_id])
+        for tenant_id in tenant_ids
+    ]
+
+
+def take_executive_snapshots(day=None, tenant_ids=None, refresh_rollups=True):
+    """
+    Snapshot the executive KPIs of every analytics tenant for ``day``
+    (default yesterday), replacing any earlier snapshot of that day.
+
+    The day's rollups are refreshed first so activity from its last minutes
+    is included; pass ``refresh_rollups=False`` when they are known to be
+    current (e.g. straight after a backfill). Returns the number of rows.
+    """
+    day = day or timezone.now().date() - timedelta(days=1)
+    tenants = Tenant.objects.filter(plan__in=ANALYTICS_PLANS)
+    if tenant_ids is not None:
+        tenants = tenants.filter(id__in=tenant_ids)
+    ids = list(tenants.values_list("id", flat=True))
+    if not ids:
+        return 0
+    if refresh_rollups:
+        refresh_daily_metrics(day, day, ids)
+
+    snapshots = collect_executive_snapshots(day, ids)
+    with transaction.atomic():
+        ExecutiveSnapshot.objects.filter(day=day, tenant_id__in=ids).delete()
+        ExecutiveSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
+
+
+def snapshot_figures(tenant, today=None):
+    """
+    The executive summary's raw figures for ``today``: yesterday's snapshot
+    plus today's new patients, payments and appointments (which include all
+    future appointments, as the month's total always has).
+
+    Returns None when yesterday's snapshot has not been taken yet.
+    """
+    today = today or timezone.now().date()
+    snapshot = ExecutiveSnapshot.objects.filter(
+        tenant=tenant, day=today - timedelta(days=1)
+    ).first()
+    if snapshot is None:
+        return None
+
+    day_start = start_of_day(today)
+    patients_today = aggregate_metrics(
+        Patient.objects.filter(tenant=tenant, created_at__gte=day_start), n=ALL
+    )["n"]
+    revenue_today = (
+        aggregate_metrics(
+            Payment.objects.filter(tenant=tenant, timestamp__gte=day_start),
+            total=Sum("amount"),
+        )["total"]
+        or 0
+    )
+    appointments = aggregate_metrics(
+        Appointment.objects.filter(tenant=tenant, scheduled_for__gte=day_start),
+        total=ALL,
+        completed=Q(status="completed"),
+    )
+
+    figures = {
+        "patients_current_month": snapshot.patients_month_to_date,
+        "patients_last_month": snapshot.patients_last_month,
+        "revenue_current_month": snapshot.revenue_month_to_date,
+        "revenue_last_month": snapshot.revenue_last_month,
+        "total_revenue_ytd": snapshot.revenue_year_to_date,
+        "total_appointments": snapshot.appointments_month_to_date,
+        "completed_appointments": snapshot.completed_appointments_month_to_date,
+    }
+    if today.day == 1:
+        # Yesterday's month-to-date figures are now last month's totals.
+        figures.update(
+            patients_current_month=0,
+            patients_last_month=snapshot.patients_month_to_date,
+            revenue_current_month=0,
+            revenue_last_month=snapshot.revenue_month_to_date,
+            total_appointments=0,
+            completed_appointments=0,
+        )
+        if today.month == 1:
+            figures["total_revenue_ytd"] = 0
+
+    figures["patients_current_month"] += patients_today
+    figures["revenue_current_month"] += revenue_today
+    figures["total_revenue_ytd"] += revenue_today
+    figures["total_appointments"] += appointments["total"]
+    figures["completed_appointments"] += appointments["completed"]
+    figures["total_patients"] = snapshot.total_patients + patients_today
+    return figures
+
+
+def kpi_trend(tenant, field, days=90):
+    """Daily values of a snapshot ``field`` for the last ``days`` days, oldest first."""
+    since = timezone.now().date() - timedelta(days=days)
+    return list(
+        ExecutiveSnapshot.objects.filter(tenant=tenant, day__gte=since)
+        .order_by("day")
+        .values_list("day", field)
+    )
@@ -0,0 +1,61 @@
+import logging
+
+from celery import shared_task
+
+from django.conf import settings
+
+from analytics.compaction import compact_events
+from analytics.exports import run_export
+from analytics.models import AnalyticsExport
+from analytics.recorder import flush_buffer
+from analytics.rollups import refresh_recent_daily_metrics
+from analytics.snapshots import take_executive_snapshots as snapshot_executive_kpis
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_daily_tenant_metrics(days=None):
+    """Recompute the rollup rows for the most recent days."""
+    days = days or settings.ANALYTICS_ROLLUP_REFRESH_DAYS
+    written = refresh_recent_daily_metrics(days)
+    logger.info("Daily tenant metrics refreshed", extra={"days": days, "rows": written})
+    return {"days": days, "rows": written}
+
+
+@shared_task
+def flush_analytics_events(max_batches=100):
+    """Write buffered analytics events to the database in bulk batches."""
+    written = flush_buffer(max_batches=max_batches)
+    if written:
+        logger.info("Analytics events flushed", extra={"events": written})
+    return {"events": written}
+
+
+@shared_task
+def compact_analytics_events():
+    """Roll expired raw events up into hourly/daily rows and drop old rollups."""
+    processed = compact_events()
+    logger.info("Analytics events compacted", extra=processed)
+    return processed
+
+
+@shared_task
+def take_executive_snapshots():
+    """Materialise yesterday's executive KPIs for every analytics tenant."""
+    written = snapshot_executive_kpis()
+    logger.info("Executive snapshots taken", extra={"tenants": written})
+    return {"tenants": written}
+
+
+@shared_task
+def generate_analytics_export(export_id):
+    """Write a queued analytics export to the export storage and notify its owner."""
+    export = AnalyticsExport.objects.select_related("tenant", "requested_by").get(
+        id=export_id
+    )
+    rows = run_export(export)
+    logger.info(
+        "Analytics export generated", extra={"export_id": export_id, "rows": rows}
+    )
+    return {"export_id": export_id, "rows": rows}
@@ -1,8 +1,51 @@
-from django.test import TestCase
+import io
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
 
+import openpyxl
+from rest_framework.test import APIClient
+
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import Appointment
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from common.tenant_cache import bump_tenant_version
+from labs.models import LabResult
+from patients.models import Patient
 from tenants.models import Tenant
+from users.models import CustomUser
+
+from .compaction import compact_events, compact_raw_events
+from .demographics import patient_demographics
+from .exports import CONTENT_TYPES
+from .hll import RELATIVE_ERROR, HyperLogLog
+from .models import (
+    AnalyticsEvent,
+    AnalyticsEventRollup,
+    AnalyticsExport,
+    DailyTenantMetrics,
+    ExecutiveSnapshot,
+)
+from .recorder import flush_buffer, get_buffer, record_event
+from .reports import (
+    daily_activity_series,
+    executive_context,
+    live_executive_figures,
+    user_activity_context,
+)
+from .rollups import refresh_daily_metrics, refresh_recent_daily_metrics
+from .snapshots import snapshot_figures, take_executive_snapshots
+from .tasks import generate_analytics_export
+
 
-from .models import AnalyticsEvent
+def chart_url(series):
+    return reverse("analytics_chart_data", args=[series])
 
 
 class AnalyticsEventModelTest(TestCase):
@@ -14,3 +57,559 @@ class AnalyticsEventModelTest(TestCase):
         event = AnalyticsEvent.objects.get(event_type="login")
         self.assertEqual(event.event_type, "login")
         self.assertEqual(event.tenant, self.tenant)
+
+
+class AnalyticsViewQueryTest(TestCase):
+    """Each analytics page costs a fixed number of queries per table."""
+
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(
+            name="Analytics Tenant", subdomain="analytics", plan="professional"
+        )
+        self.user = CustomUser.objects.create_user(
+            username="admin", password="testpass", tenant=self.tenant, role="admin"
+        )
+        self.client.force_login(self.user)
+        now = timezone.now()
+        for index in range(5):
+            patient = Patient.objects.create(
+                tenant=self.tenant,
+                first_name=f"Patient{index}",
+                last_name="Test",
+                date_of_birth=date(1950 + index * 10, 1, 1),
+            )
+            Appointment.objects.create(
+                tenant=self.tenant,
+                patient=patient,
+                scheduled_for=now - timedelta(days=index),
+                status="completed" if index % 2 else "scheduled",
+            )
+            ClinicalRecord.objects.create(tenant=self.tenant, patient=patient)
+            LabResult.objects.create(tenant=self.tenant, patient=patient, result="ok")
+            Payment.objects.create(tenant=self.tenant, patient=patient, amount=10)
+        refresh_recent_daily_metrics(days=7)
+        # Drop the login event so no buffered flush lands inside a query count.
+        get_buffer().clear()
+
+    def test_dashboard_uses_one_query_per_table(self):
+        # session + user + tenant, one aggregate for each of the six tables and
+        # one read of the active-patient sketches
+        with self.assertNumQueries(10):
+            response = self.client.get(reverse("analytics_dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total_patients"], 5)
+        self.assertEqual(response.context["active_patients_90d"], 5)
+        self.assertEqual(response.context["completed_appointments_30d"], 2)
+        self.assertEqual(response.context["payment_count"], 5)
+
+    def test_dashboard_served_from_cache_until_data_changes(self):
+        self.client.get(reverse("analytics_dashboard"))
+        # session + user + tenant only; the KPIs come from the tenant cache
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("analytics_dashboard"))
+        self.assertEqual(response.context["total_patients"], 5)
+        self.assertEqual(response.context["tenant"], self.tenant)
+
+        Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Late",
+            last_name="Arrival",
+            date_of_birth=date(1990, 1, 1),
+        )
+        response = self.client.get(reverse("analytics_dashboard"))
+        self.assertEqual(response.context["total_patients"], 6)
+
+    def test_active_patients_exact_mode_matches_sketches(self):
+        response = self.client.get(reverse("analytics_dashboard"), {"exact": "1"})
+        self.assertTrue(response.context["active_patients_exact"])
+        self.assertEqual(response.context["active_patients_90d"], 5)
+
+    def test_all_analytics_pages_render(self):
+        for name in [
+            "patient_analytics",
+            "appointment_analytics",
+            "revenue_analytics",
+            "user_activity_analytics",
+            "executive_summary",
+        ]:
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200, name)
+
+    def test_trends_read_from_rollups(self):
+        response = self.client.get(chart_url("patient-growth"))
+        self.assertEqual(response.json()["data"], [5])
+        response = self.client.get(chart_url("monthly-revenue"))
+        self.assertEqual(response.json()["data"], [50.0])
+        response = self.client.get(reverse("executive_summary"))
+        self.assertEqual(response.context["patients_current_month"], 5)
+
+    def test_chart_data_conditional_get(self):
+        response = self.client.get(chart_url("monthly-appointments"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(response.json()["data"]), 5)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        # session + user + tenant only: no chart queries for an unchanged series
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                chart_url("monthly-appointments"), HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+        bump_tenant_version(self.tenant.id)
+        response = self.client.get(
+            chart_url("monthly-appointments"), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        self.assertEqual(self.client.get(chart_url("no-such-chart")).status_code, 404)
+
+    def test_weekday_counts_start_on_monday(self):
+        response = self.client.get(reverse("appointment_analytics"))
+        by_day = response.context["appointments_by_day"]
+        self.assertEqual([item["day"] for item in by_day][0], "Monday")
+        self.assertEqual(sum(item["count"] for item in by_day), 5)
+        self.assertEqual(response.context["total_appointments"], 5)
+
+
+class DailyTenantMetricsRollupTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Rollup Tenant", subdomain="rollup")
+        self.other = Tenant.objects.create(name="Other Tenant", subdomain="other")
+        self.patient = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Ada",
+            last_name="Lovelace",
+            date_of_birth=date(1980, 1, 1),
+        )
+        Patient.objects.create(
+            tenant=self.other,
+            first_name="Grace",
+            last_name="Hopper",
+            date_of_birth=date(1970, 1, 1),
+        )
+        now = timezone.now()
+        for status in ["completed", "completed", "cancelled"]:
+            Appointment.objects.create(
+                tenant=self.tenant,
+                patient=self.patient,
+                scheduled_for=now,
+                status=status,
+            )
+        Payment.objects.create(tenant=self.tenant, patient=self.patient, amount="12.50")
+        Payment.objects.create(tenant=self.tenant, patient=self.patient, amount="7.50")
+
+    def test_refresh_counts_per_tenant_and_day(self):
+        refresh_recent_daily_metrics(days=1)
+        row = DailyTenantMetrics.objects.get(tenant=self.tenant)
+        self.assertEqual(row.day, timezone.now().date())
+        self.assertEqual(row.patients_created, 1)
+        self.assertEqual(row.appointments, 3)
+        self.assertEqual(row.appointments_completed, 2)
+        self.assertEqual(row.appointments_cancelled, 1)
+        self.assertEqual(
+            row.appointment_status_counts, {"completed": 2, "cancelled": 1}
+        )
+        self.assertEqual(row.payments, 2)
+        self.assertEqual(str(row.revenue), "20.00")
+        self.assertEqual(
+            DailyTenantMetrics.objects.get(tenant=self.other).patients_created, 1
+        )
+
+    def test_refresh_replaces_stale_rows(self):
+        today = timezone.now().date()
+        refresh_daily_metrics(today, today, tenant_ids=[self.tenant.id])
+        Appointment.objects.filter(tenant=self.tenant).delete()
+        Payment.objects.filter(tenant=self.tenant).delete()
+        self.patient.delete()
+        refresh_daily_metrics(today, today, tenant_ids=[self.tenant.id])
+        self.assertFalse(DailyTenantMetrics.objects.filter(tenant=self.tenant).exists())
+        # Scoped refreshes leave other tenants alone
+        self.assertFalse(DailyTenantMetrics.objects.filter(tenant=self.other).exists())
+
+
+class ExecutiveSnapshotTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(
+            name="Exec Tenant", subdomain="exec", plan="professional"
+        )
+        self.trial = Tenant.objects.create(name="Trial Tenant", subdomain="trial")
+        self.today = timezone.now().date()
+        yesterday = timezone.now() - timedelta(days=1)
+        self.patient = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Ada",
+            last_name="Lovelace",
+            date_of_birth=date(1980, 1, 1),
+        )
+        Patient.objects.filter(pk=self.patient.pk).update(created_at=yesterday)
+        for status in ["completed", "scheduled"]:
+            Appointment.objects.create(
+                tenant=self.tenant,
+                patient=self.patient,
+                scheduled_for=yesterday,
+                status=status,
+            )
+        payment = Payment.objects.create(
+            tenant=self.tenant, patient=self.patient, amount="40.00"
+        )
+        Payment.objects.filter(pk=payment.pk).update(timestamp=yesterday)
+
+    def test_snapshot_plus_today_matches_live_figures(self):
+        self.assertEqual(take_executive_snapshots(), 1)
+        snapshot = ExecutiveSnapshot.objects.get()
+        self.assertEqual(snapshot.tenant, self.tenant)
+        self.assertEqual(snapshot.total_patients, 1)
+
+        # Activity after the snapshot is added from today's rows only
+        Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Grace",
+            last_name="Hopper",
+            date_of_birth=date(1970, 1, 1),
+        )
+        Payment.objects.create(tenant=self.tenant, patient=self.patient, amount="10")
+        Appointment.objects.create(
+            tenant=self.tenant,
+            patient=self.patient,
+            scheduled_for=timezone.now() + timedelta(hours=1),
+        )
+        refresh_recent_daily_metrics(days=2)
+        figures = snapshot_figures(self.tenant, self.today)
+        self.assertEqual(figures, live_executive_figures(self.tenant, self.today))
+        self.assertEqual(executive_context(self.tenant)["total_patients"], 2)
+
+    def test_month_and_year_roll_over_on_the_first(self):
+        ExecutiveSnapshot.objects.create(
+            tenant=self.tenant,
+            day=date(2099, 12, 31),
+            total_patients=9,
+            patients_month_to_date=4,
+            patients_last_month=2,
+            revenue_month_to_date=300,
+            revenue_last_month=100,
+            revenue_year_to_date=5000,
+            appointments_month_to_date=8,
+            completed_appointments_month_to_date=6,
+        )
+        figures = snapshot_figures(self.tenant, date(2100, 1, 1))
+        self.assertEqual(figures["patients_current_month"], 0)
+        self.assertEqual(figures["patients_last_month"], 4)
+        self.assertEqual(figures["revenue_last_month"], 300)
+        self.assertEqual(figures["total_revenue_ytd"], 0)
+        self.assertEqual(figures["total_appointments"], 0)
+        self.assertEqual(figures["total_patients"], 9)
+        self.assertIsNone(snapshot_figures(self.tenant, date(2100, 1, 3)))
+
+
+@override_settings(ANALYTICS_EVENT_BUFFER="local")
+class AnalyticsExportTest(TestCase):
+    def setUp(self):
+        get_buffer().clear()
+        self.tenant = Tenant.objects.create(
+            name="Export Tenant", subdomain="export", plan="professional"
+        )
+        self.user = CustomUser.objects.create_user(
+            username="exporter",
+            password="testpass",
+            email="exporter@example.com",
+            tenant=self.tenant,
+            role="admin",
+        )
+        self.client.force_login(self.user)
+        for index, first_name in enumerate(["Ada", "=HYPERLINK()", "Grace"]):
+            patient = Patient.objects.create(
+                tenant=self.tenant,
+                first_name=first_name,
+                last_name="Test",
+                date_of_birth=date(1980, 1, 1),
+            )
+            Payment.objects.create(
+                tenant=self.tenant, patient=patient, amount=str(10 * (index + 1))
+            )
+        self.export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.export_root.cleanup)
+
+    def test_small_export_streams_csv(self):
+        response = self.client.get(reverse("analytics_export", args=["top-patients"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "patient_id,first_name,last_name,payments,total")
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[1].split(",")[1:4], ["Grace", "Test", "1"])
+        self.assertEqual(Decimal(lines[1].split(",")[4]), Decimal("30"))
+        # Spreadsheet formulas in names are neutralised
+        self.assertIn(",'=HYPERLINK(),", lines[2])
+        (event,) = [
+            event
+            for event in get_buffer().drain(10)
+            if event["event_type"] == "report_generated"
+        ]
+        self.assertEqual(event["metadata"]["rows"], 3)
+
+        missing = self.client.get(reverse("analytics_export", args=["no-such-report"]))
+        self.assertEqual(missing.status_code, 404)
+        bad_format = self.client.get(
+            reverse("analytics_export", args=["top-patients"]), {"format": "pdf"}
+        )
+        self.assertEqual(bad_format.status_code, 400)
+
+    def test_small_export_writes_xlsx(self):
+        response = self.client.get(
+            reverse("analytics_export", args=["top-patients"]), {"format": "xlsx"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], CONTENT_TYPES["xlsx"])
+        self.assertIn(".xlsx", response["Content-Disposition"])
+        workbook = openpyxl.load_workbook(
+            io.BytesIO(b"".join(response.streaming_content)), read_only=True
+        )
+        rows = list(workbook["top-patients"].iter_rows(values_only=True))
+        response.close()
+        self.assertEqual(
+            rows[0], ("patient_id", "first_name", "last_name", "payments", "total")
+        )
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][1:4], ("Grace", "Test", 1))
+        self.assertEqual(Decimal(str(rows[1][4])), Decimal("30"))
+        # Stored as text, not as a formula
+        self.assertEqual(rows[2][1], "'=HYPERLINK()")
+
+    def test_large_export_is_generated_in_background(self):
+        with self.settings(
+            ANALYTICS_EXPORT_ASYNC_ROWS=2, ANALYTICS_EXPORT_ROOT=self.export_root.name
+        ):
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.client.get(
+                    reverse("analytics_export", args=["top-patients"])
+                )
+            self.assertRedirects(response, reverse("analytics_exports"))
+            self.assertEqual(len(callbacks), 1)
+            export = AnalyticsExport.objects.get()
+            self.assertEqual(export.status, "pending")
+
+            generate_analytics_export(export.id)
+            export.refresh_from_db()
+            self.assertEqual(export.status, "ready")
+            self.assertEqual(export.row_count, 3)
+            self.assertEqual(len(mail.outbox), 1)
+            self.assertIn(
+                reverse("analytics_export_download", args=[export.id]),
+                mail.outbox[0].body,
+            )
+
+            url = reverse("analytics_export_download", args=[export.id])
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            content = b"".join(response.streaming_content).decode()
+            self.assertEqual(len(content.splitlines()), 4)
+            response.close()
+
+            other = Tenant.objects.create(
+                name="Other", subdomain="other-export", plan="professional"
+            )
+            outsider = CustomUser.objects.create_user(
+                username="outsider", password="testpass", tenant=other, role="admin"
+            )
+            self.client.force_login(outsider)
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(ANALYTICS_EVENT_BUFFER="local")
+class AnalyticsEventRecorderTest(TestCase):
+    def setUp(self):
+        get_buffer().clear()
+        self.tenant = Tenant.objects.create(name="Recorder Tenant", subdomain="rec")
+        self.user = CustomUser.objects.create_user(
+            username="doctor", password="testpass", tenant=self.tenant, role="doctor"
+        )
+        self.patient = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Ada",
+            last_name="Lovelace",
+            date_of_birth=date(1980, 1, 1),
+        )
+
+    def buffered_types(self):
+        return [event["event_type"] for event in get_buffer()._events]
+
+    def test_events_are_buffered_not_inserted(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("patient_detail", args=[self.patient.pk]))
+        self.client.post(
+            reverse("patient_create"),
+            {
+                "first_name": "Grace",
+                "last_name": "Hopper",
+                "date_of_birth": "1990-12-09",
+            },
+        )
+        self.assertEqual(
+            self.buffered_types(), ["login", "patient_view", "patient_create"]
+        )
+        self.assertFalse(AnalyticsEvent.objects.exists())
+
+        self.assertEqual(flush_buffer(), 3)
+        view = AnalyticsEvent.objects.get(event_type="patient_view")
+        self.assertEqual(view.user_id, self.user.pk)
+        self.assertEqual(view.metadata, {"object_id": self.patient.pk})
+
+    def test_writes_outside_requests_are_not_recorded(self):
+        self.assertEqual(self.buffered_types(), [])
+
+    @override_settings(ANALYTICS_EVENT_FLUSH_SIZE=2)
+    def test_flush_writes_in_bulk_batches(self):
+        recorded_at = timezone.now() - timedelta(minutes=5)
+        for _ in range(5):
+            record_event("report_generated", self.tenant.id, self.user.pk)
+        get_buffer()._events[0]["timestamp"] = recorded_at
+        with self.assertNumQueries(3):
+            self.assertEqual(flush_buffer(), 5)
+        self.assertEqual(len(get_buffer()), 0)
+        # The buffered timestamp survives the delayed insert.
+        self.assertEqual(
+            AnalyticsEvent.objects.earliest("timestamp").timestamp, recorded_at
+        )
+
+    @override_settings(ANALYTICS_EVENT_FLUSH_SIZE=1)
+    def test_full_buffer_flushes_when_request_finishes(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("patient_detail", args=[self.patient.pk]))
+        self.assertEqual(
+            sorted(AnalyticsEvent.objects.values_list("event_type", flat=True)),
+            ["login", "patient_view"],
+        )
+
+
+class AnalyticsEventCompactionTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Compaction Tenant", subdomain="cmp")
+        now = timezone.now().replace(minute=30)
+        self.events = [
+            # (days ago, event type, user)
+            (0, "login", 1),
+            (1, "patient_view", 2),
+            (40, "login", 1),
+            (40, "login", 1),
+            (40, "patient_view", 1),
+            (40, "patient_view", None),
+            (200, "login", 2),
+            (200, "login", 2),
+            (800, "logout", 3),
+        ]
+        for days, event_type, user_id in self.events:
+            AnalyticsEvent.objects.create(
+                tenant=self.tenant,
+                event_type=event_type,
+                user_id=user_id,
+                timestamp=now - timedelta(days=days),
+            )
+
+    def test_compaction_keeps_activity_totals(self):
+        before = user_activity_context(self.tenant)
+        timeline = daily_activity_series(self.tenant)
+        processed = compact_events()
+
+        self.assertEqual(processed["raw_events"], 7)
+        self.assertEqual(AnalyticsEvent.objects.count(), 2)
+        self.assertEqual(
+            sorted(
+                AnalyticsEventRollup.objects.values_list(
+                    "granularity", "event_type", "user_id", "count"
+                ),
+                key=str,
+            ),
+            sorted(
+                [
+                    ("hour", "login", 1, 2),
+                    ("hour", "patient_view", 1, 1),
+                    ("hour", "patient_view", None, 1),
+                    ("day", "login", 2, 2),
+                ],
+                key=str,
+            ),
+        )
+
+        after = user_activity_context(self.tenant)
+        # Only the expired 800-day-old logout is gone.
+        self.assertEqual(after["total_events"], before["total_events"] - 1)
+        self.assertEqual(after["total_events"], len(self.events) - 1)
+        self.assertEqual(daily_activity_series(self.tenant), timeline)
+        self.assertEqual(after["user_activity"][0], {"user_id": 1, "count": 4})
+
+    def test_chunks_merge_into_existing_rollups(self):
+        cutoff = timezone.now() - timedelta(days=30)
+        self.assertEqual(compact_raw_events(cutoff, chunk_size=2), 7)
+        logins = AnalyticsEventRollup.objects.get(event_type="login", user_id=1)
+        self.assertEqual(logins.count, 2)
+
+
+class PatientDemographicsTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Demo Tenant", subdomain="demo")
+        for dob, gender in [
+            (date(2008, 6, 2), "F"),  # 18 until tomorrow
+            (date(2008, 6, 1), "M"),  # 18 today: exact ages, not 365-day years
+            (date(1990, 1, 1), "F"),
+            (date(1990, 1, 1), "F"),
+            (date(1950, 2, 28), None),
+        ]:
+            Patient.objects.create(
+                tenant=self.tenant,
+                first_name="P",
+                last_name="Q",
+                date_of_birth=dob,
+                gender=gender,
+            )
+
+    def test_histogram_gender_split_and_crosstab(self):
+        with self.assertNumQueries(1):
+            result = patient_demographics(
+                Patient.objects.filter(tenant=self.tenant),
+                edges=(0, 18, 65),
+                today=date(2026, 6, 1),
+            )
+        self.assertEqual(result["total"], 5)
+        self.assertEqual(
+            [(item["label"], item["count"]) for item in result["age_distribution"]],
+            [("0-17", 1), ("18-64", 3), ("65+", 1)],
+        )
+        genders = {
+            item["gender"]: item["count"] for item in result["gender_distribution"]
+        }
+        self.assertEqual(genders, {"M": 1, "F": 3, "O": 0, "P": 0, "": 1})
+        self.assertEqual(result["age_by_gender"][1]["counts"]["F"], 2)
+        self.assertEqual(result["age_by_gender"][1]["counts"]["M"], 1)
+
+    def test_api_accepts_custom_age_edges(self):
+        user = CustomUser.objects.create_user(
+            username="api", password="testpass", tenant=self.tenant
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get("/api/v1/dashboard/demographics/", {"age_edges": "0,50"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["label"] for item in response.data["age_distribution"]],
+            ["0-49", "50+"],
+        )
+        response = client.get("/api/v1/dashboard/demographics/", {"age_edges": "50,10"})
+        self.assertEqual(response.status_code, 400)
+
+
+class HyperLogLogTest(TestCase):
+    def test_estimate_within_error_bound_and_merges(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        first.add(range(0, 60000))
+        second.add(range(30000, 90000))
+        merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+        # Three standard errors: fails by chance far less than 1% of the time.
+        self.assertAlmostEqual(merged.count(), 90000, delta=90000 * 3 * RELATIVE_ERROR)
+        small = HyperLogLog()
+        small.add([7, 7, 8, 9])
+        self.assertEqual(small.count(), 3)
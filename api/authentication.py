@@ -0,0 +1,146 @@
+"""
+JWT authentication without per-request user and tenant queries.
+
+``ClaimsJWTAuthentication`` verifies the token as simplejwt does, then builds
+``request.user`` from cached copies of the user's and the tenant's rows
+instead of reading them from the database. The user comes with its tenant
+already attached, so ``request.user.tenant`` costs nothing either. The
+denylist entry, the user and the tenant are read from the cache in one
+round trip; on a miss both rows are loaded with a single query and cached
+for ``API_AUTH_CACHE_TIMEOUT`` seconds. Saving or deleting a user or tenant
+drops its cached row (``api.signals``), so with a shared cache changes apply
+at once and otherwise within the timeout.
+
+Tokens are revoked by putting their ``jti`` on a denylist in the cache until
+they would have expired anyway (``revoke_token``), which the logout and
+token refresh endpoints do.
+"""
+import math
+import time
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+
+from tenants.models import Tenant
+
+USER_KEY = "auth:user:{}"
+TENANT_KEY = "auth:tenant:{}"
+DENYLIST_KEY = "auth:denylist:{}"
+
+# Never copied into the cache; reading it from a cached user loads it
+UNCACHED_USER_FIELDS = {"password"}
+
+
+def revoke_token(token):
+    """Refuse a validated simplejwt token from now until it expires."""
+    remaining = token["exp"] - time.time()
+    if remaining > 0:
+        key = DENYLIST_KEY.format(token[api_settings.JTI_CLAIM])
+        cache.set(key, True, math.ceil(remaining))
+
+
+def is_revoked(token):
+    return cache.get(DENYLIST_KEY.format(token[api_settings.JTI_CLAIM])) is not None
+
+
+def forget_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+def forget_tenant(tenant_id):
+    cache.delete(TENANT_KEY.format(tenant_id))
+
+
+def _record(instance, exclude=()):
+    """Column values of ``instance`` in field order, for ``_from_record``."""
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname not in exclude
+    }
+
+
+def _from_record(model, record):
+    # Fields left out of the record are deferred, as with .only()
+    return model.from_db(router.db_for_read(model), list(record), list(record.values()))
+
+
+def load_user(user_id, cached=None):
+    """
+    The user with ``user_id`` and its tenant, from the cache or else one
+    query, or None. ``cached`` is a ``cache.get_many()`` result that already
+    covers the user's key and perhaps the tenant's.
+    """
+    user_key = USER_KEY.format(user_id)
+    if cached is None:
+        cached = cache.get_many([user_key])
+    user_record = cached.get(user_key)
+    tenant_record = None
+    if user_record is not None:
+        tenant_key = TENANT_KEY.format(user_record["tenant_id"])
+        tenant_record = cached.get(tenant_key) or cache.get(tenant_key)
+
+    if user_record is None or tenant_record is None:
+        User = get_user_model()
+        try:
+            user = User.objects.select_related("tenant").get(pk=user_id)
+        except (User.DoesNotExist, ValueError, TypeError):
+            return None
+        user_record = _record(user, exclude=UNCACHED_USER_FIELDS)
+        tenant_record = _record(user.tenant)
+        cache.set_many(
+            {
+                user_key: user_record,
+                TENANT_KEY.format(user.tenant_id): tenant_record,
+            },
+            settings.API_AUTH_CACHE_TIMEOUT,
+        )
+
+    user = _from_record(get_user_model(), user_record)
+    user.tenant = _from_record(Tenant, tenant_record)
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication reading the user and tenant from the cache."""
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Needs the password hash, which isn't cached
+            if is_revoked(validated_token):
+                raise InvalidToken(_("Token has been revoked"))
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        # The tenant claim is a guess at the user's tenant that lets the
+        # denylist, user and tenant be read in one go
+        tenant_claim = validated_token.get("tenant_id")
+        deny_key = DENYLIST_KEY.format(validated_token[api_settings.JTI_CLAIM])
+        keys = [deny_key, USER_KEY.format(user_id)]
+        if tenant_claim is not None:
+            keys.append(TENANT_KEY.format(tenant_claim))
+        cached = cache.get_many(keys)
+        if deny_key in cached:
+            raise InvalidToken(_("Token has been revoked"))
+
+        user = load_user(user_id, cached)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if tenant_claim is not None and str(tenant_claim) != str(user.tenant_id):
+            # Issued before the user moved to another tenant
+            raise AuthenticationFailed(
+                _("Token tenant mismatch"), code="tenant_mismatch"
+            )
+        return user
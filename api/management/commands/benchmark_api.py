@@ -0,0 +1,110 @@
+"""
+Management command to benchmark the api/v1 list endpoints for one tenant.
+Usage: python manage.py benchmark_api <tenant_id> [--page-size 100] [--repeat 5]
+
+Requests one page of each list endpoint in full and with a sparse fieldset
+(``?fields=``) as an admin of the tenant, through both the model-instance
+serializers and the ``.values()`` fast path, and reports the SQL queries,
+the columns selected by the list query, the JSON payload size and the mean
+wall-clock time of each variant against the configured database.
+"""
+import time
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from api.v1.views import (
+    AppointmentViewSet,
+    ClinicalRecordViewSet,
+    LabResultViewSet,
+    PatientViewSet,
+)
+from tenants.models import Tenant
+from users.models import CustomUser
+
+BENCHMARKED_ENDPOINTS = [
+    ("patients", PatientViewSet, "id,full_name"),
+    ("appointments", AppointmentViewSet, "id,patient,scheduled_for,status"),
+    ("clinical-records", ClinicalRecordViewSet, "id,patient,note_type,created_at"),
+    ("lab-results", LabResultViewSet, "id,patient,created_at"),
+]
+
+
+class Command(BaseCommand):
+    help = "Measure queries, payload size and latency of the api/v1 list endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tenant_id", type=int, help="Tenant ID")
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=100,
+            help="Results per page (default: 100)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of timed requests per variant (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(id=options["tenant_id"])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant_id']} does not exist")
+        user = (
+            CustomUser.objects.filter(tenant=tenant, is_active=True)
+            .order_by("id")
+            .first()
+        )
+        if user is None:
+            raise CommandError(f"Tenant {tenant.id} has no active user")
+
+        # Requests are built in-process, so the test host name must be accepted
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            self._benchmark(user, max(1, options["repeat"]), options["page_size"])
+
+    def _benchmark(self, user, repeat, page_size):
+        factory = APIRequestFactory()
+        self.stdout.write(
+            f"{'endpoint':<18}{'variant':<9}{'path':<8}{'queries':>8}{'columns':>9}"
+            f"{'bytes':>10}{'mean ms':>10}"
+        )
+        for name, viewset, sparse_fields in BENCHMARKED_ENDPOINTS:
+            view = viewset.as_view({"get": "list"})
+            for variant, params in [
+                ("full", {}),
+                ("sparse", {"fields": sparse_fields}),
+            ]:
+                params = dict(params, page_size=page_size)
+                for path, fast in [("model", False), ("values", True)]:
+                    timings = []
+                    with override_settings(API_FAST_LIST_SERIALIZATION=fast):
+                        for _ in range(repeat):
+                            request = factory.get(f"/api/v1/{name}/", params)
+                            force_authenticate(request, user=user)
+                            with CaptureQueriesContext(connection) as queries:
+                                started = time.perf_counter()
+                                response = view(request)
+                                response.render()
+                                timings.append(time.perf_counter() - started)
+                    mean_ms = sum(timings) / len(timings) * 1000
+                    self.stdout.write(
+                        f"{name:<18}{variant:<9}{path:<8}{len(queries):>8}"
+                        f"{self._list_columns(queries):>9}"
+                        f"{len(response.content):>10}{mean_ms:>10.1f}"
+                    )
+
+    def _list_columns(self, queries):
+        """Number of columns in the widest SELECT (the page query)."""
+        widest = 0
+        for query in queries.captured_queries:
+            sql = query["sql"]
+            if sql.startswith("SELECT") and " FROM " in sql:
+                select_list = sql[len("SELECT ") : sql.index(" FROM ")]
+                widest = max(widest, select_list.count(",") + 1)
+        return widest
@@ -0,0 +1,126 @@
+"""
+Negotiated response compression for the API.
+
+``ResponseCompressionMiddleware`` compresses responses under
+``API_COMPRESSION_PATH_PREFIX`` with brotli or gzip, whichever the client
+ranks higher in Accept-Encoding (brotli wins ties and is only offered when
+the ``brotli`` package is installed). Responses smaller than
+``API_COMPRESSION_MIN_SIZE`` are sent as they are; streaming responses are
+compressed chunk by chunk so they are never buffered whole.
+"""
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    # Only gzip is offered when brotli isn't installed
+    brotli = None
+
+# Random bytes in the gzip header, as in Django's GZipMiddleware (BREACH)
+GZIP_MAX_RANDOM_BYTES = 100
+
+accept_encoding_re = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$")
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=settings.API_BROTLI_QUALITY)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+CODINGS = {
+    "br": (
+        lambda content: brotli.compress(content, quality=settings.API_BROTLI_QUALITY),
+        _brotli_sequence,
+    ),
+    "gzip": (
+        lambda content: compress_string(
+            content, max_random_bytes=GZIP_MAX_RANDOM_BYTES
+        ),
+        lambda sequence: compress_sequence(
+            sequence, max_random_bytes=GZIP_MAX_RANDOM_BYTES
+        ),
+    ),
+}
+
+
+def available_codings():
+    """Content codings this process can produce, most preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    The coding to use for an Accept-Encoding header, or None for identity.
+    Higher q-values win; between equal ones the server's preference does.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        match = accept_encoding_re.match(item)
+        if not match:
+            continue
+        try:
+            weights[match[1].lower()] = float(match[2]) if match[2] else 1.0
+        except ValueError:
+            continue
+    best, best_q = None, 0.0
+    for coding in available_codings():
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class ResponseCompressionMiddleware:
+    """Compresses API responses with the client's preferred coding."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path.startswith(settings.API_COMPRESSION_PATH_PREFIX):
+            return response
+        return self.compress(request, response)
+
+    def compress(self, request, response):
+        # Async streams only occur under ASGI; leave them alone
+        if response.streaming and response.is_async:
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+        if not response.streaming and (
+            len(response.content) < settings.API_COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+
+        compress_content, compress_stream = CODINGS[coding]
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content)
+            # The length of the compressed stream is unknown
+            del response.headers["Content-Length"]
+        else:
+            compressed = compress_content(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The body changed, so a strong ETag no longer identifies it
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = coding
+        return response
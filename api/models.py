@@ -0,0 +1,33 @@
+from django.db import models
+from django.utils import timezone
+
+from tenants.models import Tenant
+
+
+class Tombstone(models.Model):
+    """
+    Marks a synced object as deleted so /api/v1/sync/ can tell clients to
+    drop their copy. Written by ``api.signals``; purged after
+    ``API_SYNC_TOMBSTONE_DAYS``.
+    """
+
+    # No database constraint: tombstones are written while a tenant's data
+    # is deleted, possibly in the same transaction as the tenant itself.
+    tenant = models.ForeignKey(
+        Tenant,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    resource = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Change feed of /api/v1/sync/: (tenant, deleted_at, id)
+            models.Index(fields=["tenant", "deleted_at", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} {self.object_id} deleted at {self.deleted_at}"
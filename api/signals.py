@@ -0,0 +1,47 @@
+"""
+Signal handlers that record deletes for the /api/v1/sync/ change feed and
+drop the user and tenant rows cached by ``api.authentication``.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+
+from tenants.models import Tenant
+
+from .authentication import forget_tenant, forget_user
+from .models import Tombstone
+from .v1.sync import RESOURCE_NAMES
+
+
+def record_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        tenant_id=instance.tenant_id,
+        resource=RESOURCE_NAMES[sender],
+        object_id=instance.pk,
+    )
+
+
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+def forget_cached_tenant(sender, instance, **kwargs):
+    forget_tenant(instance.pk)
+
+
+def connect_signals():
+    for model in RESOURCE_NAMES:
+        post_delete.connect(
+            record_tombstone,
+            sender=model,
+            dispatch_uid=f"api_tombstone_{model._meta.label_lower}",
+        )
+    User = get_user_model()
+    for name, signal in [("save", post_save), ("delete", post_delete)]:
+        signal.connect(
+            forget_cached_user, sender=User, dispatch_uid=f"api_forget_user_{name}"
+        )
+        signal.connect(
+            forget_cached_tenant,
+            sender=Tenant,
+            dispatch_uid=f"api_forget_tenant_{name}",
+        )
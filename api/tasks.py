@@ -0,0 +1,15 @@
+import logging
+
+from celery import shared_task
+
+from api.v1.sync import purge_tombstones
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def purge_sync_tombstones():
+    """Drop tombstones older than the sync retention period."""
+    deleted = purge_tombstones()
+    logger.info("Sync tombstones purged", extra={"tombstones": deleted})
+    return {"tombstones": deleted}
@@ -0,0 +1,909 @@
+import gzip
+import io
+import uuid
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import Serializer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from api.middleware import ResponseCompressionMiddleware, negotiate_encoding
+from api.models import Tombstone
+from api.tasks import purge_sync_tombstones
+from api.throttling import LocalBuckets, get_store
+from api.v1.parsers import ORJSONParser
+from api.v1.renderers import ORJSONRenderer
+from api.v1.views import PatientViewSet
+from appointments.models import Appointment
+from audit_logs.models import AuditLog
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+from patients.sections import section_counts
+from tenants.models import Tenant
+from users.models import CustomUser
+
+
+class APITenantTestCase(TestCase):
+    """A tenant, one of its users and an API client authenticated as them."""
+
+    tenant_name = "API Tenant"
+    subdomain = "api"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(
+            name=cls.tenant_name, subdomain=cls.subdomain
+        )
+        cls.user = CustomUser.objects.create_user(
+            username=f"{cls.subdomain}-user", password="testpass", tenant=cls.tenant
+        )
+
+    def setUp(self):
+        # Throttle buckets outlive the test transactions
+        get_store().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class KeysetPaginationTest(APITenantTestCase):
+    def setUp(self):
+        super().setUp()
+        other = Tenant.objects.create(name="Other Tenant", subdomain="api-other")
+        created_at = timezone.now()
+        for index in range(7):
+            patient = Patient.objects.create(
+                tenant=self.tenant,
+                # Repeated names exercise the id tie-breaker
+                first_name=f"Name{index // 3}",
+                last_name=f"Patient{index}",
+                date_of_birth=date(1980, 1, 1),
+            )
+            # Two patients share each creation time
+            Patient.objects.filter(pk=patient.pk).update(
+                created_at=created_at - timedelta(minutes=index // 2)
+            )
+            Appointment.objects.create(
+                tenant=self.tenant, patient=patient, scheduled_for=created_at
+            )
+        Patient.objects.create(
+            tenant=other,
+            first_name="Hidden",
+            last_name="Patient",
+            date_of_birth=date(1980, 1, 1),
+        )
+
+    def walk(self, url, params):
+        ids, pages = [], []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            ids.extend(row["id"] for row in response.data["results"])
+            if not response.data["next"]:
+                return ids, pages
+            response = self.client.get(response.data["next"])
+
+    def test_cursor_pages_cover_every_row_once(self):
+        for ordering in ["-created_at", "first_name", "-first_name"]:
+            ids, pages = self.walk(
+                "/api/v1/patients/",
+                {"cursor": "", "page_size": 3, "ordering": ordering},
+            )
+            tie_breaker = "-id" if ordering.startswith("-") else "id"
+            expected = list(
+                Patient.objects.filter(tenant=self.tenant)
+                .order_by(ordering, tie_breaker)
+                .values_list("id", flat=True)
+            )
+            self.assertEqual(ids, expected, ordering)
+            self.assertEqual(len(pages), 3)
+            self.assertNotIn("count", pages[0])
+            self.assertIsNone(pages[0]["previous"])
+
+        # Following "previous" from the last page returns the middle page
+        response = self.client.get(pages[-1]["previous"])
+        self.assertEqual(response.data["results"], pages[1]["results"])
+        self.assertIsNotNone(response.data["previous"])
+
+    def test_no_count_query_unless_total_requested(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/v1/appointments/", {"cursor": "", "page_size": 2})
+        self.assertFalse(
+            any("COUNT(" in query["sql"].upper() for query in queries.captured_queries)
+        )
+        response = self.client.get(
+            "/api/v1/appointments/", {"cursor": "", "page_size": 2, "total": "approx"}
+        )
+        self.assertEqual(response.data["count"], 7)
+        self.assertNotIn("total=", response.data["next"])
+
+    def test_lists_keep_page_number_shape_without_cursor(self):
+        response = self.client.get("/api/v1/patients/", {"page_size": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data), ["count", "next", "previous", "results"])
+        self.assertEqual(response.data["count"], 7)
+        self.assertIn("page=2", response.data["next"])
+        self.assertNotIn("cursor=", response.data["next"])
+
+        response = self.client.get("/api/v1/patients/", {"page": 2, "page_size": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 7)
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertIn("page=3", response.data["next"])
+
+    def test_invalid_or_mismatched_cursor_is_rejected(self):
+        response = self.client.get("/api/v1/patients/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+        first = self.client.get("/api/v1/patients/", {"cursor": "", "page_size": 3})
+        cursor = first.data["next"].split("cursor=")[1].split("&")[0]
+        response = self.client.get(
+            "/api/v1/patients/", {"cursor": cursor, "ordering": "first_name"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsetTest(APITenantTestCase):
+    tenant_name = "Sparse Tenant"
+    subdomain = "sparse"
+
+    def setUp(self):
+        super().setUp()
+        self.patient = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Ada",
+            last_name="Lovelace",
+            date_of_birth=date(1980, 1, 1),
+        )
+        ClinicalRecord.objects.create(
+            tenant=self.tenant,
+            patient=self.patient,
+            note="n" * 500,
+            chief_complaint="Headache",
+        )
+
+    def test_fields_trim_payload_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/api/v1/clinical-records/", {"fields": "id,patient,note_type"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.data["results"][0]), ["id", "patient", "note_type"]
+        )
+        page_query = queries.captured_queries[-1]["sql"]
+        self.assertNotIn("chief_complaint", page_query)
+        self.assertNotIn('"note"', page_query)
+
+        response = self.client.get("/api/v1/patients/", {"fields": "id,full_name"})
+        self.assertEqual(
+            response.data["results"],
+            [{"id": self.patient.id, "full_name": "Ada Lovelace"}],
+        )
+
+    def test_exclude_and_unknown_fields(self):
+        response = self.client.get(
+            "/api/v1/clinical-records/", {"exclude": "note,plan,patient_name"}
+        )
+        row = response.data["results"][0]
+        self.assertNotIn("note", row)
+        self.assertNotIn("patient_name", row)
+        self.assertEqual(row["chief_complaint"], "Headache")
+
+        response = self.client.get("/api/v1/patients/", {"fields": "id,ssn"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ssn", str(response.data["fields"]))
+
+    def test_writes_ignore_sparse_fieldsets(self):
+        response = self.client.post(
+            "/api/v1/patients/?fields=id",
+            {
+                "first_name": "Grace",
+                "last_name": "Hopper",
+                "date_of_birth": "1970-01-01",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["first_name"], "Grace")
+
+
+class ListQueryCountTest(APITenantTestCase):
+    """A list page runs the same queries whatever its size (no N+1)."""
+
+    endpoints = {
+        "/api/v1/patients/": "id,full_name",
+        "/api/v1/appointments/": "id,patient_name",
+        "/api/v1/clinical-records/": "id,patient_name",
+        "/api/v1/lab-results/": "id,patient_name",
+    }
+    tenant_name = "Count Tenant"
+    subdomain = "count"
+
+    def setUp(self):
+        super().setUp()
+        for index in range(6):
+            patient = Patient.objects.create(
+                tenant=self.tenant,
+                first_name=f"Name{index}",
+                last_name="Patient",
+                date_of_birth=date(1980, 1, 1),
+            )
+            Appointment.objects.create(
+                tenant=self.tenant, patient=patient, scheduled_for=timezone.now()
+            )
+            ClinicalRecord.objects.create(tenant=self.tenant, patient=patient, note="n")
+            LabResult.objects.create(tenant=self.tenant, patient=patient, result="ok")
+
+    def assertConstantQueries(self, url, params=None):
+        counts = []
+        for page_size in (1, 6):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    url, {"page_size": page_size, **(params or {})}
+                )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["results"]), page_size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1], f"{url} {params or ''}")
+
+    def test_list_pages(self):
+        for url, fields in self.endpoints.items():
+            self.assertConstantQueries(url)
+            self.assertConstantQueries(url, {"fields": fields})
+            self.assertConstantQueries(url, {"page": 1})
+
+
+class FastListSerializationTest(APITenantTestCase):
+    tenant_name = "Fast Tenant"
+    subdomain = "fast"
+
+    def setUp(self):
+        super().setUp()
+        for index, (email, gender) in enumerate(
+            [("zoë@example.com", "F"), (None, "M"), ("", "O")] * 2
+        ):
+            patient = Patient.objects.create(
+                tenant=self.tenant,
+                first_name=f"Zoë{index}",
+                last_name="" if index == 2 else "O'Brien",
+                date_of_birth=date(1980, 2, 29),
+                email=email,
+                gender=gender,
+            )
+            Appointment.objects.create(
+                tenant=self.tenant, patient=patient, scheduled_for=timezone.now()
+            )
+            ClinicalRecord.objects.create(
+                tenant=self.tenant, patient=patient, note='Line\n"quoted"', plan=None
+            )
+            LabResult.objects.create(tenant=self.tenant, patient=patient, result="ok")
+
+    def fetch(self, url, params, fast):
+        with override_settings(API_FAST_LIST_SERIALIZATION=fast):
+            if not fast:
+                return self.client.get(url, params)
+            with mock.patch.object(
+                Serializer, "to_representation", side_effect=AssertionError
+            ):
+                return self.client.get(url, params)
+
+    def test_fast_path_output_is_byte_identical(self):
+        variants = [
+            {},
+            {"page_size": 4, "ordering": "created_at"},
+            {"exclude": "created_at"},
+            {"page": 2, "page_size": 4},
+        ]
+        for url, fields in ListQueryCountTest.endpoints.items():
+            for params in variants + [{"fields": fields}]:
+                regular = self.fetch(url, params, fast=False)
+                fast = self.fetch(url, params, fast=True)
+                self.assertEqual(regular.status_code, 200)
+                self.assertEqual(fast.content, regular.content, f"{url} {params}")
+
+            # Cursors from the fast path page the same way
+            first = self.fetch(url, {"page_size": 4}, fast=True)
+            second = self.fetch(first.data["next"], {}, fast=True)
+            self.assertEqual(len(second.data["results"]), 2)
+
+
+class ORJSONRendererTest(SimpleTestCase):
+    payload = {
+        "amount": Decimal("12.50"),
+        "day": date(2024, 2, 29),
+        "at": datetime(2024, 5, 1, 8, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "label": gettext_lazy("Patients"),
+        "text": 'Zoë \u2028 "quoted"',
+        "nested": [{"empty": None, 1: True}, 1.5, -3],
+    }
+
+    def test_output_matches_drf_json_renderer(self):
+        self.assertEqual(
+            ORJSONRenderer().render(self.payload), JSONRenderer().render(self.payload)
+        )
+        self.assertEqual(
+            ORJSONRenderer().render(self.payload, "application/json; indent=2"),
+            JSONRenderer().render(self.payload, "application/json; indent=2"),
+        )
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_parser(self):
+        body = ORJSONRenderer().render({"name": "Zoë", "values": [1, 2.5, None]})
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(body)),
+            {"name": "Zoë", "values": [1, 2.5, None]},
+        )
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"name": NaN}'))
+
+
+@override_settings(API_COMPRESSION_MIN_SIZE=200)
+class ResponseCompressionTest(APITenantTestCase):
+    tenant_name = "Gzip Tenant"
+    subdomain = "gzip"
+
+    def setUp(self):
+        super().setUp()
+        for index in range(10):
+            Patient.objects.create(
+                tenant=self.tenant,
+                first_name=f"Name{index}",
+                last_name="Patient",
+                date_of_birth=date(1980, 1, 1),
+            )
+
+    def test_api_responses_are_gzipped_when_accepted(self):
+        plain = self.client.get("/api/v1/patients/")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+        response = self.client.get(
+            "/api/v1/patients/", HTTP_ACCEPT_ENCODING="br;q=0.5, gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+
+        small = self.client.get(
+            "/api/v1/patients/",
+            {"fields": "id", "page_size": 1},
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertFalse(small.has_header("Content-Encoding"))
+
+    def test_streaming_responses_are_compressed_per_chunk(self):
+        chunks = [b"x" * 1000, b"y" * 1000]
+        middleware = ResponseCompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks))
+        )
+        request = RequestFactory().get("/api/v1/export/", HTTP_ACCEPT_ENCODING="gzip")
+        response = middleware(request)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)), b"".join(chunks)
+        )
+
+        # Other paths are left alone
+        middleware = ResponseCompressionMiddleware(
+            lambda request: HttpResponse(b"x" * 1000)
+        )
+        request = RequestFactory().get("/patients/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(middleware(request).has_header("Content-Encoding"))
+
+    def test_negotiation(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(negotiate_encoding("*"), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0, identity"))
+        self.assertIsNone(negotiate_encoding(""))
+        with mock.patch("api.middleware.brotli", object()):
+            self.assertEqual(negotiate_encoding("gzip, br"), "br")
+            self.assertEqual(negotiate_encoding("gzip, br;q=0.8"), "gzip")
+
+
+class BulkWriteTest(APITenantTestCase):
+    tenant_name = "Bulk Tenant"
+    subdomain = "bulk"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = Tenant.objects.create(name="Other Bulk", subdomain="bulk-other")
+
+    def patient(self, tenant=None, **kwargs):
+        return Patient.objects.create(
+            tenant=tenant or self.tenant,
+            first_name=kwargs.pop("first_name", "Ada"),
+            last_name="Lovelace",
+            date_of_birth=date(1980, 1, 1),
+            **kwargs,
+        )
+
+    def items(self, count):
+        return [
+            {
+                "first_name": f"Name{i}",
+                "last_name": "Bulk",
+                "date_of_birth": "1990-01-01",
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_writes_rows_and_audit_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/v1/patients/bulk/", self.items(25), format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["count"], 25)
+        patients = Patient.objects.filter(tenant=self.tenant)
+        self.assertEqual(sorted(response.data["ids"]), sorted(p.pk for p in patients))
+        audits = AuditLog.objects.filter(action="patient_created", tenant=self.tenant)
+        self.assertEqual(audits.count(), 25)
+        self.assertEqual(audits.filter(user=self.user).count(), 25)
+        inserts = [
+            q["sql"] for q in queries.captured_queries if q["sql"].startswith("INSERT")
+        ]
+        self.assertEqual(len(inserts), 2)
+
+    def test_invalid_items_are_reported_and_nothing_is_written(self):
+        items = self.items(3)
+        items[1]["date_of_birth"] = "not-a-date"
+        del items[2]["last_name"]
+        response = self.client.post("/api/v1/patients/bulk/", items, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1, 2])
+        self.assertIn("date_of_birth", response.data["errors"][0]["errors"])
+        self.assertFalse(Patient.objects.exists())
+        self.assertFalse(AuditLog.objects.exists())
+
+        with override_settings(API_BULK_MAX_ITEMS=2):
+            response = self.client.post(
+                "/api/v1/patients/bulk/", self.items(3), format="json"
+            )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/v1/patients/bulk/", {}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_relations_are_checked_once_and_scoped_to_the_tenant(self):
+        own = [self.patient(first_name=f"Own{i}") for i in range(10)]
+        foreign = self.patient(tenant=self.other)
+
+        def post(patients):
+            items = [
+                {"patient": patient.pk, "scheduled_for": "2024-03-01T09:00:00Z"}
+                for patient in patients
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    "/api/v1/appointments/bulk/", items, format="json"
+                )
+            return response, len(queries)
+
+        response, small = post(own[:2])
+        self.assertEqual(response.status_code, 201)
+        response, large = post(own)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(small, large)
+
+        response, _ = post([own[0], foreign])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+        self.assertIn("patient", response.data["errors"][0]["errors"])
+
+    def test_bulk_writes_refresh_patient_section_counts(self):
+        first, second = self.patient(), self.patient(first_name="Grace")
+        self.assertEqual(section_counts(first)["appointments"], 0)
+        self.assertEqual(section_counts(second)["appointments"], 0)
+
+        response = self.client.post(
+            "/api/v1/appointments/bulk/",
+            [{"patient": first.pk, "scheduled_for": "2024-03-01T09:00:00Z"}] * 3,
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(section_counts(first)["appointments"], 3)
+
+        moved = response.data["ids"][0]
+        response = self.client.patch(
+            "/api/v1/appointments/bulk/",
+            [{"id": moved, "patient": second.pk}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(section_counts(first)["appointments"], 2)
+        self.assertEqual(section_counts(second)["appointments"], 1)
+
+    def test_bulk_update(self):
+        first, second = self.patient(), self.patient(first_name="Grace")
+        foreign = self.patient(tenant=self.other)
+        response = self.client.patch(
+            "/api/v1/patients/bulk/",
+            [{"id": first.pk, "phone": "555-0100"}, {"id": foreign.pk, "phone": "1"}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+
+        response = self.client.patch(
+            "/api/v1/patients/bulk/",
+            [
+                {"id": first.pk, "phone": "555-0100"},
+                {"id": second.pk, "email": "g@h.io"},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.phone, "555-0100")
+        self.assertEqual(first.search_phone, "5550100")
+        self.assertEqual(second.email, "g@h.io")
+        self.assertGreater(first.updated_at, first.created_at)
+        self.assertEqual(AuditLog.objects.filter(action="patient_updated").count(), 2)
+        foreign.refresh_from_db()
+        self.assertIsNone(foreign.phone)
+
+
+class ConditionalGetTest(APITenantTestCase):
+    tenant_name = "ETag Tenant"
+    subdomain = "etag"
+
+    def setUp(self):
+        super().setUp()
+        self.patient = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Ada",
+            last_name="Lovelace",
+            date_of_birth=date(1980, 1, 1),
+        )
+        self.appointments = [
+            Appointment.objects.create(
+                tenant=self.tenant, patient=self.patient, scheduled_for=timezone.now()
+            )
+            for _ in range(2)
+        ]
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def assertNotModified(self, url, response):
+        with mock.patch.object(
+            Serializer, "to_representation", side_effect=AssertionError
+        ):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_detail_view(self):
+        url = f"/api/v1/patients/{self.patient.pk}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertNotModified(url, response)
+        response_since = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response_since.status_code, 304)
+
+        # A sparse fieldset is a different representation
+        self.assertEqual(self.revalidate(url, response, fields="id").status_code, 200)
+
+        self.patient.phone = "555-0100"
+        self.patient.save()
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+
+        self.assertEqual(self.client.get("/api/v1/patients/0/").status_code, 404)
+
+    def test_polled_lists(self):
+        for url in ["/api/v1/appointments/", "/api/v1/appointments/today/"]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header("Last-Modified"))
+            # Validated from the tenant data version, without a query
+            with CaptureQueriesContext(connection) as queries:
+                self.assertNotModified(url, response)
+            self.assertEqual(len(queries), 0)
+
+        url = "/api/v1/appointments/today/"
+        response = self.client.get(url)
+        # patient_name comes from the patient row
+        self.patient.first_name = "Augusta"
+        self.patient.save()
+        response = self.revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["patient_name"], "Augusta Lovelace")
+
+        self.appointments[0].delete()
+        response = self.revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+
+@override_settings(API_SYNC_SETTLE_SECONDS=0)
+class SyncTest(APITenantTestCase):
+    tenant_name = "Sync Tenant"
+    subdomain = "sync"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = Tenant.objects.create(name="Other Sync", subdomain="sync-other")
+
+    def setUp(self):
+        super().setUp()
+        self.patients = [self.patient(f"Name{i}") for i in range(3)]
+        self.appointment = Appointment.objects.create(
+            tenant=self.tenant, patient=self.patients[0], scheduled_for=timezone.now()
+        )
+        self.patient("Hidden", tenant=self.other)
+
+    def patient(self, name, tenant=None):
+        return Patient.objects.create(
+            tenant=tenant or self.tenant,
+            first_name=name,
+            last_name="Sync",
+            date_of_birth=date(1980, 1, 1),
+        )
+
+    def sync(self, token=None, **params):
+        if token:
+            params["since"] = token
+        response = self.client.get("/api/v1/sync/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_full_then_incremental_sync(self):
+        first = self.sync()
+        self.assertFalse(first["more"])
+        self.assertEqual(
+            sorted(row["id"] for row in first["changes"]["patients"]),
+            sorted(patient.pk for patient in self.patients),
+        )
+        self.assertEqual(
+            first["changes"]["appointments"][0]["patient_name"], "Name0 Sync"
+        )
+
+        # Nothing changed: every feed is empty
+        again = self.sync(first["token"])
+        self.assertEqual(sum(map(len, again["changes"].values())), 0)
+        self.assertEqual(sum(map(len, again["deleted"].values())), 0)
+
+        edited = self.patients[1]
+        edited.phone = "555-0199"
+        edited.save()
+        new = self.patient("New")
+        deleted_id = self.patients[0].pk
+        self.patients[0].delete()  # cascades to the appointment
+
+        delta = self.sync(again["token"])
+        self.assertEqual(
+            [row["id"] for row in delta["changes"]["patients"]], [edited.pk, new.pk]
+        )
+        self.assertEqual(delta["changes"]["patients"][0]["phone"], "555-0199")
+        self.assertEqual(delta["deleted"]["patients"], [deleted_id])
+        self.assertEqual(delta["deleted"]["appointments"], [self.appointment.pk])
+        self.assertEqual(delta["changes"]["appointments"], [])
+
+    def test_paging_and_settle_window(self):
+        seen, token, more = [], None, True
+        while more:
+            page = self.sync(token, limit=2)
+            seen.extend(row["id"] for row in page["changes"]["patients"])
+            token, more = page["token"], page["more"]
+        self.assertEqual(sorted(seen), sorted(p.pk for p in self.patients))
+
+        self.patient("Recent")
+        with override_settings(API_SYNC_SETTLE_SECONDS=60):
+            self.assertEqual(self.sync(token)["changes"]["patients"], [])
+        self.assertEqual(len(self.sync(token)["changes"]["patients"]), 1)
+
+    def test_cost_follows_changes_not_table_size(self):
+        token = self.sync()["token"]
+        for index in range(20):
+            self.patient(f"Bulk{index}")
+        with CaptureQueriesContext(connection) as queries:
+            self.sync(token, limit=5)
+        # One keyset query per feed plus the tombstones
+        self.assertEqual(len(queries), 5)
+        self.assertTrue(all("LIMIT 6" in q["sql"] for q in queries.captured_queries))
+
+    def test_invalid_and_expired_tokens(self):
+        response = self.client.get("/api/v1/sync/", {"since": "garbage"})
+        self.assertEqual(response.status_code, 400)
+        other_user = CustomUser.objects.create_user(
+            username="sync-other", password="testpass", tenant=self.other
+        )
+        token = self.sync()["token"]
+        self.client.force_authenticate(other_user)
+        response = self.client.get("/api/v1/sync/", {"since": token})
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(self.user)
+        with override_settings(API_SYNC_TOMBSTONE_DAYS=0):
+            response = self.client.get("/api/v1/sync/", {"since": token})
+        self.assertEqual(response.status_code, 410)
+
+    def test_old_tombstones_are_purged(self):
+        self.patients[2].delete()
+        Tombstone.objects.create(
+            tenant=self.tenant,
+            resource="patients",
+            object_id=0,
+            deleted_at=timezone.now() - timedelta(days=400),
+        )
+        self.assertEqual(purge_sync_tombstones()["tombstones"], 1)
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+
+@mock.patch.dict(
+    "billing.constants.PLAN_DETAILS",
+    {
+        "free_trial": {"api_rate_limits": {"tenant": "3/min", "user": "2/min"}},
+        "starter": {"api_rate_limits": {"tenant": "10/min", "user": "10/min"}},
+    },
+)
+class ThrottleTest(APITenantTestCase):
+    tenant_name = "Busy Tenant"
+    subdomain = "busy"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.users = [
+            cls.user,
+            CustomUser.objects.create_user(
+                username="busy-other", password="testpass", tenant=cls.tenant
+            ),
+        ]
+        other = Tenant.objects.create(
+            name="Quiet Tenant", subdomain="quiet", plan="starter"
+        )
+        cls.other_user = CustomUser.objects.create_user(
+            username="quiet", password="testpass", tenant=other
+        )
+
+    def get(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get("/api/v1/patients/")
+
+    def test_user_and_tenant_buckets(self):
+        first, second = self.users
+        self.assertEqual(self.get(first).status_code, 200)
+        self.assertEqual(self.get(first).status_code, 200)
+        refused = self.get(first)
+        self.assertEqual(refused.status_code, 429)
+        self.assertIn("Retry-After", refused)
+
+        # The refused request took nothing from the tenant bucket
+        self.assertEqual(self.get(second).status_code, 200)
+        self.assertEqual(self.get(second).status_code, 429)
+
+        # Another tenant is untouched, at its own plan's rates
+        for _ in range(5):
+            self.assertEqual(self.get(self.other_user).status_code, 200)
+
+    def test_buckets_refill_at_the_rate(self):
+        buckets = LocalBuckets()
+        limits = [("a", 2, 0.5), ("b", 10, 10)]
+        with mock.patch("api.throttling.time.monotonic", return_value=100.0):
+            self.assertEqual(buckets.take(limits), 0)
+            self.assertEqual(buckets.take(limits), 0)
+            self.assertEqual(buckets.take(limits), 2.0)
+        # A refused take leaves every bucket alone
+        self.assertEqual(buckets._buckets["b"][0], 8)
+        with mock.patch("api.throttling.time.monotonic", return_value=101.0):
+            self.assertEqual(buckets.take(limits), 1.0)
+        with mock.patch("api.throttling.time.monotonic", return_value=102.0):
+            self.assertEqual(buckets.take(limits), 0)
+
+    @override_settings(
+        API_THROTTLE_STORE="redis", API_THROTTLE_REDIS_URL="redis://127.0.0.1:1/0"
+    )
+    def test_unavailable_redis_falls_back_to_local_buckets(self):
+        with mock.patch.dict("api.throttling._stores", clear=True):
+            with self.assertLogs("api.throttling", "WARNING"):
+                self.assertEqual(self.get(self.users[0]).status_code, 200)
+                self.get(self.users[0])
+                self.assertEqual(self.get(self.users[0]).status_code, 429)
+
+
+class ClaimsJWTAuthenticationTest(APITenantTestCase):
+    tenant_name = "JWT Tenant"
+    subdomain = "jwt"
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Token",
+            last_name="Patient",
+            date_of_birth=date(1980, 1, 1),
+        )
+        # Authenticated by its tokens instead of force_authenticate()
+        self.client = APIClient()
+        response = self.client.post(
+            "/api/v1/auth/token/",
+            {"username": "jwt-user", "password": "testpass"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.tokens = response.data
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/patients/")
+        return response, [q["sql"] for q in queries.captured_queries]
+
+    def test_cached_principal_saves_the_user_and_tenant_queries(self):
+        response, first = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 1)
+        response, cached = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [
+                sql
+                for sql in cached
+                if "users_customuser" in sql or "tenants_tenant" in sql
+            ]
+        )
+        with mock.patch.object(
+            PatientViewSet, "authentication_classes", [JWTAuthentication]
+        ):
+            _, lookups = self.get()
+        self.assertEqual(len(lookups) - len(cached), 2)
+
+    def test_saved_user_and_tenant_are_reloaded(self):
+        self.get()
+        self.tenant.name = "Renamed Tenant"
+        self.tenant.save()
+        with mock.patch("api.v1.views.PatientViewSet.list") as view:
+            view.return_value = HttpResponse()
+            self.client.get("/api/v1/patients/")
+        request = view.call_args[0][0]
+        self.assertEqual(request.user.tenant.name, "Renamed Tenant")
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get()[0].status_code, 401)
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        response = self.client.post(
+            "/api/v1/auth/logout/", {"refresh": self.tokens["refresh"]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get()[0].status_code, 401)
+        response = APIClient().post(
+            "/api/v1/auth/token/refresh/", {"refresh": self.tokens["refresh"]}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_rotated_refresh_token_cannot_be_reused(self):
+        refresh = APIClient().post(
+            "/api/v1/auth/token/refresh/", {"refresh": self.tokens["refresh"]}
+        )
+        self.assertEqual(refresh.status_code, 200)
+        self.assertIn("refresh", refresh.data)
+        again = APIClient().post(
+            "/api/v1/auth/token/refresh/", {"refresh": self.tokens["refresh"]}
+        )
+        self.assertEqual(again.status_code, 401)
@@ -0,0 +1,221 @@
+"""
+Token-bucket API throttling per tenant and user.
+
+Each authenticated request takes a token from two buckets: the tenant's and
+the user's, sized by the ``api_rate_limits`` of the tenant's plan in
+``billing.constants.PLAN_DETAILS``. A rate of ``"600/min"`` is a bucket of
+600 tokens refilled at 10 a second, so a client can spend a minute's
+allowance at once and is then held to the rate. A tenant that empties its
+bucket is refused without touching any other tenant's, and the user bucket
+keeps one client from spending the whole tenant allowance. Anonymous
+requests get a bucket per client address, at the ``anon`` throttle rate.
+
+A bucket is two numbers (tokens left and when they were counted), so a check
+costs the same however busy the key:
+
+* ``redis`` store: buckets are Redis hashes shared by every process, read
+  and updated by one Lua script, so concurrent requests can't both take the
+  last token and a refused request takes nothing from any bucket.
+* ``local`` store (no Redis configured, or Redis unavailable): buckets are
+  kept in process behind a lock, so each process enforces the limits alone.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import redis
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from django.conf import settings
+
+from billing.constants import PLAN_DETAILS
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# KEYS are buckets and ARGV their capacities and refill rates, in pairs.
+# Returns 0 once a token is taken from every bucket, or else the seconds to
+# wait (as a string: Lua numbers come back truncated to integers).
+TAKE_SCRIPT = """
+if redis.replicate_commands then
+    -- Redis < 5 only allows writes after TIME with effects replication
+    redis.replicate_commands()
+end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local levels, wait = {}, 0
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'at')
+    local tokens = capacity
+    if bucket[1] then
+        local elapsed = math.max(0, now - tonumber(bucket[2]))
+        tokens = math.min(capacity, tonumber(bucket[1]) + elapsed * rate)
+    end
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+    levels[i] = tokens
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'at', tostring(now))
+    -- A bucket left alone this long is full again, same as a missing one
+    redis.call('EXPIRE', key, math.ceil(capacity / rate))
+end
+return '0'
+"""
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """``(capacity, tokens per second)`` of a ``"<count>/<period>"`` rate."""
+    count, period = rate.split("/")
+    count = int(count)
+    return count, count / PERIODS[period[0]]
+
+
+class LocalBuckets:
+    """Thread-safe in-process buckets; the least recently used are dropped."""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, limits):
+        """
+        Take a token from each ``(key, capacity, rate)`` bucket of ``limits``
+        if they all have one. Returns 0, or the seconds until they all will.
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels, wait = [], 0.0
+            for key, capacity, rate in limits:
+                tokens, at = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - at) * rate)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+                levels.append(tokens)
+            if wait:
+                return wait
+            for (key, _, _), tokens in zip(limits, levels):
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return 0.0
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBuckets:
+    """Buckets kept in Redis, shared by all web processes."""
+
+    def __init__(self, url):
+        self.url = url
+        self._script = None
+
+    @property
+    def script(self):
+        if self._script is None:
+            client = redis.Redis.from_url(self.url)
+            self._script = client.register_script(TAKE_SCRIPT)
+        return self._script
+
+    def take(self, limits):
+        """Same as ``LocalBuckets.take``, in one round trip."""
+        keys, args = [], []
+        for key, capacity, rate in limits:
+            keys.append(key)
+            args += [capacity, rate]
+        return float(self.script(keys=keys, args=args))
+
+    def clear(self):
+        client = self.script.registered_client
+        for key in client.scan_iter("throttle:*"):
+            client.delete(key)
+
+
+_stores = {}
+
+
+def get_store(backend=None):
+    """The bucket store selected by ``API_THROTTLE_STORE`` (one per process)."""
+    backend = backend or settings.API_THROTTLE_STORE
+    if backend not in _stores:
+        if backend == "redis":
+            _stores[backend] = RedisBuckets(settings.API_THROTTLE_REDIS_URL)
+        else:
+            _stores[backend] = LocalBuckets()
+    return _stores[backend]
+
+
+def take_tokens(limits):
+    """``LocalBuckets.take`` on the configured store, or locally without Redis."""
+    try:
+        return get_store().take(limits)
+    except redis.RedisError:
+        # Keep limiting per process rather than failing every request
+        logger.warning("Throttle store unavailable, using local buckets", exc_info=True)
+        return get_store("local").take(limits)
+
+
+def plan_rate_limits(plan):
+    """``api_rate_limits`` of a plan; unknown plans get the free trial's."""
+    details = PLAN_DETAILS.get(plan) or PLAN_DETAILS["free_trial"]
+    return details["api_rate_limits"]
+
+
+class BucketThrottle(BaseThrottle):
+    """Base for the token-bucket throttles; subclasses name the buckets."""
+
+    def get_limits(self, request, view):
+        """``[(key, capacity, rate)]`` to take from; empty to let a request by."""
+        raise NotImplementedError(".get_limits() must be overridden")
+
+    def allow_request(self, request, view):
+        limits = self.get_limits(request, view)
+        self._wait = take_tokens(limits) if limits else 0.0
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class TenantRateThrottle(BucketThrottle):
+    """The tenant and user buckets of authenticated requests."""
+
+    def get_limits(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return []
+        tenant = user.tenant
+        limits = plan_rate_limits(tenant.plan)
+        # The hash tag keeps both keys in one Redis Cluster slot for the script
+        prefix = f"throttle:{{tenant{tenant.pk}}}"
+        return [
+            (f"{prefix}:tenant", *parse_rate(limits["tenant"])),
+            (f"{prefix}:user{user.pk}", *parse_rate(limits["user"])),
+        ]
+
+
+class AnonBucketThrottle(BucketThrottle):
+    """A bucket per client address for anonymous requests."""
+
+    scope = "anon"
+
+    def get_limits(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return []
+        rate = api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        return [(f"throttle:anon:{self.get_ident(request)}", *parse_rate(rate))]
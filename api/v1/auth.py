@@ -6,9 +6,15 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer, TokenRefreshSerializer
+)
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from django.contrib.auth import get_user_model
+from ..authentication import is_revoked, revoke_token
 from .serializers import UserSerializer
 
 User = get_user_model()
@@ -36,6 +42,24 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
+class DenylistTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses revoked refresh tokens and revokes the ones it rotates"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_revoked(refresh):
+            raise TokenError('Token has been revoked')
+        data = super().validate(attrs)
+        if jwt_settings.ROTATE_REFRESH_TOKENS and jwt_settings.BLACKLIST_AFTER_ROTATION:
+            revoke_token(refresh)
+        return data
+
+
+class DenylistTokenRefreshView(TokenRefreshView):
+    """JWT token refresh view honouring the token denylist"""
+    serializer_class = DenylistTokenRefreshSerializer
+
+
 class AuthViewSet(viewsets.ViewSet):
     """
     Authentication endpoints
@@ -60,7 +84,20 @@ class AuthViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def logout(self, request):
-        """Logout user (can blacklist token if using token blacklist package)"""
+        """Logout user: revoke the access token and, if given, the refresh token"""
+        tokens = []
+        if isinstance(request.auth, AccessToken):
+            tokens.append(request.auth)
+        if request.data.get('refresh'):
+            try:
+                tokens.append(RefreshToken(request.data['refresh']))
+            except TokenError:
+                return Response(
+                    {'error': 'Invalid refresh token'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        for token in tokens:
+            revoke_token(token)
         return Response(
             {'status': 'Successfully logged out'},
             status=status.HTTP_200_OK
@@ -0,0 +1,217 @@
+"""
+API pagination classes
+
+KeysetPagination pages through a list by the position of its last row,
+(ordering field, id), instead of an OFFSET, and skips the COUNT(*) unless a
+total is asked for, so every page costs the same however deep the client is.
+Clients opt in with ?cursor= (empty for the first page); other requests keep
+the page-number behaviour and response shape v1 clients rely on.
+"""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import partial
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (ordering field, id), for requests with
+    ``?cursor=``; the others are paginated by ``legacy_pagination_class``.
+
+    The ordering is whatever the view's OrderingFilter settled on (the first
+    term, which must be a non-null column of the model; ties are broken by
+    id in the same direction). ``?total=approx`` adds a ``count``: the
+    planner's row estimate on PostgreSQL, an exact COUNT(*) elsewhere.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+    invalid_cursor_message = 'Invalid cursor'
+    legacy_pagination_class = StandardResultsSetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.legacy = None
+        if self.cursor_query_param not in request.query_params:
+            self.legacy = self.legacy_pagination_class()
+            return self.legacy.paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.field, self.descending = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.order_terms(reverse=False))
+        self.count = self.get_total(queryset, request)
+
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor['r'])
+        if cursor is not None:
+            queryset = queryset.filter(self.position_filter(cursor['p'], self.reverse))
+        if self.reverse:
+            queryset = queryset.order_by(*self.order_terms(reverse=True))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering or ['-pk']
+        term = ordering[0]
+        descending = term.startswith('-')
+        field = term.lstrip('-')
+        return ('pk' if field == 'id' else field), descending
+
+    def order_terms(self, reverse):
+        prefix = '-' if self.descending != reverse else ''
+        if self.field == 'pk':
+            return [prefix + 'pk']
+        return [prefix + self.field, prefix + 'pk']
+
+    def position_filter(self, position, reverse):
+        value, pk = position
+        after = 'lt' if self.descending != reverse else 'gt'
+        if self.field == 'pk':
+            return Q(**{f'pk__{after}': pk})
+        return Q(**{f'{self.field}__{after}': value}) | Q(
+            **{self.field: value, f'pk__{after}': pk}
+        )
+
+    def get_total(self, queryset, request):
+        if request.query_params.get(self.total_query_param) != 'approx':
+            return None
+        if connections[queryset.db].vendor == 'postgresql':
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows'])
+        return queryset.count()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            value, pk = cursor['p']
+            if cursor['o'] != self.ordering_key() or not isinstance(pk, int):
+                raise ValueError
+            if self.field != 'pk':
+                field = self.model._meta.get_field(self.field)
+                cursor['p'] = [field.to_python(value), pk]
+            return cursor
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def ordering_key(self):
+        return ('-' if self.descending else '') + self.field
+
+    def encode_cursor(self, row, reverse):
+        # Rows are model instances, or dicts on the values() fast path
+        get = row.get if isinstance(row, dict) else partial(getattr, row)
+        value = None if self.field == 'pk' else get(self.field)
+        if value is not None and not isinstance(value, (int, float, str, bool)):
+            value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        cursor = {'o': self.ordering_key(), 'p': [value, get('pk')], 'r': reverse}
+        encoded = urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode('utf-8'))
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.total_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        body = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            body['count'] = self.count
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {
+                    'type': 'integer',
+                    'description': (
+                        'Always without a cursor; with one, only with '
+                        '?total=approx and possibly an estimate.'
+                    ),
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': (
+                    'Cursor pagination: empty for the first page, then the '
+                    'cursor of a next/previous link.'
+                ),
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Results per page (max {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.total_query_param,
+                'required': False,
+                'in': 'query',
+                'description': (
+                    'With cursor pagination, "approx" adds an approximate count.'
+                ),
+                'schema': {'type': 'string', 'enum': ['approx']},
+            },
+            {
+                'name': 'page',
+                'required': False,
+                'in': 'query',
+                'description': 'Page number, without a cursor (runs a COUNT).',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,44 @@
+"""
+orjson-backed JSON renderer
+
+Drop-in replacement for DRF's JSONRenderer that produces the same bytes for
+our payloads, several times faster. Types orjson doesn't handle natively
+(Decimal, lazy strings, querysets, and dates and times, which DRF formats
+with millisecond precision) go through DRF's encoder.
+"""
+
+import orjson
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+# orjson leaves these as raw UTF-8; DRF escapes them to stay a JS subset
+LINE_SEPARATORS = [
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+]
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Compact UTF-8 JSON rendered with orjson. Indented output
+    (``Accept: application/json; indent=4``, the browsable API) and anything
+    orjson rejects, such as integers over 64 bits, use the stdlib renderer.
+    """
+    default = staticmethod(JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
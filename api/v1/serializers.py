@@ -4,7 +4,11 @@ Handles PHI-aware serialization and validation
 """
 
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import PKOnlyObject, PrimaryKeyRelatedField
 from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
 from patients.models import Patient
 from appointments.models import Appointment
 from clinical_records.models import ClinicalRecord
@@ -14,7 +18,149 @@ from users.models import CustomUser
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+def _field_list(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients pick fields with ?fields=a,b or drop them with ?exclude=c,d.
+
+    Only applies to reads that have the request in the context. The
+    views pass ``sparse_columns()`` to ``.only()`` so the unused columns are
+    not read either; ``computed_columns`` names the model columns behind
+    fields that are not plain model fields.
+    """
+    computed_columns = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        selected = self.selected_fields(request)
+        if selected is not None:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, request):
+        """Field names requested by ``request``, or None for all of them."""
+        fields = request.query_params.get('fields')
+        exclude = request.query_params.get('exclude')
+        if not fields and not exclude:
+            return None
+        available = list(cls.Meta.fields)
+        selected = _field_list(fields) if fields else available
+        excluded = _field_list(exclude) if exclude else []
+        unknown = sorted(set(selected + excluded) - set(available))
+        if unknown:
+            param = 'fields' if set(unknown) & set(selected) else 'exclude'
+            raise ValidationError({param: [f'Unknown field(s): {", ".join(unknown)}']})
+        return [name for name in available if name in selected and name not in excluded]
+
+    @classmethod
+    def sparse_columns(cls, request):
+        """Model columns needed for the requested fields, or None for all."""
+        selected = cls.selected_fields(request)
+        if selected is None:
+            return None
+        declared = cls._declared_fields
+        columns = []
+        for name in selected:
+            if name in cls.computed_columns:
+                columns.extend(cls.computed_columns[name])
+            elif name not in declared:
+                columns.append(name)
+        return columns
+
+
+class ReadPlan:
+    """
+    Builds a serializer's representation straight from a ``.values()`` row.
+
+    Compiled once per serializer class and field selection: each step is
+    the output name, the row keys it reads and the converter, which is the
+    serializer field's own ``to_representation``, so the result matches
+    ``serializer.data`` exactly.
+    """
+    def __init__(self, steps):
+        self.steps = steps
+        self.columns = list(dict.fromkeys(key for _, keys, _, _ in steps for key in keys))
+
+    def __call__(self, row):
+        data = {}
+        for name, keys, compute, to_representation in self.steps:
+            if compute is None:
+                value = row[keys[0]]
+            else:
+                value = compute(*[row[key] for key in keys])
+            if to_representation is not None and value is not None:
+                value = to_representation(value)
+            data[name] = value
+        return data
+
+    @classmethod
+    def compile(cls, serializer_class, field_names):
+        """The plan for ``field_names``, or None if one has no fast path."""
+        serializer = serializer_class()
+        opts = serializer_class.Meta.model._meta
+        steps = []
+        for name in field_names:
+            field = serializer.fields[name]
+            if field.write_only:
+                continue
+            if name in serializer_class.read_values:
+                keys, compute = serializer_class.read_values[name]
+                # Method fields return their final value, as in to_representation()
+                if isinstance(field, serializers.SerializerMethodField):
+                    steps.append((name, tuple(keys), compute, None))
+                else:
+                    steps.append((name, tuple(keys), compute, field.to_representation))
+                continue
+            if len(field.source_attrs) != 1:
+                return None
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete:
+                return None
+            if model_field.is_relation:
+                if not isinstance(field, PrimaryKeyRelatedField):
+                    return None
+                # values() gives the raw key; the field expects a PKOnlyObject
+                steps.append((name, (field.source,), None, _pk_only(field.to_representation)))
+            else:
+                steps.append((name, (field.source,), None, field.to_representation))
+        return cls(steps)
+
+
+def _pk_only(to_representation):
+    return lambda pk: to_representation(PKOnlyObject(pk=pk))
+
+
+class FastReadMixin:
+    """
+    Read-only fast path for list endpoints: rows are serialized from
+    ``.values()`` through a cached ``ReadPlan`` instead of instantiating a
+    model and walking the serializer per row.
+
+    Plain model fields are planned automatically; ``read_values`` maps any
+    other field to the row keys it needs and a function of their values.
+    """
+    read_values = {}
+    _read_plans = {}
+
+    @classmethod
+    def read_plan(cls, field_names):
+        key = (cls, tuple(field_names))
+        if key not in cls._read_plans:
+            cls._read_plans[key] = ReadPlan.compile(cls, field_names)
+        return cls._read_plans[key]
+
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """User/Staff member serializer"""
     class Meta:
         model = User
@@ -22,64 +168,74 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'email']
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(FastReadMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """Patient serializer with PHI considerations"""
     full_name = serializers.SerializerMethodField()
+    computed_columns = {'full_name': ['first_name', 'last_name']}
+    read_values = {'full_name': (['first_name', 'last_name'], Patient.format_full_name)}
     
     class Meta:
         model = Patient
         fields = [
-            'id', 'full_name', 'date_of_birth', 'gender', 
-            'email', 'phone', 'address', 'city', 'state', 
-            'zip_code', 'insurance_provider', 'insurance_id',
-            'medical_record_number', 'is_active', 'created_at', 'updated_at'
+            'id', 'first_name', 'last_name', 'full_name', 'date_of_birth',
+            'gender', 'email', 'phone', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_full_name(self, obj):
-        return f"{obj.first_name} {obj.last_name}".strip()
+        return obj.get_full_name()
+
+
+# patient.get_full_name, read from the joined columns
+PATIENT_NAME_VALUES = (['patient__first_name', 'patient__last_name'], Patient.format_full_name)
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(FastReadMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """Appointment serializer"""
     patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
-    provider_name = serializers.CharField(source='provider.get_full_name', read_only=True)
+    computed_columns = {'patient_name': ['patient']}
+    read_values = {'patient_name': PATIENT_NAME_VALUES}
     
     class Meta:
         model = Appointment
         fields = [
-            'id', 'patient', 'patient_name', 'provider', 'provider_name',
-            'appointment_date', 'appointment_time', 'duration_minutes',
-            'appointment_type', 'status', 'notes', 'created_at', 'updated_at'
+            'id', 'patient', 'patient_name', 'scheduled_for', 'status',
+            'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class ClinicalRecordSerializer(serializers.ModelSerializer):
+class ClinicalRecordSerializer(FastReadMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """Clinical Record (SOAP notes) serializer"""
     patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
-    provider_name = serializers.CharField(source='provider.get_full_name', read_only=True)
+    computed_columns = {'patient_name': ['patient']}
+    read_values = {'patient_name': PATIENT_NAME_VALUES}
     
     class Meta:
         model = ClinicalRecord
         fields = [
-            'id', 'patient', 'patient_name', 'provider', 'provider_name',
-            'visit_date', 'subjective', 'objective', 'assessment', 'plan',
-            'is_locked', 'created_at', 'updated_at'
+            'id', 'patient', 'patient_name', 'note_type', 'note',
+            'chief_complaint', 'history_of_present_illness',
+            'past_medical_history', 'medications_history', 'allergy_history',
+            'physical_exam_inspection', 'physical_exam_palpation',
+            'physical_exam_percussion', 'physical_exam_auscultation',
+            'provisional_diagnosis', 'investigations_ordered',
+            'investigation_results', 'assessment_diagnosis', 'plan',
+            'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class LabResultSerializer(serializers.ModelSerializer):
+class LabResultSerializer(FastReadMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """Lab Result serializer"""
     patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
+    computed_columns = {'patient_name': ['patient']}
+    read_values = {'patient_name': PATIENT_NAME_VALUES}
     
     class Meta:
         model = LabResult
         fields = [
-            'id', 'patient', 'patient_name', 'test_name', 'test_code',
-            'result_value', 'result_unit', 'reference_range', 'status',
-            'lab_date', 'result_date', 'notes', 'created_at', 'updated_at'
+            'id', 'patient', 'patient_name', 'result', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
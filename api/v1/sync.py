@@ -0,0 +1,161 @@
+"""
+Incremental sync for offline clients
+
+``GET /api/v1/sync/?since=<token>`` returns the objects of each resource in
+``SYNC_RESOURCES`` created or updated since the token, the ids deleted since
+then (from ``Tombstone`` rows), and a new token. Every feed is a keyset scan
+of a (tenant, updated_at, id) index, so a sync costs in proportion to the
+changes, not to the size of the tables.
+
+Only rows older than ``API_SYNC_SETTLE_SECONDS`` are returned: a transaction
+can commit a row whose updated_at is already behind a token handed out in
+the meantime, and holding the feed back by the settle time keeps such rows
+from being skipped.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from appointments.models import Appointment
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+
+from ..models import Tombstone
+from .serializers import (
+    AppointmentSerializer, ClinicalRecordSerializer, LabResultSerializer,
+    PatientSerializer
+)
+
+SYNC_RESOURCES = {
+    'patients': (Patient, PatientSerializer),
+    'appointments': (Appointment, AppointmentSerializer),
+    'clinical-records': (ClinicalRecord, ClinicalRecordSerializer),
+    'lab-results': (LabResult, LabResultSerializer),
+}
+
+RESOURCE_NAMES = {model: name for name, (model, _) in SYNC_RESOURCES.items()}
+
+TOKEN_SALT = 'api.v1.sync'
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class ExpiredToken(Exception):
+    pass
+
+
+def _position(position):
+    return [position[0].isoformat(), position[1]]
+
+
+def encode_token(tenant, positions, deleted):
+    """Signed token holding the (updated_at, pk) reached in every feed."""
+    return signing.dumps({
+        't': tenant.id,
+        'c': {name: _position(position) for name, position in positions.items() if position},
+        'd': _position(deleted),
+    }, salt=TOKEN_SALT, compress=True)
+
+
+def decode_token(token, tenant):
+    """``(positions, deleted)`` of a token issued to ``tenant``."""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+        if payload['t'] != tenant.id:
+            raise ValueError
+        positions = {
+            name: (parse_datetime(value), int(pk))
+            for name, (value, pk) in payload['c'].items()
+            if name in SYNC_RESOURCES
+        }
+        deleted = (parse_datetime(payload['d'][0]), int(payload['d'][1]))
+        if deleted[0] is None or any(value is None for value, _ in positions.values()):
+            raise ValueError
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken
+    if deleted[0] < timezone.now() - timedelta(days=settings.API_SYNC_TOMBSTONE_DAYS):
+        # Deletes since then may have been purged
+        raise ExpiredToken
+    return positions, deleted
+
+
+def _after(queryset, field, position):
+    if position is None:
+        return queryset
+    value, pk = position
+    return queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+
+
+def sync_changes(tenant, token=None, limit=None):
+    """
+    The changes since ``token`` (None for a first, full sync) as a response
+    body. ``more`` is true while any feed has rows left beyond ``limit``.
+    """
+    limit = limit or settings.API_SYNC_PAGE_SIZE
+    horizon = timezone.now() - timedelta(seconds=settings.API_SYNC_SETTLE_SECONDS)
+    if token:
+        positions, deleted_position = decode_token(token, tenant)
+    else:
+        # A new replica has nothing to delete
+        positions, deleted_position = {}, (horizon, 0)
+
+    more = False
+    changes, new_positions = {}, {}
+    for name, (model, serializer_class) in SYNC_RESOURCES.items():
+        queryset = _after(
+            model.objects.filter(tenant=tenant, updated_at__lte=horizon),
+            'updated_at', positions.get(name),
+        ).order_by('updated_at', 'pk')
+        plan = serializer_class.read_plan(serializer_class.Meta.fields)
+        rows = list(queryset.values('pk', 'updated_at', *plan.columns)[:limit + 1])
+        more = more or len(rows) > limit
+        rows = rows[:limit]
+        changes[name] = [plan(row) for row in rows]
+        new_positions[name] = (
+            (rows[-1]['updated_at'], rows[-1]['pk']) if rows else positions.get(name)
+        )
+
+    tombstones = list(
+        _after(
+            Tombstone.objects.filter(tenant=tenant, deleted_at__lte=horizon),
+            'deleted_at', deleted_position,
+        ).order_by('deleted_at', 'pk').values_list(
+            'pk', 'deleted_at', 'resource', 'object_id'
+        )[:limit + 1]
+    )
+    deleted = {name: [] for name in SYNC_RESOURCES}
+    for _, _, resource, object_id in tombstones[:limit]:
+        deleted[resource].append(object_id)
+    if len(tombstones) > limit:
+        more = True
+        deleted_position = (tombstones[limit - 1][1], tombstones[limit - 1][0])
+    else:
+        # Every delete up to the horizon has been seen; moving the position
+        # up keeps the token from expiring while there is nothing to delete
+        deleted_position = max(
+            (tombstones[-1][1], tombstones[-1][0]) if tombstones else deleted_position,
+            (horizon, 0),
+        )
+
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'more': more,
+        'token': encode_token(tenant, new_positions, deleted_position),
+    }
+
+
+def purge_tombstones(days=None):
+    """Delete tombstones older than the retention period; returns the count."""
+    days = days or settings.API_SYNC_TOMBSTONE_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -2,10 +2,11 @@
 API URL routing with DRF routers
 """
 
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import (
     PatientViewSet, AppointmentViewSet, ClinicalRecordViewSet,
-    LabResultViewSet, DashboardViewSet
+    LabResultViewSet, DashboardViewSet, SyncView
 )
 
 router = DefaultRouter()
@@ -15,4 +16,6 @@ router.register(r'clinical-records', ClinicalRecordViewSet, basename='clinical-r
 router.register(r'lab-results', LabResultViewSet, basename='lab-result')
 router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('sync/', SyncView.as_view(), name='sync'),
+] + router.urls
@@ -6,28 +6,361 @@ Implements proper filtering, pagination, and permissions
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.views import APIView
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import PrimaryKeyRelatedField
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.db import transaction
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from datetime import timedelta
 from django.db.models import Q
+import hashlib
 
 from patients.models import Patient
+from patients.search import search_patients
+from patients.sections import forget_section_counts
 from appointments.models import Appointment
 from clinical_records.models import ClinicalRecord
 from labs.models import LabResult
 from users.models import CustomUser
-from common.audit import log_audit
+from analytics.demographics import parse_age_edges, patient_demographics
+from analytics.hll import RELATIVE_ERROR
+from analytics.queries import ALL, aggregate_metrics, month_start, start_of_day
+from analytics.rollups import active_patient_count
+from common.audit import log_audit, log_audit_many
+from common.fields import with_derived_fields
+from common.tenant_cache import bump_tenant_version, cached_for_tenant, get_tenant_version
+from .pagination import KeysetPagination
+from .sync import ExpiredToken, InvalidToken, sync_changes
 from .serializers import (
     PatientSerializer, AppointmentSerializer, ClinicalRecordSerializer,
     LabResultSerializer, UserSerializer, DashboardStatsSerializer
 )
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+class SparseFieldsetViewMixin:
+    """
+    Pushes ?fields= / ?exclude= down to the query: reads only load the
+    columns the serializer will output (plus the ordering columns).
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+        columns = self.get_serializer_class().sparse_columns(self.request)
+        if columns is None:
+            return queryset
+        return queryset.only(*columns, *_ordering_columns(queryset))
+
+
+def _ordering_columns(queryset):
+    return [
+        term.lstrip('-') for term in queryset.query.order_by
+        if isinstance(term, str) and '__' not in term
+    ]
+
+
+def _is_single_valued(model, path):
+    """True if every hop of ``path`` is a forward FK or a one-to-one."""
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        if not (field.many_to_one or field.one_to_one):
+            return False
+        model = field.related_model
+    return True
+
+
+class RelatedFieldsViewMixin:
+    """
+    Loads the relations the serializer reads up front, so a page costs the
+    same number of queries whatever its size.
+
+    ``related_fields`` maps serializer fields to the relation paths they
+    traverse; single-valued paths are joined with select_related, the rest
+    prefetched. Fields left out with ?fields= / ?exclude= join nothing.
+    """
+    related_fields = {}
+
+    def filter_queryset(self, queryset):
+        return self.load_related(super().filter_queryset(queryset))
+
+    def load_related(self, queryset):
+        selected = None
+        if self.request.method in permissions.SAFE_METHODS:
+            selected = self.get_serializer_class().selected_fields(self.request)
+        paths = sorted({
+            path
+            for name, relations in self.related_fields.items()
+            if selected is None or name in selected
+            for path in relations
+        })
+        joins = [path for path in paths if _is_single_valued(queryset.model, path)]
+        prefetches = [path for path in paths if path not in joins]
+        if joins:
+            queryset = queryset.select_related(*joins)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+
+class FastListViewMixin:
+    """
+    Serves list pages from ``.values()`` rows through the serializer's
+    ``ReadPlan``, skipping model instances; the JSON is the same as the
+    regular path. Falls back to it when a selected field has no plan or
+    ``API_FAST_LIST_SERIALIZATION`` is off.
+    """
+    def get_read_plan(self):
+        if not settings.API_FAST_LIST_SERIALIZATION:
+            return None
+        serializer_class = self.get_serializer_class()
+        fields = serializer_class.selected_fields(self.request)
+        return serializer_class.read_plan(fields or serializer_class.Meta.fields)
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_read_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        # Relations come in as joined columns, not prefetched objects
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        # The paginator reads the ordering columns and pk of the last row
+        rows = queryset.values('pk', *_ordering_columns(queryset), *plan.columns)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response([plan(row) for row in rows])
+        return self.get_paginated_response([plan(row) for row in page])
+
+
+class PreloadedRelation:
+    """
+    Stands in for a PrimaryKeyRelatedField queryset during bulk validation:
+    ``get(pk=...)`` is answered from objects fetched in one query.
+    """
+    def __init__(self, queryset, pks):
+        self.model = queryset.model
+        valid = set()
+        for pk in pks:
+            try:
+                valid.add(self.to_pk(pk))
+            except (TypeError, ValueError):
+                pass
+        self.objects = {obj.pk: obj for obj in queryset.filter(pk__in=valid)}
+
+    def to_pk(self, pk):
+        try:
+            return self.model._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise ValueError(pk)
+
+    def get(self, pk):
+        try:
+            return self.objects[self.to_pk(pk)]
+        except KeyError:
+            raise self.model.DoesNotExist
+
+
+class BulkWriteViewMixin:
+    """
+    ``POST <list>/bulk/`` creates and ``PATCH <list>/bulk/`` updates (items
+    carry their ``id``) up to ``API_BULK_MAX_ITEMS`` objects per request.
+
+    Items are validated in one pass with one serializer, related objects
+    are fetched once (and only from the user's tenant), and the rows and
+    their audit entries are written with bulk_create / bulk_update in one
+    transaction. Nothing is written unless every item is valid; the errors
+    are returned per item index.
+    """
+    audit_name = None
+    bulk_batch_size = 500
+
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk')
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'non_field_errors': ['Expected a non-empty list of objects.']})
+        if len(items) > settings.API_BULK_MAX_ITEMS:
+            raise ValidationError({'non_field_errors': [
+                f'At most {settings.API_BULK_MAX_ITEMS} objects per request.'
+            ]})
+        if not all(isinstance(item, dict) for item in items):
+            raise ValidationError({'non_field_errors': ['Every item must be an object.']})
+
+        serializer = self.get_serializer(partial=request.method == 'PATCH')
+        self.preload_relations(serializer, items)
+        if request.method == 'PATCH':
+            instances = self.bulk_instances(items)
+        else:
+            instances = [None] * len(items)
+
+        validated, errors = [], []
+        for index, (item, instance) in enumerate(zip(items, instances)):
+            if request.method == 'PATCH' and instance is None:
+                errors.append({'index': index, 'errors': {'id': ['Not found.']}})
+                continue
+            serializer.instance = instance
+            try:
+                validated.append(serializer.run_validation(item))
+            except ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if request.method == 'PATCH':
+                objects = self.bulk_update_objects(instances, validated)
+            else:
+                objects = self.bulk_create_objects(validated)
+        return Response(
+            {'count': len(objects), 'ids': [obj.pk for obj in objects]},
+            status=status.HTTP_200_OK if request.method == 'PATCH' else status.HTTP_201_CREATED,
+        )
+
+    def preload_relations(self, serializer, items):
+        """Fetch every object the items refer to with one query per relation."""
+        tenant = self.request.user.tenant
+        for name, field in serializer.fields.items():
+            if field.read_only or not isinstance(field, PrimaryKeyRelatedField):
+                continue
+            queryset = field.get_queryset()
+            if any(f.name == 'tenant' for f in queryset.model._meta.fields):
+                queryset = queryset.filter(tenant=tenant)
+            field.queryset = PreloadedRelation(
+                queryset, [item[name] for item in items if name in item]
+            )
+
+    def bulk_instances(self, items):
+        """The tenant's objects for each item's ``id`` (None when missing)."""
+        relation = PreloadedRelation(
+            self.get_queryset().order_by(), [item.get('id') for item in items]
+        )
+        instances = []
+        for item in items:
+            try:
+                instances.append(relation.get(item.get('id')))
+            except (ObjectDoesNotExist, ValueError):
+                instances.append(None)
+        return instances
+
+    def bulk_create_objects(self, validated):
+        tenant = self.request.user.tenant
+        model = self.get_queryset().model
+        objects = model.objects.bulk_create(
+            [model(tenant=tenant, **data) for data in validated],
+            batch_size=self.bulk_batch_size,
+        )
+        self.bulk_audit('created', objects)
+        return objects
+
+    def bulk_update_objects(self, instances, validated):
+        model = self.get_queryset().model
+        changed = set()
+        # Rows moved to another patient leave their old one's counts stale too
+        previous_patient_ids = [getattr(instance, 'patient_id', None) for instance in instances]
+        for instance, data in zip(instances, validated):
+            for name, value in data.items():
+                setattr(instance, name, value)
+            changed.update(data)
+        # bulk_update() skips pre_save(), so stamp auto_now fields and
+        # recompute the derived fields (DerivedCharField) of changed ones here
+        now = timezone.now()
+        stamped = [
+            field for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)
+        ]
+        derived = set(with_derived_fields(model, changed)) - changed
+        for instance in instances:
+            for field in stamped:
+                setattr(instance, field.attname, now)
+            for name in derived:
+                model._meta.get_field(name).pre_save(instance, False)
+        model.objects.bulk_update(
+            instances,
+            sorted(changed | derived | {field.name for field in stamped}),
+            batch_size=self.bulk_batch_size,
+        )
+        self.bulk_audit(
+            'updated', instances, f': {", ".join(sorted(changed))}', previous_patient_ids
+        )
+        return instances
+
+    def bulk_audit(self, verb, objects, suffix='', patient_ids=()):
+        """
+        One audit entry per object, one INSERT; also drops the tenant's caches
+        and the section counts of the objects' patients (and ``patient_ids``).
+        """
+        tenant = self.request.user.tenant
+        label = self.get_queryset().model._meta.verbose_name.capitalize()
+        log_audit_many(
+            f'{self.audit_name}_{verb}',
+            user=self.request.user,
+            tenant=tenant,
+            details=[f'{label} {obj.pk} {verb} via API bulk request{suffix}.' for obj in objects],
+        )
+        # bulk_create() / bulk_update() send no post_save signals
+        bump_tenant_version(tenant.id)
+        patient_ids = {*patient_ids, *(getattr(obj, 'patient_id', None) for obj in objects)}
+        patient_ids.discard(None)
+        if patient_ids:
+            forget_section_counts(*patient_ids)
+
+
+class ConditionalGetViewMixin:
+    """
+    ETag (and, on detail views, Last-Modified) validators for GETs, checked
+    before anything is read or serialized so unchanged data is answered
+    with 304.
+
+    The validator is the tenant's data version (``common.tenant_cache``,
+    bumped by every write to the tenant's data, bulk ones included) with the
+    request's path, query and format, so checking it costs one cache read
+    and no query.
+    """
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            lambda: super(ConditionalGetViewMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            lambda: super(ConditionalGetViewMixin, self).retrieve(request, *args, **kwargs),
+            detail=True,
+        )
+
+    def conditional_response(self, respond, detail=False, window=None):
+        """
+        ``respond()``, or 304 if the client's validators still match.
+        ``window`` identifies the time range of lists filtered by the clock.
+        """
+        request = self.request
+        version = get_tenant_version(request.user.tenant_id)
+        fingerprint = repr((
+            request.user.tenant_id, version, request.get_full_path(),
+            request.accepted_renderer.format, window,
+        ))
+        etag = quote_etag(hashlib.sha256(fingerprint.encode()).hexdigest()[:32])
+        # Lists get no Last-Modified: a second is too coarse to tell a
+        # polling client about every change
+        last_modified = version // 1000 if detail else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = respond()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class TenantModelViewSet(
+    ConditionalGetViewMixin, BulkWriteViewMixin, FastListViewMixin, RelatedFieldsViewMixin,
+    SparseFieldsetViewMixin, viewsets.ModelViewSet,
+):
+    """Base of the tenant data viewsets: the read and write paths above."""
 
 
 class IsAuthenticatedAndTenantOwner(permissions.BasePermission):
@@ -37,7 +370,16 @@ class IsAuthenticatedAndTenantOwner(permissions.BasePermission):
         return getattr(obj, 'tenant_id', None) == request.user.tenant_id
 
 
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientSearchFilter(SearchFilter):
+    """``?search=`` through the patient search columns (patients.search)"""
+    search_description = 'Name words, phone digits, email or date of birth.'
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        return search_patients(queryset, query)
+
+
+class PatientViewSet(TenantModelViewSet):
     """
     ViewSet for Patient CRUD operations
     - List all patients (with search, filter, sort)
@@ -47,11 +389,11 @@ class PatientViewSet(viewsets.ModelViewSet):
     - Delete patient
     """
     serializer_class = PatientSerializer
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['first_name', 'last_name', 'email', 'phone']
+    pagination_class = KeysetPagination
+    filter_backends = [PatientSearchFilter, OrderingFilter]
     ordering_fields = ['created_at', 'first_name']
     ordering = ['-created_at']
+    audit_name = 'patient'
     permission_classes = [permissions.IsAuthenticated, IsAuthenticatedAndTenantOwner]
     
     def get_queryset(self):
@@ -62,22 +404,20 @@ class PatientViewSet(viewsets.ModelViewSet):
         """Set tenant when creating patient"""
         patient = serializer.save(tenant=self.request.user.tenant)
         log_audit(
+            'patient_created',
             user=self.request.user,
-            action='CREATE',
-            model='Patient',
-            object_id=patient.id,
-            changes={'created': 'Patient record created'}
+            tenant=self.request.user.tenant,
+            details=f'Patient {patient.id} created via API.'
         )
     
     def perform_update(self, serializer):
         """Log patient updates"""
         patient = serializer.save()
         log_audit(
+            'patient_updated',
             user=self.request.user,
-            action='UPDATE',
-            model='Patient',
-            object_id=patient.id,
-            changes=serializer.validated_data
+            tenant=self.request.user.tenant,
+            details=f'Patient {patient.id} updated via API: {", ".join(sorted(serializer.validated_data))}.'
         )
     
     @action(detail=True, methods=['get'])
@@ -87,7 +427,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         appointments = Appointment.objects.filter(
             patient=patient,
             tenant=request.user.tenant
-        ).order_by('-appointment_date')
+        ).select_related('patient').order_by('-scheduled_for')
         serializer = AppointmentSerializer(appointments, many=True)
         return Response(serializer.data)
     
@@ -98,25 +438,27 @@ class PatientViewSet(viewsets.ModelViewSet):
         records = ClinicalRecord.objects.filter(
             patient=patient,
             tenant=request.user.tenant
-        ).order_by('-visit_date')
+        ).select_related('patient').order_by('-created_at')
         serializer = ClinicalRecordSerializer(records, many=True)
         return Response(serializer.data)
 
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(TenantModelViewSet):
     """
     ViewSet for Appointment scheduling
     - List appointments with filtering by date, status
-    - Create new appointment with conflict detection
+    - Create new appointment
     - Update appointment
     - Delete appointment
     """
     serializer_class = AppointmentSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetPagination
     filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['patient__first_name', 'patient__last_name', 'appointment_type']
-    ordering_fields = ['appointment_date', 'appointment_time']
-    ordering = ['appointment_date', 'appointment_time']
+    search_fields = ['patient__first_name', 'patient__last_name', 'status']
+    ordering_fields = ['scheduled_for', 'created_at']
+    ordering = ['-scheduled_for']
+    related_fields = {'patient_name': ['patient']}
+    audit_name = 'appointment'
     permission_classes = [permissions.IsAuthenticated, IsAuthenticatedAndTenantOwner]
     
     def get_queryset(self):
@@ -128,8 +470,8 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         date_to = self.request.query_params.get('date_to')
         if date_from and date_to:
             queryset = queryset.filter(
-                appointment_date__gte=date_from,
-                appointment_date__lte=date_to
+                scheduled_for__date__gte=date_from,
+                scheduled_for__date__lte=date_to
             )
         
         # Filter by status
@@ -137,163 +479,235 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        return queryset.order_by('-appointment_date')
+        return queryset.order_by('-scheduled_for')
     
     def perform_create(self, serializer):
-        """Create appointment with conflict detection"""
+        """Create appointment"""
         appointment = serializer.save(tenant=self.request.user.tenant)
         log_audit(
+            'appointment_created',
             user=self.request.user,
-            action='CREATE',
-            model='Appointment',
-            object_id=appointment.id,
-            changes={'created': f'Appointment scheduled for {appointment.appointment_date}'}
+            tenant=self.request.user.tenant,
+            details=f'Appointment {appointment.id} scheduled for {appointment.scheduled_for} via API.'
         )
     
     @action(detail=False, methods=['get'])
     def today(self, request):
         """Get today's appointments"""
-        today = timezone.now().date()
-        appointments = self.get_queryset().filter(
-            appointment_date=today
-        ).order_by('appointment_time')
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        day_start = start_of_day(timezone.now().date())
+        appointments = self.load_related(self.get_queryset()).filter(
+            scheduled_for__gte=day_start,
+            scheduled_for__lt=day_start + timedelta(days=1)
+        ).order_by('scheduled_for')
+        return self.conditional_response(
+            lambda: Response(self.get_serializer(appointments, many=True).data),
+            window=day_start,
+        )
     
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         """Get upcoming appointments for the next 7 days"""
-        today = timezone.now().date()
-        upcoming_date = today + timedelta(days=7)
-        appointments = self.get_queryset().filter(
-            appointment_date__gte=today,
-            appointment_date__lte=upcoming_date,
+        now = timezone.now()
+        appointments = self.load_related(self.get_queryset()).filter(
+            scheduled_for__gte=now,
+            scheduled_for__lte=now + timedelta(days=7),
             status__in=['scheduled', 'confirmed']
-        ).order_by('appointment_date')
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        ).order_by('scheduled_for')
+        return self.conditional_response(
+            lambda: Response(self.get_serializer(appointments, many=True).data),
+            # The window slides: revalidate at most a minute later
+            window=now.replace(second=0, microsecond=0),
+        )
 
 
-class ClinicalRecordViewSet(viewsets.ModelViewSet):
+class ClinicalRecordViewSet(TenantModelViewSet):
     """
     ViewSet for Clinical Records (SOAP notes)
     - List records with filtering
     - Create SOAP note
     - View record details
-    - Update (with locking)
+    - Update record
     """
     serializer_class = ClinicalRecordSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetPagination
     filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['patient__first_name', 'patient__last_name', 'assessment']
-    ordering_fields = ['visit_date', 'created_at']
-    ordering = ['-visit_date']
+    search_fields = ['patient__first_name', 'patient__last_name', 'assessment_diagnosis']
+    ordering_fields = ['created_at', 'updated_at']
+    ordering = ['-created_at']
+    related_fields = {'patient_name': ['patient']}
+    audit_name = 'clinical_record'
     permission_classes = [permissions.IsAuthenticated, IsAuthenticatedAndTenantOwner]
     
     def get_queryset(self):
         """Filter records by tenant"""
-        return ClinicalRecord.objects.filter(tenant=self.request.user.tenant).order_by('-visit_date')
+        return ClinicalRecord.objects.filter(tenant=self.request.user.tenant).order_by('-created_at')
     
     def perform_create(self, serializer):
         """Create clinical record"""
-        record = serializer.save(
-            tenant=self.request.user.tenant,
-            provider=self.request.user
-        )
-        log_audit(
-            user=self.request.user,
-            action='CREATE',
-            model='ClinicalRecord',
-            object_id=record.id,
-            changes={'created': f'SOAP note for {record.patient}'}
-        )
-    
-    def update(self, request, *args, **kwargs):
-        """Prevent updates to locked records"""
-        instance = self.get_object()
-        if instance.is_locked:
-            return Response(
-                {'error': 'Record is locked and cannot be modified'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        return super().update(request, *args, **kwargs)
-    
-    @action(detail=True, methods=['post'])
-    def lock(self, request, pk=None):
-        """Lock a clinical record (make immutable)"""
-        record = self.get_object()
-        record.is_locked = True
-        record.save()
+        record = serializer.save(tenant=self.request.user.tenant)
         log_audit(
+            'clinical_record_created',
             user=self.request.user,
-            action='UPDATE',
-            model='ClinicalRecord',
-            object_id=record.id,
-            changes={'action': 'Record locked'}
+            tenant=self.request.user.tenant,
+            details=f'Clinical record {record.id} for patient {record.patient_id} created via API.'
         )
-        return Response({'status': 'Record locked'})
 
 
-class LabResultViewSet(viewsets.ModelViewSet):
+class LabResultViewSet(TenantModelViewSet):
     """
     ViewSet for Lab Results
     - List lab results with filtering
     - View result details
     """
     serializer_class = LabResultSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetPagination
     filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['patient__first_name', 'patient__last_name', 'test_name']
-    ordering_fields = ['lab_date', 'result_date']
-    ordering = ['-result_date']
+    search_fields = ['patient__first_name', 'patient__last_name', 'result']
+    ordering_fields = ['created_at', 'updated_at']
+    ordering = ['-created_at']
+    related_fields = {'patient_name': ['patient']}
+    audit_name = 'lab_result'
     permission_classes = [permissions.IsAuthenticated, IsAuthenticatedAndTenantOwner]
     
     def get_queryset(self):
         """Filter results by tenant"""
-        return LabResult.objects.filter(tenant=self.request.user.tenant).order_by('-result_date')
+        return LabResult.objects.filter(tenant=self.request.user.tenant).order_by('-created_at')
     
     def perform_create(self, serializer):
         """Create lab result"""
         result = serializer.save(tenant=self.request.user.tenant)
         log_audit(
+            'lab_result_created',
             user=self.request.user,
-            action='CREATE',
-            model='LabResult',
-            object_id=result.id,
-            changes={'created': f'Lab result: {result.test_name}'}
+            tenant=self.request.user.tenant,
+            details=f'Lab result {result.id} for patient {result.patient_id} created via API.'
         )
 
 
+class SyncView(APIView):
+    """
+    Delta sync for offline clients: the tenant's patients, appointments,
+    clinical records and lab results changed or deleted since ``?since=``
+    (omit it for a full download). Repeat with the returned ``token`` while
+    ``more`` is true.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', settings.API_SYNC_PAGE_SIZE))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= settings.API_SYNC_PAGE_SIZE:
+            return Response(
+                {'limit': [f'Must be a whole number between 1 and {settings.API_SYNC_PAGE_SIZE}.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            body = sync_changes(
+                request.user.tenant, request.query_params.get('since'), limit
+            )
+        except InvalidToken:
+            return Response(
+                {'since': ['Invalid sync token.']}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except ExpiredToken:
+            return Response(
+                {'detail': 'Sync token expired; sync again without "since".'},
+                status=status.HTTP_410_GONE,
+            )
+        return Response(body)
+
+
 class DashboardViewSet(viewsets.ViewSet):
     """Dashboard statistics endpoint"""
     permission_classes = [permissions.IsAuthenticated]
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get dashboard statistics"""
-        today = timezone.now().date()
+        """Get dashboard statistics (cached per tenant until its data changes)"""
         tenant = request.user.tenant
-        
-        stats = {
-            'total_patients': Patient.objects.filter(tenant=tenant).count(),
-            'appointments_today': Appointment.objects.filter(
-                tenant=tenant,
-                appointment_date=today
-            ).count(),
-            'pending_appointments': Appointment.objects.filter(
-                tenant=tenant,
-                status='scheduled'
-            ).count(),
-            'new_patients_this_month': Patient.objects.filter(
-                tenant=tenant,
-                created_at__month=today.month,
-                created_at__year=today.year
-            ).count(),
-            'active_users': CustomUser.objects.filter(
-                tenant=tenant,
-                is_active=True
-            ).count(),
-        }
-        
+        today = timezone.now().date()
+        stats = cached_for_tenant(
+            tenant.id,
+            f'api:dashboard-stats:{today.isoformat()}',
+            lambda: self._build_stats(tenant, today),
+        )
         serializer = DashboardStatsSerializer(stats)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def demographics(self, request):
+        """
+        Age histogram, gender split and age x gender cross-tab of the tenant's
+        patients. ``?age_edges=0,18,65`` overrides the configured age buckets.
+        """
+        tenant = request.user.tenant
+        try:
+            edges = parse_age_edges(
+                request.query_params.get('age_edges')
+                or ','.join(map(str, settings.ANALYTICS_AGE_BUCKET_EDGES))
+            )
+        except ValueError as exc:
+            return Response({'age_edges': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+        today = timezone.now().date()
+        data = cached_for_tenant(
+            tenant.id,
+            f"api:demographics:{today.isoformat()}:{','.join(map(str, edges))}",
+            lambda: patient_demographics(
+                Patient.objects.filter(tenant=tenant), edges, today
+            ),
+        )
+        return Response(data)
+
+    @action(detail=False, methods=['get'], url_path='active-patients')
+    def active_patients(self, request):
+        """
+        Distinct patients with an appointment or chart activity in the last
+        ``?days=`` days (default 90). Estimated from HyperLogLog sketches
+        unless ``?exact=1`` is given.
+        """
+        try:
+            days = int(request.query_params.get('days', 90))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= 3660:
+            return Response(
+                {'days': ['Must be a whole number between 1 and 3660.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        exact = request.query_params.get('exact') == '1'
+        today = timezone.now().date()
+        count = active_patient_count(
+            request.user.tenant, today - timedelta(days=days - 1), today, exact=exact
+        )
+        return Response({
+            'days': days,
+            'active_patients': count,
+            'exact': exact,
+            'relative_error': 0 if exact else round(RELATIVE_ERROR, 4),
+        })
+
+    @staticmethod
+    def _build_stats(tenant, today):
+        """Compute the statistics with one aggregate query per table"""
+        day_start = start_of_day(today)
+        month_begin = start_of_day(month_start(today))
+        stats = aggregate_metrics(
+            Patient.objects.filter(tenant=tenant),
+            total_patients=ALL,
+            new_patients_this_month=Q(created_at__gte=month_begin),
+        )
+        stats.update(aggregate_metrics(
+            Appointment.objects.filter(tenant=tenant),
+            appointments_today=Q(
+                scheduled_for__gte=day_start,
+                scheduled_for__lt=day_start + timedelta(days=1),
+            ),
+            pending_appointments=Q(status='scheduled'),
+        ))
+        stats.update(aggregate_metrics(
+            CustomUser.objects.filter(tenant=tenant),
+            active_users=Q(is_active=True),
+        ))
+        return stats
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("appointments", "0003_alter_appointment_id"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="appointment",
+            name="scheduled_for",
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("appointments", "0004_alter_appointment_scheduled_for"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["tenant", "scheduled_for", "id"],
+                name="appointment_tenant__8434d2_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("appointments", "0005_appointment_appointment_tenant__8434d2_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["tenant", "updated_at", "id"],
+                name="appointment_tenant__cbaddf_idx",
+            ),
+        ),
+    ]
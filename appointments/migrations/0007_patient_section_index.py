@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("appointments", "0006_change_feed_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["patient", "scheduled_for", "id"],
+                name="appointment_patient_75f894_idx",
+            ),
+        ),
+    ]
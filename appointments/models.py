@@ -13,11 +13,21 @@ class Appointment(models.Model):
     patient = models.ForeignKey(
         Patient, on_delete=models.CASCADE, related_name="appointments"
     )
-    scheduled_for = models.DateTimeField()
+    scheduled_for = models.DateTimeField(db_index=True)
     status = models.CharField(max_length=20, default="scheduled")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the API list: (tenant, scheduled_for, id)
+            models.Index(fields=["tenant", "scheduled_for", "id"]),
+            # Change feed of /api/v1/sync/: (tenant, updated_at, id)
+            models.Index(fields=["tenant", "updated_at", "id"]),
+            # Patient detail section pages: (patient, scheduled_for, id)
+            models.Index(fields=["patient", "scheduled_for", "id"]),
+        ]
+
     def __str__(self):
         return f"{self.patient} @ {self.scheduled_for}"
 
@@ -11,6 +11,8 @@ PLAN_DETAILS = {
         "max_users": 2,
         "max_patients": 5,
         "max_appointments": 50,
+        # Request rates per tenant and per user (api.throttling)
+        "api_rate_limits": {"tenant": "120/min", "user": "60/min"},
         "features": [
             "Basic patient management",
             "Limited appointments",
@@ -26,6 +28,7 @@ PLAN_DETAILS = {
         "max_users": 5,
         "max_patients": 100,
         "max_appointments": 500,
+        "api_rate_limits": {"tenant": "600/min", "user": "180/min"},
         "features": [
             "Up to 5 users",
             "Up to 100 patients",
@@ -43,6 +46,7 @@ PLAN_DETAILS = {
         "max_users": 20,
         "max_patients": 500,
         "max_appointments": 2000,
+        "api_rate_limits": {"tenant": "2400/min", "user": "300/min"},
         "features": [
             "Up to 20 users",
             "Up to 500 patients",
@@ -62,6 +66,7 @@ PLAN_DETAILS = {
         "max_users": None,  # Unlimited
         "max_patients": None,  # Unlimited
         "max_appointments": None,  # Unlimited
+        "api_rate_limits": {"tenant": "12000/min", "user": "600/min"},
         "features": [
             "Unlimited users",
             "Unlimited patients",
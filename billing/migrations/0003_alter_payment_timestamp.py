@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0002_patientinvoice_invoicelineitem"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="payment",
+            name="timestamp",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
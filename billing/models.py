@@ -45,7 +45,7 @@ class Payment(models.Model):
     )
     amount = models.DecimalField(max_digits=8, decimal_places=2)
     currency = models.CharField(max_length=10, default="USD")
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
     description = models.CharField(max_length=255, blank=True)
     is_subscription = models.BooleanField(default=False)
     external_id = models.CharField(max_length=100, blank=True)  # For gateway reference
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("clinical_records", "0004_alter_clinicalrecord_id"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="clinicalrecord",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("clinical_records", "0005_alter_clinicalrecord_created_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="clinicalrecord",
+            index=models.Index(
+                fields=["tenant", "created_at", "id"],
+                name="clinical_re_tenant__43764c_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("clinical_records", "0006_clinicalrecord_clinical_re_tenant__43764c_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="clinicalrecord",
+            index=models.Index(
+                fields=["tenant", "updated_at", "id"],
+                name="clinical_re_tenant__40f89f_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("clinical_records", "0007_change_feed_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="clinicalrecord",
+            index=models.Index(
+                fields=["patient", "created_at", "id"],
+                name="clinical_re_patient_b4cabb_idx",
+            ),
+        ),
+    ]
@@ -5,3 +5,13 @@ def log_audit(action, user=None, tenant=None, details=None):
     AuditLog.objects.create(
         action=action, user=user, tenant=tenant, details=details or ""
     )
+
+
+def log_audit_many(action, user=None, tenant=None, details=()):
+    """One ``log_audit`` entry per item of ``details``, written in a single INSERT."""
+    AuditLog.objects.bulk_create(
+        [
+            AuditLog(action=action, user=user, tenant=tenant, details=detail)
+            for detail in details
+        ]
+    )
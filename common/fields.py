@@ -0,0 +1,38 @@
+from django.db import models
+
+
+class DerivedCharField(models.CharField):
+    """
+    A CharField computed from other fields of the same row each time the row
+    is saved: ``derive`` is called with the values of the ``derived_from``
+    fields. It is also filled in by ``bulk_create()``, which calls
+    ``pre_save()``; code using ``bulk_update()`` or ``QuerySet.update()``
+    must call ``pre_save()`` itself (as the API bulk endpoints do).
+    """
+
+    def __init__(self, *args, derive=None, derived_from=(), **kwargs):
+        self.derive = derive
+        self.derived_from = tuple(derived_from)
+        kwargs.setdefault("editable", False)
+        kwargs.setdefault("blank", True)
+        kwargs.setdefault("default", "")
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        # derive isn't kept in migrations, so historical models store as-is
+        if self.derive is None:
+            return super().pre_save(model_instance, add)
+        value = self.derive(
+            *(getattr(model_instance, name) for name in self.derived_from)
+        )
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def with_derived_fields(model, update_fields):
+    """``update_fields`` plus the derived fields of ``model`` depending on them."""
+    update_fields = set(update_fields)
+    for field in model._meta.concrete_fields:
+        if set(getattr(field, "derived_from", ())) & update_fields:
+            update_fields.add(field.name)
+    return update_fields
@@ -0,0 +1,47 @@
+"""
+Signal handlers that keep tenant-scoped caches coherent.
+
+Any write to a model listed in ``TENANT_DATA_MODELS`` bumps the owning
+tenant's data version, invalidating cached analytics and dashboard results.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from appointments.models import Appointment
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+from users.models import CustomUser
+
+from .tenant_cache import bump_tenant_version
+
+TENANT_DATA_MODELS = [
+    Patient,
+    Appointment,
+    ClinicalRecord,
+    LabResult,
+    Payment,
+    CustomUser,
+]
+
+
+def invalidate_tenant_cache(sender, instance, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    # Logins only touch last_login; they should not flush the tenant's cache.
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    bump_tenant_version(getattr(instance, "tenant_id", None))
+
+
+def connect_signals():
+    for model in TENANT_DATA_MODELS:
+        post_save.connect(
+            invalidate_tenant_cache,
+            sender=model,
+            dispatch_uid=f"tenant_cache_save_{model._meta.label_lower}",
+        )
+        post_delete.connect(
+            invalidate_tenant_cache,
+            sender=model,
+            dispatch_uid=f"tenant_cache_delete_{model._meta.label_lower}",
+        )
@@ -0,0 +1,66 @@
+"""
+Tenant-namespaced result cache.
+
+Every tenant has a data version kept in the cache. Cached values are stored
+under keys that embed the version, so bumping it (see ``common.signals``,
+which does so whenever tenant data is written) invalidates every cached
+result for that tenant at once without tracking individual keys.
+
+The version is a millisecond timestamp of the last change, which also makes
+it usable as a Last-Modified value for conditional HTTP responses.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = "tenant:{tenant_id}:data-version"
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_tenant_version(tenant_id):
+    """Return the tenant's current data version, initialising it if missing."""
+    key = VERSION_KEY.format(tenant_id=tenant_id)
+    version = cache.get(key)
+    if version is None:
+        # add() only wins for the first writer, so concurrent requests agree.
+        cache.add(key, _now_ms(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_tenant_version(tenant_id):
+    """Invalidate all cached results for the tenant."""
+    if tenant_id is None:
+        return
+    key = VERSION_KEY.format(tenant_id=tenant_id)
+    current = cache.get(key) or 0
+    # Versions only move forward, even if two bumps land in the same millisecond.
+    cache.set(key, max(_now_ms(), current + 1), timeout=None)
+
+
+def tenant_cache_key(tenant_id, name):
+    """Versioned cache key for ``name`` within the tenant's namespace."""
+    return f"tenant:{tenant_id}:v{get_tenant_version(tenant_id)}:{name}"
+
+
+def cached_for_tenant(tenant_id, name, builder, timeout=None):
+    """
+    Return the cached value of ``name`` for the tenant, building it on a miss.
+
+    ``builder`` is called without arguments and must return a picklable,
+    non-None value (evaluate querysets into lists first).
+    """
+    key = tenant_cache_key(tenant_id, name)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(
+            key,
+            value,
+            timeout if timeout is not None else settings.TENANT_CACHE_TIMEOUT,
+        )
+    return value
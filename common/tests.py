@@ -1,9 +1,33 @@
+from django.core.cache import cache
 from django.test import TestCase
 
 from .permissions import has_permission
+from .tenant_cache import bump_tenant_version, cached_for_tenant, get_tenant_version
 
 
 class PermissionsTest(TestCase):
     def test_has_permission_callable(self):
         # The helper should be importable and callable
         self.assertTrue(callable(has_permission))
+
+
+class TenantCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_invalidates_only_that_tenant(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(cached_for_tenant(1, "report", build), 1)
+        self.assertEqual(cached_for_tenant(1, "report", build), 1)
+        self.assertEqual(cached_for_tenant(2, "report", build), 2)
+
+        version = get_tenant_version(1)
+        bump_tenant_version(1)
+        self.assertGreater(get_tenant_version(1), version)
+        self.assertEqual(cached_for_tenant(1, "report", build), 3)
+        self.assertEqual(cached_for_tenant(2, "report", build), 2)
@@ -5,6 +5,13 @@ from celery.schedules import crontab
 from dotenv import load_dotenv
 from datetime import timedelta
 
+# Analytics event recorder (analytics.recorder): events are written in bulk
+# batches of this size, at most this many seconds after they were recorded.
+ANALYTICS_EVENT_FLUSH_SIZE = int(os.environ.get("ANALYTICS_EVENT_FLUSH_SIZE", 500))
+ANALYTICS_EVENT_FLUSH_INTERVAL = float(
+    os.environ.get("ANALYTICS_EVENT_FLUSH_INTERVAL", 10)
+)
+
 CELERY_BEAT_SCHEDULE = {
     "send-weekly-trial-expiry-notifications": {
         "task": "billing.tasks.weekly_trial_expiry_notifications",
@@ -18,8 +25,60 @@ CELERY_BEAT_SCHEDULE = {
         "task": "billing.tasks.nightly_subscription_health_check",
         "schedule": crontab(minute=45, hour=1),  # 01:45 UTC daily
     },
+    "refresh-daily-tenant-metrics": {
+        "task": "analytics.tasks.refresh_daily_tenant_metrics",
+        "schedule": crontab(minute="*/15"),  # every 15 minutes
+    },
+    "flush-analytics-events": {
+        "task": "analytics.tasks.flush_analytics_events",
+        "schedule": ANALYTICS_EVENT_FLUSH_INTERVAL,
+    },
+    "compact-analytics-events": {
+        "task": "analytics.tasks.compact_analytics_events",
+        "schedule": crontab(minute=30, hour=2),  # 02:30 UTC daily
+    },
+    "take-executive-snapshots": {
+        "task": "analytics.tasks.take_executive_snapshots",
+        "schedule": crontab(minute=20, hour=0),  # 00:20 UTC daily
+    },
+    "purge-sync-tombstones": {
+        "task": "api.tasks.purge_sync_tombstones",
+        "schedule": crontab(minute=50, hour=2),  # 02:50 UTC daily
+    },
 }
 
+# Analytics rollups: how many trailing days each incremental refresh rebuilds.
+# Two days covers late edits to yesterday's records around midnight.
+ANALYTICS_ROLLUP_REFRESH_DAYS = int(os.environ.get("ANALYTICS_ROLLUP_REFRESH_DAYS", 2))
+
+# Lower edges, in whole years, of the patient age buckets used by the
+# demographics analytics (analytics.demographics); the last bucket is open.
+ANALYTICS_AGE_BUCKET_EDGES = tuple(
+    int(edge)
+    for edge in os.environ.get("ANALYTICS_AGE_BUCKET_EDGES", "0,19,36,51,66").split(",")
+)
+
+# Analytics report exports (analytics.exports): exports with more rows than
+# this are generated by a Celery task into ANALYTICS_EXPORT_ROOT (see below)
+# instead of being streamed; rows are read from the database in chunks.
+ANALYTICS_EXPORT_ASYNC_ROWS = int(os.environ.get("ANALYTICS_EXPORT_ASYNC_ROWS", 50000))
+ANALYTICS_EXPORT_CHUNK_SIZE = int(os.environ.get("ANALYTICS_EXPORT_CHUNK_SIZE", 2000))
+
+# Analytics event retention (analytics.compaction): raw events are kept this
+# many days before being folded into hourly rollups, hourly rollups are folded
+# into daily ones after the second window, and daily rollups expire after the
+# third. Compaction rolls up and deletes this many rows per transaction.
+ANALYTICS_EVENT_RAW_RETENTION_DAYS = int(
+    os.environ.get("ANALYTICS_EVENT_RAW_RETENTION_DAYS", 30)
+)
+ANALYTICS_EVENT_HOURLY_RETENTION_DAYS = int(
+    os.environ.get("ANALYTICS_EVENT_HOURLY_RETENTION_DAYS", 90)
+)
+ANALYTICS_RETENTION_DAYS = int(os.environ.get("ANALYTICS_RETENTION_DAYS", 730))
+ANALYTICS_COMPACTION_CHUNK_SIZE = int(
+    os.environ.get("ANALYTICS_COMPACTION_CHUNK_SIZE", 5000)
+)
+
 # Celery broker/result backend (use Redis or other broker in production)
 _redis_url = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
 _broker_url = os.environ.get("CELERY_BROKER_URL") or _redis_url
@@ -42,6 +101,55 @@ CELERY_BROKER_USE_SSL = (
 )
 CELERY_RESULT_BACKEND_USE_SSL = CELERY_BROKER_USE_SSL
 
+# Cache: share the Redis instance used by Celery when one is configured,
+# otherwise fall back to a per-process local-memory cache for development.
+_cache_url = os.environ.get("CACHE_URL") or os.environ.get("REDIS_URL")
+if _cache_url:
+    if _cache_url.startswith("rediss://"):
+        _cache_url = _cache_url + "?ssl_cert_reqs=none"
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": _cache_url,
+            "KEY_PREFIX": "cliniccloud",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "cliniccloud",
+        }
+    }
+
+# Analytics events are buffered on a Redis list drained by the flush task when
+# Redis is configured; otherwise each process buffers in memory and flushes
+# after sending a response. ANALYTICS_EVENTS_ENABLED=false turns recording off.
+ANALYTICS_EVENTS_ENABLED = (
+    os.environ.get("ANALYTICS_EVENTS_ENABLED", "true").lower() == "true"
+)
+ANALYTICS_EVENT_REDIS_URL = _cache_url
+ANALYTICS_EVENT_BUFFER = os.environ.get(
+    "ANALYTICS_EVENT_BUFFER", "redis" if ANALYTICS_EVENT_REDIS_URL else "local"
+)
+
+# Patient search (patients.search): on PostgreSQL, how similar (0-1) a name
+# must be to a query word to match it despite misspellings.
+PATIENT_SEARCH_SIMILARITY_THRESHOLD = float(
+    os.environ.get("PATIENT_SEARCH_SIMILARITY_THRESHOLD", 0.4)
+)
+
+# Duplicate patient detection (patients.mpi): the match score (0-1) from
+# which a pair is queued for review (the queue is ranked, so it errs towards
+# recall), and the largest block of patients sharing a key (birth date,
+# phonetic surname, phone suffix) compared.
+MPI_DUPLICATE_THRESHOLD = float(os.environ.get("MPI_DUPLICATE_THRESHOLD", 0.6))
+MPI_MAX_BLOCK_SIZE = int(os.environ.get("MPI_MAX_BLOCK_SIZE", 500))
+
+# Tenant result cache (common.tenant_cache). Entries are invalidated by data
+# version bumps on writes, so the timeout only bounds memory use.
+TENANT_CACHE_TIMEOUT = int(os.environ.get("TENANT_CACHE_TIMEOUT", 6 * 60 * 60))
+
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 # For production, use SMTP:
 # EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -79,6 +187,8 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    # Trigram lookups for patient search (no-op on other databases)
+    "django.contrib.postgres",
     "rest_framework",
     "corsheaders",
     "drf_spectacular",
@@ -102,12 +212,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.ResponseCompressionMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "analytics.middleware.AnalyticsEventMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -185,6 +297,9 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Generated analytics exports contain PHI, so they live outside MEDIA_ROOT
+# and are only served through the tenant-checked download view.
+ANALYTICS_EXPORT_ROOT = os.environ.get("ANALYTICS_EXPORT_ROOT", BASE_DIR / "exports")
 
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY", "")
 STRIPE_PUBLISHABLE_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY", "")
@@ -203,7 +318,7 @@ if not DEBUG:
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.ClaimsJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
@@ -215,21 +330,62 @@ REST_FRAMEWORK = {
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ],
+    # Token buckets per client address, and per tenant and user at the
+    # rates of the tenant's plan (billing.constants.PLAN_DETAILS)
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "api.throttling.AnonBucketThrottle",
+        "api.throttling.TenantRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "100/hour",
-        "user": "1000/hour",
     },
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "api.v1.renderers.ORJSONRenderer",
         "rest_framework.renderers.BrowsableAPIRenderer",
     ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.v1.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
+# API responses of at least API_COMPRESSION_MIN_SIZE bytes are compressed with
+# brotli (when installed) or gzip, as negotiated with Accept-Encoding.
+API_COMPRESSION_PATH_PREFIX = "/api/"
+API_COMPRESSION_MIN_SIZE = int(os.environ.get("API_COMPRESSION_MIN_SIZE", 1024))
+API_BROTLI_QUALITY = int(os.environ.get("API_BROTLI_QUALITY", 5))
+
+# JWT-authenticated API requests read the user and tenant from the cache
+# (api.authentication); cached rows are dropped when saved, and in any case
+# refreshed after this many seconds.
+API_AUTH_CACHE_TIMEOUT = int(os.environ.get("API_AUTH_CACHE_TIMEOUT", 60))
+
+# API throttle buckets (api.throttling) live in Redis when it is configured,
+# shared by every process; otherwise each process keeps its own.
+API_THROTTLE_REDIS_URL = _cache_url
+API_THROTTLE_STORE = os.environ.get(
+    "API_THROTTLE_STORE", "redis" if API_THROTTLE_REDIS_URL else "local"
+)
+
+# Largest array accepted by the /bulk/ endpoints of the api/v1 viewsets.
+API_BULK_MAX_ITEMS = int(os.environ.get("API_BULK_MAX_ITEMS", 1000))
+
+# /api/v1/sync/ (api.v1.sync): rows per resource per response, how long a
+# change settles before it is synced (longer than any write transaction), and
+# how long deletes are remembered; older tokens must resync from scratch.
+API_SYNC_PAGE_SIZE = int(os.environ.get("API_SYNC_PAGE_SIZE", 500))
+API_SYNC_SETTLE_SECONDS = int(os.environ.get("API_SYNC_SETTLE_SECONDS", 10))
+API_SYNC_TOMBSTONE_DAYS = int(os.environ.get("API_SYNC_TOMBSTONE_DAYS", 90))
+
+# api/v1 list endpoints serialize .values() rows through precompiled field
+# plans instead of model instances; API_FAST_LIST_SERIALIZATION=false goes back
+# to the regular serializers.
+API_FAST_LIST_SERIALIZATION = (
+    os.environ.get("API_FAST_LIST_SERIALIZATION", "true").lower() == "true"
+)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
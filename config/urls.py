@@ -19,11 +19,14 @@ from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
 from analytics.views import (
+    analytics_chart_data,
     analytics_dashboard,
+    analytics_export,
+    analytics_export_download,
+    analytics_exports,
     appointment_analytics,
     executive_summary,
     patient_analytics,
@@ -34,6 +37,7 @@ from admin_dashboard.views import (
     department_overview,
     department_detail,
 )
+from api.v1.auth import AuthViewSet, CustomTokenObtainPairView, DenylistTokenRefreshView
 from appointments.views import (
     appointment_create,
     appointment_delete,
@@ -78,6 +82,8 @@ from patients.views import (
     patient_detail,
     patient_edit,
     patient_list,
+    patient_search,
+    patient_section,
 )
 from referrals.views import create_referral, referral_list
 from tenants.views import create_tenant, tenant_onboarding, view_plans
@@ -138,7 +144,9 @@ urlpatterns = [
     path("accounts/logout/", auth_views.LogoutView.as_view(), name="logout"),
     path("patients/", patient_list, name="patient_list"),
     path("patients/add/", patient_create, name="patient_create"),
+    path("patients/search/", patient_search, name="patient_search"),
     path("patients/<int:pk>/", patient_detail, name="patient_detail"),
+    path("patients/<int:pk>/sections/<str:section>/", patient_section, name="patient_section"),
     path("patients/<int:pk>/edit/", patient_edit, name="patient_edit"),
     path("patients/<int:pk>/delete/", patient_delete, name="patient_delete"),
     path("patients/<int:patient_pk>/billing/", patient_billing, name="patient_billing"),
@@ -197,6 +205,22 @@ urlpatterns = [
     path("analytics/revenue/", revenue_analytics, name="revenue_analytics"),
     path("analytics/users/", user_activity_analytics, name="user_activity_analytics"),
     path("analytics/executive/", executive_summary, name="executive_summary"),
+    path(
+        "analytics/charts/<slug:series>/",
+        analytics_chart_data,
+        name="analytics_chart_data",
+    ),
+    path("analytics/exports/", analytics_exports, name="analytics_exports"),
+    path(
+        "analytics/exports/<slug:report>/",
+        analytics_export,
+        name="analytics_export",
+    ),
+    path(
+        "analytics/exports/download/<int:pk>/",
+        analytics_export_download,
+        name="analytics_export_download",
+    ),
     path("fhir/Patient/<int:pk>/", patient_read, name="fhir_patient_read"),
     path("fhir/", fhir_info, name="fhir_info"),
     # Add to urlpatterns:
@@ -223,8 +247,17 @@ urlpatterns = [
     path("billing/webhook/", stripe_webhook, name="stripe_webhook"),
     # API v1 endpoints
     path("api/v1/", include("api.v1.urls")),
-    path("api/v1/auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("api/v1/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path(
+        "api/v1/auth/token/", CustomTokenObtainPairView.as_view(), name="token_obtain_pair"
+    ),
+    path(
+        "api/v1/auth/token/refresh/",
+        DenylistTokenRefreshView.as_view(),
+        name="token_refresh",
+    ),
+    path(
+        "api/v1/auth/logout/", AuthViewSet.as_view({"post": "logout"}), name="token_logout"
+    ),
     # API Documentation
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
@@ -1,5 +1,7 @@
 from django import forms
 
+from patients.forms import PatientPickerSelect
+
 from .models import Document
 
 
@@ -7,3 +9,4 @@ class DocumentUploadForm(forms.ModelForm):
     class Meta:
         model = Document
         fields = ["file", "description", "patient", "referral"]
+        widgets = {"patient": PatientPickerSelect}
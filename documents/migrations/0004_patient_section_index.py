@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("documents", "0003_alter_document_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(
+                fields=["patient", "uploaded_at", "id"],
+                name="documents_d_patient_b89d18_idx",
+            ),
+        ),
+    ]
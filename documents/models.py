@@ -15,5 +15,11 @@ class Document(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     description = models.CharField(max_length=255, blank=True)
 
+    class Meta:
+        indexes = [
+            # Patient detail section pages: (patient, uploaded_at, id)
+            models.Index(fields=["patient", "uploaded_at", "id"]),
+        ]
+
     def __str__(self):
         return f"{self.file.name} for {self.patient}"
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("labs", "0004_alter_labresult_created_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="labresult",
+            index=models.Index(
+                fields=["tenant", "created_at", "id"],
+                name="labs_labres_tenant__de555d_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("labs", "0005_labresult_labs_labres_tenant__de555d_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="labresult",
+            index=models.Index(
+                fields=["tenant", "updated_at", "id"],
+                name="labs_labres_tenant__07078d_idx",
+            ),
+        ),
+    ]
@@ -12,8 +12,18 @@ class LabResult(models.Model):
         Patient, on_delete=models.CASCADE, related_name="lab_results"
     )
     result = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the API list: (tenant, created_at, id)
+            models.Index(fields=["tenant", "created_at", "id"]),
+            # Change feed of /api/v1/sync/: (tenant, updated_at, id)
+            models.Index(fields=["tenant", "updated_at", "id"]),
+            # Patient detail section pages: (patient, created_at, id)
+            models.Index(fields=["patient", "created_at", "id"]),
+        ]
+
     def __str__(self):
         return f"LabResult for {self.patient} at {self.created_at}"
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Patient
+from .merge import merge_patients
+from .models import DuplicatePair, Patient
 
 
 @admin.register(Patient)
@@ -28,3 +29,30 @@ class PatientAdmin(admin.ModelAdmin):
             "fields": ("email", "phone"),
         }),
     )
+
+
+@admin.register(DuplicatePair)
+class DuplicatePairAdmin(admin.ModelAdmin):
+    """The duplicate review queue (patients.mpi), best match first."""
+
+    list_display = ("patient", "duplicate", "score", "status", "tenant", "updated_at")
+    list_filter = ("status",)
+    list_select_related = ("patient", "duplicate", "tenant")
+    raw_id_fields = ("patient", "duplicate")
+    readonly_fields = ("score", "created_at", "updated_at")
+    actions = ["merge_duplicates", "mark_distinct"]
+
+    def has_merge_permission(self, request):
+        # Merging deletes the duplicate patients
+        return request.user.has_perm("patients.delete_patient")
+
+    @admin.action(description="Merge into the older patient", permissions=["merge"])
+    def merge_duplicates(self, request, queryset):
+        pairs = queryset.filter(status="pending").values_list("patient", "duplicate")
+        merged = merge_patients(pairs, user=request.user)
+        self.message_user(request, f"{len(merged)} duplicate patients merged.")
+
+    @admin.action(description="Mark as not duplicates")
+    def mark_distinct(self, request, queryset):
+        updated = queryset.filter(status="pending").update(status="distinct")
+        self.message_user(request, f"{updated} pairs marked as not duplicates.")
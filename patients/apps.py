@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class PatientsConfig(AppConfig):
     name = "patients"
+
+    def ready(self):
+        from .search import prepare_connection
+        from .signals import connect_signals
+
+        connection_created.connect(
+            prepare_connection, dispatch_uid="patients_prepare_connection"
+        )
+        connect_signals()
@@ -7,3 +7,34 @@ class PatientForm(forms.ModelForm):
     class Meta:
         model = Patient
         fields = ["first_name", "last_name", "date_of_birth", "email", "phone"]
+
+
+class PatientPickerSelect(forms.Select):
+    """
+    Patient select that renders only the chosen patient, so a form doesn't
+    load every patient of the tenant; the options are searched for in the
+    browser with ``patients/_patient_picker.html``.
+    """
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        chosen = self.choices.queryset.filter(pk__in=[v for v in value if v])
+        options = [("", field.empty_label or "")]
+        options += [(str(patient.pk), str(patient)) for patient in chosen]
+        return [
+            (
+                None,
+                [
+                    self.create_option(
+                        name,
+                        option_value,
+                        label,
+                        option_value in value,
+                        index,
+                        attrs=attrs,
+                    )
+                ],
+                index,
+            )
+            for index, (option_value, label) in enumerate(options)
+        ]
@@ -0,0 +1,37 @@
+"""
+Management command to rebuild the duplicate patient review queue.
+Usage: python manage.py find_duplicate_patients [--tenant-id 3]
+
+Each tenant is scanned in full (patients.mpi.scan_tenant): its pending
+pairs are replaced by the ones found, reviewed pairs keep their status.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from patients.mpi import scan_tenant
+from tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = "Find likely duplicate patients and queue them for review"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tenant-id",
+            type=int,
+            help="Optional tenant ID to scan; defaults to every tenant",
+        )
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.order_by("pk")
+        if options.get("tenant_id"):
+            tenants = tenants.filter(pk=options["tenant_id"])
+            if not tenants.exists():
+                raise CommandError(f"Tenant {options['tenant_id']} does not exist")
+
+        total = 0
+        for tenant in tenants:
+            self.stdout.write(f"{tenant.name} (tenant {tenant.pk}):")
+            total += scan_tenant(
+                tenant.pk, progress=lambda message: self.stdout.write(f"  {message}")
+            )
+        self.stdout.write(self.style.SUCCESS(f"Found {total} likely duplicate pairs."))
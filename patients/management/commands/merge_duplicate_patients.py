@@ -0,0 +1,57 @@
+"""
+Management command to merge the duplicate pairs found by find_duplicate_patients.
+Usage: python manage.py merge_duplicate_patients --min-score 0.95 [--tenant-id 3]
+
+Pending pairs scoring at least --min-score are merged into their older
+patient (patients.merge.merge_patients), --batch-size pairs per
+transaction. Pairs marked "Not a duplicate" are left alone.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from patients.merge import merge_patients
+from patients.models import DuplicatePair
+
+
+class Command(BaseCommand):
+    help = "Merge pending duplicate patient pairs above a match score"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-score",
+            type=float,
+            required=True,
+            help="Lowest match score (0-1) of the pairs to merge",
+        )
+        parser.add_argument(
+            "--tenant-id",
+            type=int,
+            help="Optional tenant ID to scope the merge",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Pairs merged per transaction (default 500)",
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options["min_score"] <= 1:
+            raise CommandError("--min-score must be between 0 and 1")
+        pairs = DuplicatePair.objects.filter(
+            status="pending", score__gte=options["min_score"]
+        ).order_by("-score", "pk")
+        if options.get("tenant_id"):
+            pairs = pairs.filter(tenant_id=options["tenant_id"])
+
+        total = 0
+        while True:
+            # Merged pairs are deleted with their duplicate patient
+            batch = list(
+                pairs.values_list("patient", "duplicate")[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            merged = merge_patients(batch)
+            total += len(merged)
+            self.stdout.write(f"  Merged {len(merged)} patients ({total} so far)")
+        self.stdout.write(self.style.SUCCESS(f"Merged {total} duplicate patients."))
@@ -0,0 +1,174 @@
+"""
+Merging patients recorded twice.
+
+``merge_patients`` takes ``(survivor_id, duplicate_id)`` pairs, as found by
+``patients.mpi``, and in one transaction:
+
+* points every row referring to a duplicate (appointments, clinical
+  records, lab results, referrals, documents, invoices, payments and any
+  other foreign key to ``Patient``) at its survivor, with one UPDATE per
+  table for up to ``UPDATE_BATCH_SIZE`` duplicates;
+* copies the contact details the survivors lack from their duplicates,
+  in one ``bulk_update()``;
+* deletes the duplicates (and with them their ``DuplicatePair`` rows);
+* writes one audit entry per duplicate listing what was moved.
+
+Pairs may chain (B into A, then C into B): each duplicate ends up in the
+survivor at the root of its chain, so a batch can merge whole clusters.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, Value, When
+from django.utils import timezone
+
+from common.audit import log_audit_many
+from common.fields import with_derived_fields
+from common.tenant_cache import bump_tenant_version
+
+from .models import Patient
+from .sections import forget_section_counts
+
+# Patient fields copied from a duplicate when the survivor's are blank
+FILLED_FIELDS = ("email", "phone", "gender", "picture")
+UPDATE_BATCH_SIZE = 250
+
+
+def _survivors(pairs):
+    """``{duplicate_id: survivor_id}`` with chained merges resolved."""
+    parents = {}
+
+    def root(patient_id):
+        while patient_id in parents:
+            patient_id = parents[patient_id]
+        return patient_id
+
+    for survivor_id, duplicate_id in pairs:
+        survivor_root, duplicate_root = root(survivor_id), root(duplicate_id)
+        if survivor_root != duplicate_root:
+            parents[duplicate_root] = survivor_root
+    return {patient_id: root(patient_id) for patient_id in parents}
+
+
+def patient_relations():
+    """The foreign keys to ``Patient`` whose rows a merge moves."""
+    return [
+        relation.field
+        for relation in Patient._meta.related_objects
+        if relation.one_to_many
+    ]
+
+
+def _move_related(survivors):
+    """Point the rows of every relation at the survivors; counts per duplicate."""
+    moved = defaultdict(dict)
+    now = timezone.now()
+    duplicate_ids = list(survivors)
+    for field in patient_relations():
+        model = field.model
+        touched = {
+            other.name: now
+            for other in model._meta.concrete_fields
+            if getattr(other, "auto_now", False)
+        }
+        for start in range(0, len(duplicate_ids), UPDATE_BATCH_SIZE):
+            batch = duplicate_ids[start : start + UPDATE_BATCH_SIZE]
+            rows = model._base_manager.filter(**{f"{field.name}__in": batch})
+            counts = dict(rows.values_list(field.attname).annotate(Count("pk")))
+            if not counts:
+                continue
+            survivor = Case(
+                *(
+                    When(
+                        **{field.attname: duplicate_id},
+                        then=Value(survivors[duplicate_id]),
+                    )
+                    for duplicate_id in counts
+                ),
+                output_field=field.target_field,
+            )
+            rows.update(**{field.name: survivor}, **touched)
+            for duplicate_id, count in counts.items():
+                moved[duplicate_id][model] = count
+    return moved
+
+
+def _fill_blanks(patients, survivors):
+    changed, updated_fields = [], set()
+    for duplicate_id, survivor_id in survivors.items():
+        survivor, duplicate = patients[survivor_id], patients[duplicate_id]
+        fields = [
+            name
+            for name in FILLED_FIELDS
+            if not getattr(survivor, name) and getattr(duplicate, name)
+        ]
+        for name in fields:
+            setattr(survivor, name, getattr(duplicate, name))
+        if fields:
+            changed.append(survivor)
+            updated_fields.update(fields)
+    if not changed:
+        return
+    update_fields = with_derived_fields(Patient, updated_fields) | {"updated_at"}
+    for survivor in changed:
+        for name in update_fields:
+            Patient._meta.get_field(name).pre_save(survivor, False)
+    Patient.objects.bulk_update(set(changed), update_fields)
+
+
+def _describe(duplicate, survivor_id, moved):
+    counts = []
+    for model, count in moved.items():
+        opts = model._meta
+        counts.append(
+            f"{count} {opts.verbose_name if count == 1 else opts.verbose_name_plural}"
+        )
+    rows = ", ".join(counts)
+    return (
+        f"Patient {duplicate.pk} ({duplicate.get_full_name()}) merged into "
+        f"patient {survivor_id}" + (f": moved {rows}." if rows else ".")
+    )
+
+
+def merge_patients(pairs, user=None):
+    """
+    Merge each duplicate of the ``(survivor_id, duplicate_id)`` ``pairs`` into
+    its survivor; returns ``{duplicate_id: survivor_id}`` of the merges done.
+    Raises ``ValueError`` if a patient is missing or a pair spans tenants.
+    """
+    survivors = _survivors(pairs)
+    if not survivors:
+        return {}
+    with transaction.atomic():
+        patient_ids = set(survivors) | set(survivors.values())
+        patients = (
+            Patient.objects.select_related("tenant")
+            .select_for_update(of=("self",))
+            .in_bulk(patient_ids)
+        )
+        missing = patient_ids - set(patients)
+        if missing:
+            raise ValueError(f"No patients with ids {sorted(missing)}")
+        for duplicate_id, survivor_id in survivors.items():
+            if patients[duplicate_id].tenant_id != patients[survivor_id].tenant_id:
+                raise ValueError(
+                    f"Patients {survivor_id} and {duplicate_id} "
+                    "are in different tenants"
+                )
+
+        moved = _move_related(survivors)
+        _fill_blanks(patients, survivors)
+        Patient.objects.filter(pk__in=survivors).delete()
+
+        details = defaultdict(list)
+        for duplicate_id, survivor_id in survivors.items():
+            duplicate = patients[duplicate_id]
+            details[duplicate.tenant].append(
+                _describe(duplicate, survivor_id, moved[duplicate_id])
+            )
+        for tenant, entries in details.items():
+            log_audit_many("patient_merged", user=user, tenant=tenant, details=entries)
+            # Queryset updates send no post_save signals
+            bump_tenant_version(tenant.pk)
+        forget_section_counts(*set(survivors.values()))
+    return survivors
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("patients", "0005_alter_patient_created_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                fields=["tenant", "created_at", "id"],
+                name="patients_pa_tenant__f0c3f3_idx",
+            ),
+        ),
+    ]
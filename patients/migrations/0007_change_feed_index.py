@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("patients", "0006_patient_patients_pa_tenant__f0c3f3_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                fields=["tenant", "updated_at", "id"],
+                name="patients_pa_tenant__8304e2_idx",
+            ),
+        ),
+    ]
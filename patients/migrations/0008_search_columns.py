@@ -0,0 +1,98 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:16
+
+import re
+import unicodedata
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+import common.fields
+
+BATCH_SIZE = 2000
+APOSTROPHES = str.maketrans("", "", "'’`")
+
+TRIGRAM_INDEXES = {
+    "patients_search_name_trgm": "search_name",
+    "patients_search_phone_trgm": "search_phone",
+    # Django compares UPPER(email::text) for email__icontains
+    "patients_email_upper_trgm": "(UPPER(email::text))",
+}
+
+
+# Frozen copies of patients.search.normalize_name and normalize_phone as of
+# this migration, so replaying it does not depend on the live module
+def normalize_name(*parts):
+    text = unicodedata.normalize("NFKD", " ".join(part or "" for part in parts))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    words = re.findall(r"\w+", text.translate(APOSTROPHES).casefold())
+    return f" {' '.join(words)} " if words else ""
+
+
+def normalize_phone(phone):
+    return re.sub(r"\D", "", phone or "")
+
+
+def fill_search_columns(apps, schema_editor):
+    Patient = apps.get_model("patients", "Patient")
+    batch = []
+    for patient in Patient.objects.only("first_name", "last_name", "phone").iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        patient.search_name = normalize_name(patient.first_name, patient.last_name)
+        patient.search_phone = normalize_phone(patient.phone)
+        batch.append(patient)
+        if len(batch) == BATCH_SIZE:
+            Patient.objects.bulk_update(batch, ["search_name", "search_phone"])
+            batch = []
+    Patient.objects.bulk_update(batch, ["search_name", "search_phone"])
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON patients_patient "
+            f"USING gin ({column} gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("patients", "0007_change_feed_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="patient",
+            name="search_name",
+            field=common.fields.DerivedCharField(
+                blank=True, default="", editable=False, max_length=210
+            ),
+        ),
+        migrations.AddField(
+            model_name="patient",
+            name="search_phone",
+            field=common.fields.DerivedCharField(
+                blank=True, default="", editable=False, max_length=20
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                fields=["tenant", "date_of_birth"],
+                name="patients_pa_tenant__9687e3_idx",
+            ),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+        # PostgreSQL only; other databases search without these indexes
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,163 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:20
+
+import unicodedata
+
+from django.contrib.postgres.operations import CreateExtension
+from django.db import migrations, models
+
+import common.fields
+
+BATCH_SIZE = 2000
+
+# A frozen copy of patients.phonetic.metaphone as of this migration, so
+# replaying it gives the same keys however the live algorithm is tuned
+VOWELS = frozenset("AEIOU")
+FRONT_VOWELS = frozenset("EIY")
+# A leading letter silent before the second one: GNome, KNight, PNeumonia...
+SILENT_INITIALS = frozenset(["AE", "GN", "KN", "PN", "WR"])
+
+
+def _letters(name):
+    text = unicodedata.normalize("NFKD", name or "")
+    return "".join(char for char in text.upper() if "A" <= char <= "Z")
+
+
+def metaphone(name):
+    word = _letters(name)
+    if not word:
+        return ""
+    if word[:2] in SILENT_INITIALS:
+        word = word[1:]
+    elif word[0] == "X":
+        word = "S" + word[1:]
+    elif word[:2] == "WH":
+        word = "W" + word[2:]
+
+    def at(index):
+        return word[index] if 0 <= index < len(word) else ""
+
+    key = []
+    for i, char in enumerate(word):
+        if char == at(i - 1) and char != "C":
+            continue
+        following, after = at(i + 1), at(i + 2)
+        if char in VOWELS:
+            if i == 0:
+                key.append(char)
+        elif char == "B":
+            # Silent in a final MB: lamB, coomB
+            if not (at(i - 1) == "M" and i == len(word) - 1):
+                key.append("B")
+        elif char == "C":
+            if following == "I" and after == "A" or following == "H":
+                key.append("K" if at(i - 1) == "S" else "X")
+            elif following in FRONT_VOWELS:
+                if at(i - 1) != "S":
+                    key.append("S")
+            else:
+                key.append("K")
+        elif char == "D":
+            key.append("J" if following == "G" and after in FRONT_VOWELS else "T")
+        elif char == "G":
+            if following == "H" and not (i + 2 == len(word) or after in VOWELS):
+                continue
+            if following == "N" and (i + 2 == len(word) or word[i + 1 :] == "NED"):
+                continue
+            if following in FRONT_VOWELS and at(i - 1) != "G":
+                key.append("J")
+            else:
+                key.append("K")
+        elif char == "H":
+            if at(i - 1) in "CSPTG" and at(i - 1):
+                continue
+            if at(i - 1) in VOWELS and following not in VOWELS:
+                continue
+            key.append("H")
+        elif char == "K":
+            if at(i - 1) != "C":
+                key.append("K")
+        elif char == "P":
+            key.append("F" if following == "H" else "P")
+        elif char == "Q":
+            key.append("K")
+        elif char == "S":
+            if following == "H" or following == "I" and after in ("O", "A"):
+                key.append("X")
+            else:
+                key.append("S")
+        elif char == "T":
+            if following == "I" and after in ("O", "A"):
+                key.append("X")
+            elif following == "H":
+                key.append("0")
+            elif not (following == "C" and after == "H"):
+                key.append("T")
+        elif char == "V":
+            key.append("F")
+        elif char in "WY":
+            if following in VOWELS:
+                key.append(char)
+        elif char == "X":
+            key.append("KS")
+        elif char == "Z":
+            key.append("S")
+        else:
+            # F J L M N R
+            key.append(char)
+    return "".join(key)
+
+
+def fill_name_keys(apps, schema_editor):
+    Patient = apps.get_model("patients", "Patient")
+    batch = []
+    for patient in Patient.objects.only("first_name", "last_name").iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        patient.first_name_key = metaphone(patient.first_name)
+        patient.last_name_key = metaphone(patient.last_name)
+        batch.append(patient)
+        if len(batch) == BATCH_SIZE:
+            Patient.objects.bulk_update(batch, ["first_name_key", "last_name_key"])
+            batch = []
+    Patient.objects.bulk_update(batch, ["first_name_key", "last_name_key"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("patients", "0008_search_columns"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="patient",
+            name="first_name_key",
+            field=common.fields.DerivedCharField(
+                blank=True, default="", editable=False, max_length=200
+            ),
+        ),
+        migrations.AddField(
+            model_name="patient",
+            name="last_name_key",
+            field=common.fields.DerivedCharField(
+                blank=True, default="", editable=False, max_length=200
+            ),
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                fields=["tenant", "last_name_key"],
+                name="patients_pa_tenant__17bff5_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                fields=["tenant", "first_name_key"],
+                name="patients_pa_tenant__51eb87_idx",
+            ),
+        ),
+        # levenshtein() for ranking; PostgreSQL only (SQLite gets a Python
+        # function from patients.search.prepare_connection)
+        CreateExtension("fuzzystrmatch"),
+    ]
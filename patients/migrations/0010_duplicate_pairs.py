@@ -0,0 +1,132 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:23
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import common.fields
+
+BATCH_SIZE = 2000
+PHONE_SUFFIX_DIGITS = 7
+
+
+# A frozen copy of patients.search.phone_number_suffix as of this migration
+def phone_number_suffix(phone):
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-PHONE_SUFFIX_DIGITS:] if len(digits) >= PHONE_SUFFIX_DIGITS else ""
+
+
+def fill_phone_suffixes(apps, schema_editor):
+    Patient = apps.get_model("patients", "Patient")
+    batch = []
+    for patient in (
+        Patient.objects.exclude(phone=None)
+        .exclude(phone="")
+        .only("phone")
+        .iterator(chunk_size=BATCH_SIZE)
+    ):
+        patient.phone_suffix = phone_number_suffix(patient.phone)
+        batch.append(patient)
+        if len(batch) == BATCH_SIZE:
+            Patient.objects.bulk_update(batch, ["phone_suffix"])
+            batch = []
+    Patient.objects.bulk_update(batch, ["phone_suffix"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenants", "0005_alter_tenant_id"),
+        ("patients", "0009_phonetic_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DuplicatePair",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "score",
+                    models.FloatField(
+                        help_text="Match score from 0 to 1 (patients.mpi)"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending review"),
+                            ("distinct", "Not a duplicate"),
+                        ],
+                        default="pending",
+                        max_length=8,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["-score"],
+            },
+        ),
+        migrations.AddField(
+            model_name="patient",
+            name="phone_suffix",
+            field=common.fields.DerivedCharField(
+                blank=True, default="", editable=False, max_length=7
+            ),
+        ),
+        migrations.RunPython(fill_phone_suffixes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                fields=["tenant", "phone_suffix"], name="patients_pa_tenant__b1bbd5_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="duplicatepair",
+            name="duplicate",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="patients.patient",
+            ),
+        ),
+        migrations.AddField(
+            model_name="duplicatepair",
+            name="patient",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="patients.patient",
+            ),
+        ),
+        migrations.AddField(
+            model_name="duplicatepair",
+            name="tenant",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="duplicate_pairs",
+                to="tenants.tenant",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="duplicatepair",
+            index=models.Index(
+                fields=["tenant", "status", "-score"],
+                name="patients_du_tenant__54c41c_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="duplicatepair",
+            unique_together={("patient", "duplicate")},
+        ),
+    ]
@@ -1,7 +1,11 @@
 from django.db import models
 
+from common.fields import DerivedCharField, with_derived_fields
 from tenants.models import Tenant
 
+from .phonetic import metaphone
+from .search import normalize_name, normalize_phone, phone_number_suffix
+
 
 class Patient(models.Model):
     GENDER_CHOICES = [
@@ -32,11 +36,56 @@ class Patient(models.Model):
     )
     email = models.EmailField(blank=True, null=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Read by patients.search; trigram-indexed on PostgreSQL (migration 0008)
+    search_name = DerivedCharField(
+        max_length=210, derive=normalize_name, derived_from=["first_name", "last_name"]
+    )
+    search_phone = DerivedCharField(
+        max_length=20, derive=normalize_phone, derived_from=["phone"]
+    )
+    # Metaphone keys for sounds-like name lookups (X is coded KS, hence 200)
+    first_name_key = DerivedCharField(
+        max_length=200, derive=metaphone, derived_from=["first_name"]
+    )
+    last_name_key = DerivedCharField(
+        max_length=200, derive=metaphone, derived_from=["last_name"]
+    )
+    # Duplicate detection block (patients.mpi)
+    phone_suffix = DerivedCharField(
+        max_length=7, derive=phone_number_suffix, derived_from=["phone"]
+    )
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the API list: (tenant, created_at, id)
+            models.Index(fields=["tenant", "created_at", "id"]),
+            # Change feed of /api/v1/sync/: (tenant, updated_at, id)
+            models.Index(fields=["tenant", "updated_at", "id"]),
+            # Date of birth searches
+            models.Index(fields=["tenant", "date_of_birth"]),
+            # Sounds-like name searches
+            models.Index(fields=["tenant", "last_name_key"]),
+            models.Index(fields=["tenant", "first_name_key"]),
+            models.Index(fields=["tenant", "phone_suffix"]),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
+
+    def save(self, *args, **kwargs):
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = with_derived_fields(self, kwargs["update_fields"])
+        super().save(*args, **kwargs)
+
+    def get_full_name(self):
+        return self.format_full_name(self.first_name, self.last_name)
+
+    @staticmethod
+    def format_full_name(first_name, last_name):
+        """``get_full_name`` from the raw column values (for ``.values()`` rows)."""
+        return f"{first_name} {last_name}".strip()
     
     def get_profile_picture_url(self):
         """Get profile picture URL, with gender-based default fallback.
@@ -56,3 +105,38 @@ class Patient(models.Model):
         else:
             # No gender disclosed (None, blank, 'O', or 'P') → use neutral default
             return '/static/img/default_profile.png'
+
+
+class DuplicatePair(models.Model):
+    """
+    Two patients of a tenant that may be the same person, found by
+    ``patients.mpi``. ``patient`` is the older record (lower id). Scans
+    refresh the score of pending pairs; reviewed ones keep their status.
+    Merging the patients (``patients.merge``) deletes the pair.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pending review"),
+        ("distinct", "Not a duplicate"),
+    ]
+
+    tenant = models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, related_name="duplicate_pairs"
+    )
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name="+")
+    duplicate = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField(help_text="Match score from 0 to 1 (patients.mpi)")
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default="pending")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-score"]
+        unique_together = ("patient", "duplicate")
+        indexes = [
+            # The review queue: a tenant's pending pairs, best match first
+            models.Index(fields=["tenant", "status", "-score"]),
+        ]
+
+    def __str__(self):
+        return f"{self.patient} / {self.duplicate} ({self.score:.2f})"
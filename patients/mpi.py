@@ -0,0 +1,277 @@
+"""
+Master patient index: finding patients recorded twice.
+
+Comparing every pair of a tenant's patients is quadratic, so patients are
+only compared within blocks sharing a key: the date of birth, the phonetic
+surname (``last_name_key``) or the last digits of the phone number
+(``phone_suffix``), all indexed columns. Blocks larger than
+``MPI_MAX_BLOCK_SIZE`` (a very common surname) are skipped; the other keys
+usually still bring their duplicates together.
+
+Candidate pairs are scored with NumPy a batch at a time (``score_pairs``):
+
+* names: the mean of the cosine similarity of hashed character bigram
+  counts of ``search_name`` and the share of first and last names with the
+  same Metaphone key, so "Jon Smyth" is close to "John Smith";
+* date of birth: equal, or for half the weight one typo away (one of day,
+  month and year differs, or day and month are swapped);
+* phone suffix and email: equal and present.
+
+Pairs scoring at least ``MPI_DUPLICATE_THRESHOLD`` are stored as
+``DuplicatePair`` rows, the review queue. ``scan_tenant`` rescans a whole
+tenant (``manage.py find_duplicate_patients``) and ``check_patient``
+compares one new patient with its blocks.
+"""
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DuplicatePair, Patient
+
+WEIGHTS = {"name": 0.5, "date_of_birth": 0.25, "phone": 0.15, "email": 0.1}
+FIELDS = (
+    "pk",
+    "search_name",
+    "date_of_birth",
+    "first_name_key",
+    "last_name_key",
+    "phone_suffix",
+    "email",
+)
+BLOCKING_KEYS = ("date_of_birth", "last_name_key", "phone_suffix")
+
+# Buckets of the hashed name bigram counts
+NAME_DIMENSIONS = 128
+SCORE_BATCH_SIZE = 50000
+WRITE_BATCH_SIZE = 1000
+
+
+def _bigram_slots():
+    slots = {}
+
+    def slot(bigram):
+        if bigram not in slots:
+            slots[bigram] = zlib.crc32(bigram.encode()) % NAME_DIMENSIONS
+        return slots[bigram]
+
+    return slot
+
+
+class Records:
+    """Patient rows (``FIELDS`` tuples) as column arrays, ordered by id."""
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+
+        slot = _bigram_slots()
+        rows_of, slots_of = [], []
+        for index, row in enumerate(rows):
+            name = row[1]
+            bigrams = [slot(name[i : i + 2]) for i in range(len(name) - 1)]
+            rows_of.extend([index] * len(bigrams))
+            slots_of.extend(bigrams)
+        self.names = np.zeros((len(rows), NAME_DIMENSIONS), dtype=np.uint8)
+        np.add.at(
+            self.names,
+            (np.array(rows_of, dtype=np.intp), np.array(slots_of, dtype=np.intp)),
+            1,
+        )
+        norms = np.sqrt((self.names.astype(np.float32) ** 2).sum(axis=1))
+        self.name_norms = np.maximum(norms, 1)
+
+        birth_dates = [row[2] for row in rows]
+        self.years, self.months, self.days = (
+            np.array([getattr(day, part) for day in birth_dates], dtype=np.int16)
+            for part in ("year", "month", "day")
+        )
+        self.codes = {
+            "date_of_birth": np.array(
+                [day.toordinal() for day in birth_dates], dtype=np.int64
+            ),
+            "first_name_key": self._codes(row[3] for row in rows),
+            "last_name_key": self._codes(row[4] for row in rows),
+            "phone_suffix": self._codes(row[5] for row in rows),
+            "email": self._codes((row[6] or "").lower() for row in rows),
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _codes(values):
+        """Integer codes of ``values``, 0 for the empty ones."""
+        codes = {"": 0}
+        return np.array(
+            [codes.setdefault(value, len(codes)) for value in values], dtype=np.int64
+        )
+
+
+def block_pairs(codes, max_block_size):
+    """
+    The pairs of records sharing a non-zero code, as arrays of their indexes
+    (left < right), and the number of blocks skipped for being too large.
+    """
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.diff(sorted_codes, prepend=-1))
+    sizes = np.diff(np.append(starts, len(codes)))
+    too_large = sizes > max_block_size
+    blocks = (sizes > 1) & ~too_large & (sorted_codes[starts] != 0)
+
+    lefts, rights = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    triangles = {}
+    for start, size in zip(starts[blocks], sizes[blocks]):
+        members = order[start : start + size]
+        if size not in triangles:
+            triangles[size] = np.triu_indices(size, 1)
+        first, second = triangles[size]
+        lefts.append(members[first])
+        rights.append(members[second])
+    skipped = int((too_large & (sorted_codes[starts] != 0)).sum())
+    return np.concatenate(lefts), np.concatenate(rights), skipped
+
+
+def score_pairs(records, left, right):
+    """Match scores (0-1) of the record pairs ``left[i]``, ``right[i]``."""
+
+    def same(key):
+        codes = records.codes[key]
+        return (codes[left] == codes[right]) & (codes[left] != 0)
+
+    dots = (records.names[left].astype(np.float32) * records.names[right]).sum(axis=1)
+    cosine = dots / (records.name_norms[left] * records.name_norms[right])
+    sounds_alike = (
+        same("first_name_key").astype(np.float32) + same("last_name_key")
+    ) / 2
+    name = (cosine + sounds_alike) / 2
+
+    years, months, days = records.years, records.months, records.days
+    differing = (
+        (years[left] != years[right]).astype(np.int8)
+        + (months[left] != months[right])
+        + (days[left] != days[right])
+    )
+    swapped = (
+        (years[left] == years[right])
+        & (months[left] == days[right])
+        & (days[left] == months[right])
+    )
+    date_of_birth = np.where(
+        differing == 0, 1.0, np.where((differing == 1) | swapped, 0.5, 0.0)
+    )
+
+    return (
+        WEIGHTS["name"] * name
+        + WEIGHTS["date_of_birth"] * date_of_birth
+        + WEIGHTS["phone"] * same("phone_suffix")
+        + WEIGHTS["email"] * same("email")
+    )
+
+
+def _save_pairs(tenant_id, patient_ids, duplicate_ids, scores):
+    pairs = [
+        DuplicatePair(
+            tenant_id=tenant_id,
+            patient_id=int(patient_id),
+            duplicate_id=int(duplicate_id),
+            score=round(float(score), 3),
+        )
+        for patient_id, duplicate_id, score in zip(patient_ids, duplicate_ids, scores)
+    ]
+    DuplicatePair.objects.bulk_create(
+        pairs,
+        batch_size=WRITE_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["patient", "duplicate"],
+        update_fields=["score", "updated_at"],
+    )
+    return len(pairs)
+
+
+def scan_tenant(tenant_id, progress=None):
+    """
+    Find the duplicate patients of a tenant, replacing its pending pairs;
+    returns the number of pairs found. ``progress`` is called with a line
+    of text after each step.
+    """
+    report = progress or (lambda message: None)
+    started = timezone.now()
+    records = Records(
+        Patient.objects.filter(tenant_id=tenant_id)
+        .values_list(*FIELDS)
+        .iterator(chunk_size=SCORE_BATCH_SIZE)
+    )
+    report(f"Loaded {len(records)} patients")
+
+    count = len(records)
+    candidates = [np.empty(0, dtype=np.int64)]
+    for key in BLOCKING_KEYS:
+        left, right, skipped = block_pairs(
+            records.codes[key], settings.MPI_MAX_BLOCK_SIZE
+        )
+        message = f"{key}: {len(left)} candidate pairs"
+        if skipped:
+            message += f" ({skipped} blocks over {settings.MPI_MAX_BLOCK_SIZE} skipped)"
+        report(message)
+        candidates.append(left * count + right)
+    candidates = np.unique(np.concatenate(candidates))
+
+    found = 0
+    for start in range(0, len(candidates), SCORE_BATCH_SIZE):
+        left, right = np.divmod(candidates[start : start + SCORE_BATCH_SIZE], count)
+        scores = score_pairs(records, left, right)
+        likely = scores >= settings.MPI_DUPLICATE_THRESHOLD
+        found += _save_pairs(
+            tenant_id,
+            records.ids[left[likely]],
+            records.ids[right[likely]],
+            scores[likely],
+        )
+        scored = min(start + SCORE_BATCH_SIZE, len(candidates))
+        report(f"Scored {scored}/{len(candidates)} pairs, {found} likely duplicates")
+
+    # Pending pairs this scan no longer found
+    DuplicatePair.objects.filter(
+        tenant_id=tenant_id, status="pending", updated_at__lt=started
+    ).delete()
+    return found
+
+
+def check_patient(patient):
+    """
+    Compare ``patient`` with the patients sharing one of its blocks and
+    store the likely duplicates; returns its pending pairs, best first.
+    """
+    blocks = Q(date_of_birth=patient.date_of_birth)
+    if patient.last_name_key:
+        blocks |= Q(last_name_key=patient.last_name_key)
+    if patient.phone_suffix:
+        blocks |= Q(phone_suffix=patient.phone_suffix)
+    rows = list(
+        Patient.objects.filter(blocks, tenant_id=patient.tenant_id)
+        .exclude(pk=patient.pk)
+        .order_by("-pk")
+        .values_list(*FIELDS)[: settings.MPI_MAX_BLOCK_SIZE * len(BLOCKING_KEYS)]
+    )
+    if rows:
+        records = Records(rows + [tuple(getattr(patient, field) for field in FIELDS)])
+        own = np.searchsorted(records.ids, patient.pk)
+        others = np.flatnonzero(records.ids != patient.pk)
+        left, right = np.minimum(own, others), np.maximum(own, others)
+        scores = score_pairs(records, left, right)
+        likely = scores >= settings.MPI_DUPLICATE_THRESHOLD
+        _save_pairs(
+            patient.tenant_id,
+            records.ids[left[likely]],
+            records.ids[right[likely]],
+            scores[likely],
+        )
+    return list(
+        DuplicatePair.objects.filter(
+            Q(patient=patient) | Q(duplicate=patient), status="pending"
+        ).select_related("patient", "duplicate")
+    )
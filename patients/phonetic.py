@@ -0,0 +1,129 @@
+"""
+Phonetic keys and edit distance for patient name matching.
+
+``metaphone`` is Lawrence Philips' original Metaphone: names that sound
+alike in English get the same key ("Smith" and "Smyth" are both ``SM0``,
+"Catherine" and "Kathryn" both ``K0RN``). Keys are stored with every patient
+(``first_name_key``, ``last_name_key``) so a sounds-like search is an
+indexed equality lookup; ``patients.search`` ranks the matches with
+``edit_distance``, which SQLite runs as a ``levenshtein()`` SQL function
+(PostgreSQL has its own in fuzzystrmatch).
+"""
+import unicodedata
+
+VOWELS = frozenset("AEIOU")
+FRONT_VOWELS = frozenset("EIY")
+# A leading letter silent before the second one: GNome, KNight, PNeumonia...
+SILENT_INITIALS = frozenset(["AE", "GN", "KN", "PN", "WR"])
+
+
+def _letters(name):
+    text = unicodedata.normalize("NFKD", name or "")
+    return "".join(char for char in text.upper() if "A" <= char <= "Z")
+
+
+def metaphone(name):
+    """The Metaphone key of ``name`` (accents ignored), or "" if it has no letters."""
+    word = _letters(name)
+    if not word:
+        return ""
+    if word[:2] in SILENT_INITIALS:
+        word = word[1:]
+    elif word[0] == "X":
+        word = "S" + word[1:]
+    elif word[:2] == "WH":
+        word = "W" + word[2:]
+
+    def at(index):
+        return word[index] if 0 <= index < len(word) else ""
+
+    key = []
+    for i, char in enumerate(word):
+        if char == at(i - 1) and char != "C":
+            continue
+        following, after = at(i + 1), at(i + 2)
+        if char in VOWELS:
+            if i == 0:
+                key.append(char)
+        elif char == "B":
+            # Silent in a final MB: lamB, coomB
+            if not (at(i - 1) == "M" and i == len(word) - 1):
+                key.append("B")
+        elif char == "C":
+            if following == "I" and after == "A" or following == "H":
+                key.append("K" if at(i - 1) == "S" else "X")
+            elif following in FRONT_VOWELS:
+                if at(i - 1) != "S":
+                    key.append("S")
+            else:
+                key.append("K")
+        elif char == "D":
+            key.append("J" if following == "G" and after in FRONT_VOWELS else "T")
+        elif char == "G":
+            if following == "H" and not (i + 2 == len(word) or after in VOWELS):
+                continue
+            if following == "N" and (i + 2 == len(word) or word[i + 1 :] == "NED"):
+                continue
+            if following in FRONT_VOWELS and at(i - 1) != "G":
+                key.append("J")
+            else:
+                key.append("K")
+        elif char == "H":
+            if at(i - 1) in "CSPTG" and at(i - 1):
+                continue
+            if at(i - 1) in VOWELS and following not in VOWELS:
+                continue
+            key.append("H")
+        elif char == "K":
+            if at(i - 1) != "C":
+                key.append("K")
+        elif char == "P":
+            key.append("F" if following == "H" else "P")
+        elif char == "Q":
+            key.append("K")
+        elif char == "S":
+            if following == "H" or following == "I" and after in ("O", "A"):
+                key.append("X")
+            else:
+                key.append("S")
+        elif char == "T":
+            if following == "I" and after in ("O", "A"):
+                key.append("X")
+            elif following == "H":
+                key.append("0")
+            elif not (following == "C" and after == "H"):
+                key.append("T")
+        elif char == "V":
+            key.append("F")
+        elif char in "WY":
+            if following in VOWELS:
+                key.append(char)
+        elif char == "X":
+            key.append("KS")
+        elif char == "Z":
+            key.append("S")
+        else:
+            # F J L M N R
+            key.append(char)
+    return "".join(key)
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings (None if either is None)."""
+    if a is None or b is None:
+        return None
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        previous = current
+    return previous[-1]
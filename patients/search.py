@@ -0,0 +1,177 @@
+"""
+Patient search.
+
+``search_patients`` is the one search used by the patient list, the API
+(``?search=``) and the patient pickers. It reads search columns kept up to
+date by ``Patient.save()`` rather than scanning the raw ones:
+
+* ``search_name``: first and last name folded to lowercase words without
+  accents or apostrophes, space-delimited (``" jose obrien "``). Every word
+  of the query must start a word of the name, so "jo o'b" finds José
+  O'Brien.
+* ``search_phone``: the digits of the phone number. A query of digits (any
+  spacing or punctuation) matches the numbers containing them.
+* ``first_name_key`` and ``last_name_key``: Metaphone keys of the names
+  (``patients.phonetic``). A query whose every word sounds like the first
+  or the last name matches too, so "Jon Smyth" finds John Smith; these are
+  plain (tenant, key) index lookups on every database.
+* A query that is a date (``DATE_INPUT_FORMATS``) is an exact date of birth
+  lookup, and one with an "@" matches email addresses.
+
+On PostgreSQL the search columns have pg_trgm GIN indexes serving those
+LIKE lookups, and names also match by trigram word similarity (so a name
+misspelt beyond its sound still finds the patient). Other databases scan
+the tenant's rows for them.
+
+Ranked name searches put the patients whose names sound like the most
+query words first, then those with the smallest edit distance between the
+query words and the names: ``levenshtein()`` from fuzzystrmatch on
+PostgreSQL, a Python function registered by ``prepare_connection`` on
+SQLite.
+"""
+import operator
+import re
+import unicodedata
+from datetime import datetime
+from functools import reduce
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, Func, IntegerField, Q, Value, When
+from django.db.models.functions import Least, Lower
+from django.utils.formats import get_format
+
+from .phonetic import edit_distance, metaphone
+
+PHONE_QUERY_RE = re.compile(r"^\+?[\d\s().-]+$")
+APOSTROPHES = str.maketrans("", "", "'’`")
+
+# Digits a query needs before it is taken for a phone number
+MIN_PHONE_DIGITS = 3
+# Trailing digits kept by phone_number_suffix
+PHONE_SUFFIX_DIGITS = 7
+
+
+def normalize_name(*parts):
+    """``search_name`` of the name ``parts``: ``" word word "``, or ""."""
+    text = unicodedata.normalize("NFKD", " ".join(part or "" for part in parts))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    words = re.findall(r"\w+", text.translate(APOSTROPHES).casefold())
+    return f" {' '.join(words)} " if words else ""
+
+
+def normalize_phone(phone):
+    """``search_phone`` of a phone number: its digits."""
+    return re.sub(r"\D", "", phone or "")
+
+
+def phone_number_suffix(phone):
+    """
+    The last ``PHONE_SUFFIX_DIGITS`` digits of a phone number, the same with
+    or without its country or trunk prefix ("" for shorter numbers).
+    """
+    digits = normalize_phone(phone)
+    return digits[-PHONE_SUFFIX_DIGITS:] if len(digits) >= PHONE_SUFFIX_DIGITS else ""
+
+
+def parse_date(query):
+    for date_format in get_format("DATE_INPUT_FORMATS"):
+        try:
+            return datetime.strptime(query, date_format).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class Levenshtein(Func):
+    function = "levenshtein"
+    output_field = IntegerField()
+
+
+def _trigrams_available(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def _sounds_like(key):
+    return Q(first_name_key=key) | Q(last_name_key=key)
+
+
+def _rank_by_name(queryset, words):
+    hits = [
+        Case(When(_sounds_like(key), then=Value(1)), default=Value(0))
+        for key in map(metaphone, words)
+        if key
+    ]
+    distances = [
+        Least(
+            Levenshtein(Lower("first_name"), Value(word)),
+            Levenshtein(Lower("last_name"), Value(word)),
+        )
+        for word in words
+    ]
+    return queryset.annotate(
+        name_hits=reduce(operator.add, hits) if hits else Value(0),
+        name_distance=reduce(operator.add, distances),
+    ).order_by("-name_hits", "name_distance", "last_name", "first_name", "pk")
+
+
+def search_patients(queryset, query, ranked=False):
+    """
+    The patients of ``queryset`` matching ``query``. With ``ranked`` they
+    are ordered best match first, then by name.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    date_of_birth = parse_date(query)
+    if date_of_birth is not None:
+        queryset = queryset.filter(date_of_birth=date_of_birth)
+        return (
+            queryset.order_by("last_name", "first_name", "pk") if ranked else queryset
+        )
+
+    words = []
+    if "@" in query:
+        conditions = [Q(email__icontains=query)]
+    else:
+        conditions = []
+        digits = normalize_phone(query)
+        if PHONE_QUERY_RE.match(query) and len(digits) >= MIN_PHONE_DIGITS:
+            conditions.append(Q(search_phone__contains=digits))
+        words = normalize_name(query).split()
+        if words:
+            conditions.append(
+                Q(*(Q(search_name__contains=f" {word}") for word in words))
+            )
+            keys = [metaphone(word) for word in words]
+            if all(keys):
+                conditions.append(Q(*(_sounds_like(key) for key in keys)))
+            if _trigrams_available(queryset):
+                conditions.append(Q(search_name__trigram_word_similar=" ".join(words)))
+    if not conditions:
+        return queryset.none()
+    queryset = queryset.filter(reduce(operator.or_, conditions))
+
+    if not ranked:
+        return queryset
+    if words:
+        return _rank_by_name(queryset, words)
+    return queryset.order_by("last_name", "first_name", "pk")
+
+
+def prepare_connection(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver: the threshold for fuzzy name matches on
+    PostgreSQL, ``levenshtein()`` on SQLite.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)",
+                [str(settings.PATIENT_SEARCH_SIMILARITY_THRESHOLD)],
+            )
+    elif connection.vendor == "sqlite":
+        connection.connection.create_function(
+            "levenshtein", 2, edit_distance, deterministic=True
+        )
@@ -0,0 +1,119 @@
+"""
+The history sections of the patient detail page.
+
+``patient_detail`` only renders the patient and how many rows each section
+has (``section_counts``, cached per patient until a row of one of the
+sections is saved or deleted, see ``patients.signals``). The page then
+loads every section from ``patient_section`` as it scrolls into view, a
+page of ``PAGE_SIZE`` rows at a time, so a patient with years of history
+costs as much to open as a new one:
+
+* pages are keyed on (ordering column, id), newest first, and read a
+  (patient, column, id) index of the section's table, so the hundredth
+  page costs the same as the first;
+* the text columns a list does not show are deferred; the ones it
+  previews are cut to ``PREVIEW_LENGTH`` characters by the database.
+"""
+from django.core.cache import cache
+from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Substr
+from django.http import Http404
+
+from appointments.models import Appointment
+from clinical_records.models import ClinicalRecord
+from documents.models import Document
+from labs.models import LabResult
+from referrals.models import Referral
+
+PAGE_SIZE = 20
+PREVIEW_LENGTH = 400
+COUNTS_KEY = "patient:{patient_id}:section-counts"
+# Counts are dropped on writes, so the timeout only bounds memory use
+COUNTS_TIMEOUT = 6 * 60 * 60
+
+
+class Section:
+    """A list of one model's rows for a patient, newest ``ordering`` first."""
+
+    def __init__(self, model, ordering, related=(), previews=()):
+        self.model = model
+        self.ordering = ordering
+        self.related = related
+        self.previews = previews
+
+    def rows(self, patient):
+        deferred = [
+            field.name
+            for field in self.model._meta.concrete_fields
+            if isinstance(field, models.TextField)
+        ]
+        return (
+            self.model.objects.filter(patient=patient)
+            .select_related(*self.related)
+            .defer(*deferred)
+            .annotate(
+                **{
+                    f"{name}_preview": Substr(name, 1, PREVIEW_LENGTH)
+                    for name in self.previews
+                }
+            )
+            .order_by(f"-{self.ordering}", "-pk")
+        )
+
+    def page(self, patient, cursor=None):
+        """A page of rows after ``cursor`` and the cursor of the next page."""
+        rows = self.rows(patient)
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            rows = rows.filter(
+                Q(**{f"{self.ordering}__lt": value})
+                | Q(**{self.ordering: value, "pk__lt": pk})
+            )
+        rows = list(rows[: PAGE_SIZE + 1])
+        if len(rows) <= PAGE_SIZE:
+            return rows, None
+        rows = rows[:PAGE_SIZE]
+        last = rows[-1]
+        return rows, f"{last.pk}~{getattr(last, self.ordering).isoformat()}"
+
+    def decode_cursor(self, cursor):
+        try:
+            pk, value = cursor.split("~", 1)
+            value = self.model._meta.get_field(self.ordering).to_python(value)
+            return value, int(pk)
+        except Exception:
+            raise Http404("Invalid cursor")
+
+
+SECTIONS = {
+    "clinical_records": Section(ClinicalRecord, "created_at", previews=["note"]),
+    "appointments": Section(Appointment, "scheduled_for"),
+    "referrals": Section(
+        Referral,
+        "created_at",
+        related=["from_clinic", "to_clinic", "referred_by"],
+        previews=["notes"],
+    ),
+    "lab_results": Section(LabResult, "created_at"),
+    "documents": Section(Document, "uploaded_at"),
+}
+
+
+def section_counts(patient):
+    """``{section name: number of rows}`` for the patient, cached."""
+    key = COUNTS_KEY.format(patient_id=patient.pk)
+    counts = cache.get(key)
+    if counts is None:
+        counts = {
+            name: section.model.objects.filter(patient=patient).count()
+            for name, section in SECTIONS.items()
+        }
+        cache.set(key, counts, COUNTS_TIMEOUT)
+    return counts
+
+
+def forget_section_counts(*patient_ids):
+    cache.delete_many(
+        [COUNTS_KEY.format(patient_id=patient_id) for patient_id in patient_ids]
+    )
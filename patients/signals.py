@@ -0,0 +1,22 @@
+"""
+Signal handlers that drop the cached section counts of the patient detail
+page (``patients.sections``) when a row of one of its sections is written.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from .sections import SECTIONS, forget_section_counts
+
+
+def forget_patient_section_counts(sender, instance, **kwargs):
+    forget_section_counts(instance.patient_id)
+
+
+def connect_signals():
+    for section in SECTIONS.values():
+        label = section.model._meta.label_lower
+        for name, signal in [("save", post_save), ("delete", post_delete)]:
+            signal.connect(
+                forget_patient_section_counts,
+                sender=section.model,
+                dispatch_uid=f"patients_section_counts_{name}_{label}",
+            )
@@ -1,10 +1,29 @@
+from datetime import date
+from io import StringIO
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from appointments.models import Appointment
+from audit_logs.models import AuditLog
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from documents.forms import DocumentUploadForm
+from labs.models import LabResult
 from tenants.models import Tenant
 from users.models import CustomUser
 
-from .models import Patient
+from .merge import merge_patients
+from .models import DuplicatePair, Patient
+from .mpi import block_pairs, check_patient, scan_tenant
+from .search import search_patients
+from .sections import PAGE_SIZE, section_counts
 
 
 class PatientListViewTest(TestCase):
@@ -25,3 +44,341 @@ class PatientListViewTest(TestCase):
         response = self.client.get(reverse("patient_list"))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "John Doe")
+
+
+class PatientSearchTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Search Tenant", subdomain="search")
+        other = Tenant.objects.create(name="Other Search", subdomain="search-other")
+        self.user = CustomUser.objects.create_user(
+            username="searcher", password="testpass", tenant=self.tenant
+        )
+        self.jose = self.patient("José", "O'Brien", phone="+44 (0)7700 900123")
+        self.maria = self.patient(
+            "Maria", "Jose-Lopez", email="Maria.Lopez@example.com"
+        )
+        self.patient("Joseph", "Smith", date_of_birth=date(1975, 3, 9))
+        self.patient("José", "O'Brien", tenant=other)
+
+    def patient(self, first_name, last_name, tenant=None, **fields):
+        fields.setdefault("date_of_birth", date(1990, 1, 1))
+        return Patient.objects.create(
+            tenant=tenant or self.tenant,
+            first_name=first_name,
+            last_name=last_name,
+            **fields,
+        )
+
+    def search(self, query):
+        queryset = search_patients(
+            Patient.objects.filter(tenant=self.tenant), query, ranked=True
+        )
+        return [f"{p.first_name} {p.last_name}" for p in queryset]
+
+    def test_search_columns_follow_saves(self):
+        self.assertEqual(self.jose.search_name, " jose obrien ")
+        self.assertEqual(self.jose.search_phone, "4407700900123")
+        self.jose.last_name = "Bryan"
+        self.jose.phone = None
+        self.jose.save(update_fields=["last_name", "phone"])
+        self.jose.refresh_from_db()
+        self.assertEqual(
+            (self.jose.search_name, self.jose.search_phone), (" jose bryan ", "")
+        )
+
+    def test_name_words_phone_email_and_date_of_birth(self):
+        self.assertEqual(
+            self.search("jose"), ["José O'Brien", "Joseph Smith", "Maria Jose-Lopez"]
+        )
+        self.assertEqual(self.search("JOSE o'b"), ["José O'Brien"])
+        self.assertEqual(self.search("lop mar"), ["Maria Jose-Lopez"])
+        self.assertEqual(self.search("jos smi"), ["Joseph Smith"])
+        self.assertEqual(self.search("7700 900-123"), ["José O'Brien"])
+        self.assertEqual(self.search("lopez@example"), ["Maria Jose-Lopez"])
+        self.assertEqual(self.search("1975-03-09"), ["Joseph Smith"])
+        # Substrings inside a word no longer match
+        self.assertEqual(self.search("rien"), [])
+        self.assertEqual(self.search("-"), [])
+
+    def test_sounds_like_names(self):
+        self.assertEqual(
+            (self.jose.first_name_key, self.jose.last_name_key), ("JS", "OBRN")
+        )
+        self.assertEqual(self.search("Jozay O'Brian"), ["José O'Brien"])
+        self.assertEqual(self.search("smyth"), ["Joseph Smith"])
+        self.patient("Jon", "Smythe")
+        self.patient("John", "Smith")
+        # Closest spelling first among the names sounding like both words
+        self.assertEqual(self.search("jon smyth")[:2], ["Jon Smythe", "John Smith"])
+
+    def test_patient_list_and_picker_search(self):
+        self.client.login(username="searcher", password="testpass")
+        response = self.client.get(reverse("patient_list"), {"search": "o'brien"})
+        self.assertContains(response, "O&#x27;Brien")
+        self.assertNotContains(response, "Maria")
+
+        response = self.client.get(reverse("patient_search"), {"q": "jose o"})
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {
+                    "id": self.jose.pk,
+                    "name": "José O'Brien",
+                    "date_of_birth": "1990-01-01",
+                }
+            ],
+        )
+        self.assertEqual(
+            self.client.get(reverse("patient_search")).json(), {"results": []}
+        )
+
+    def test_document_picker_renders_only_the_chosen_patient(self):
+        form = DocumentUploadForm(initial={"patient": self.maria})
+        form.fields["patient"].queryset = Patient.objects.filter(tenant=self.tenant)
+        html = str(form["patient"])
+        self.assertIn("Maria Jose-Lopez", html)
+        self.assertNotIn("Joseph", html)
+
+
+class DuplicateDetectionTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="MPI Tenant", subdomain="mpi")
+        self.other_tenant = Tenant.objects.create(name="Other MPI", subdomain="mpi-2")
+        self.jon = self.patient("Jon", "Smyth", date(1980, 4, 3), "+44 7700 900123")
+        # Day and month swapped, phone without the country code
+        self.john = self.patient("John", "Smith", date(1980, 3, 4), "07700 900123")
+        self.mary = self.patient("Mary", "Smith", date(1980, 4, 3))
+        self.patient("Jon", "Smyth", date(1980, 4, 3), tenant=self.other_tenant)
+
+    def patient(self, first_name, last_name, date_of_birth, phone=None, tenant=None):
+        return Patient.objects.create(
+            tenant=tenant or self.tenant,
+            first_name=first_name,
+            last_name=last_name,
+            date_of_birth=date_of_birth,
+            phone=phone,
+        )
+
+    def test_block_pairs(self):
+        codes = np.array([0, 5, 5, 7, 5, 0])
+        left, right, skipped = block_pairs(codes, max_block_size=3)
+        self.assertEqual(list(zip(left, right)), [(1, 2), (1, 4), (2, 4)])
+        self.assertEqual(skipped, 0)
+        left, right, skipped = block_pairs(codes, max_block_size=2)
+        self.assertEqual((len(left), skipped), (0, 1))
+
+    def test_scan_queues_likely_duplicates(self):
+        self.assertEqual(self.jon.phone_suffix, self.john.phone_suffix)
+        out = StringIO()
+        call_command("find_duplicate_patients", tenant_id=self.tenant.pk, stdout=out)
+        self.assertIn("Found 1 likely duplicate pairs", out.getvalue())
+        pair = DuplicatePair.objects.get()
+        self.assertEqual((pair.patient, pair.duplicate), (self.jon, self.john))
+        self.assertGreater(pair.score, 0.6)
+
+        # Reviewed pairs survive rescans, pending ones no longer found don't
+        pair.status = "distinct"
+        pair.save()
+        stale = DuplicatePair.objects.create(
+            tenant=self.tenant, patient=self.john, duplicate=self.mary, score=0.9
+        )
+        self.assertEqual(scan_tenant(self.tenant.pk), 1)
+        self.assertEqual(DuplicatePair.objects.get().status, "distinct")
+        self.assertFalse(DuplicatePair.objects.filter(pk=stale.pk).exists())
+
+    def test_new_patient_checked_against_its_blocks(self):
+        self.assertEqual(check_patient(self.mary), [])
+        CustomUser.objects.create_user(
+            username="registrar", password="testpass", tenant=self.tenant
+        )
+        self.client.login(username="registrar", password="testpass")
+        response = self.client.post(
+            reverse("patient_create"),
+            {
+                "first_name": "Mary",
+                "last_name": "Smyth",
+                "date_of_birth": "1980-04-03",
+                "phone": "",
+                "email": "",
+            },
+            follow=True,
+        )
+        self.assertContains(response, "may already be registered: Mary Smith")
+        pair = DuplicatePair.objects.get()
+        self.assertEqual(
+            (pair.patient, pair.duplicate.get_full_name()), (self.mary, "Mary Smyth")
+        )
+
+
+class MergePatientsTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Merge Tenant", subdomain="merge")
+        self.user = CustomUser.objects.create_user(
+            username="merger", password="testpass", tenant=self.tenant
+        )
+        self.survivor = self.patient("John", "Smith")
+        self.duplicate = self.patient("Jon", "Smith", phone="07700 900123")
+        self.triplicate = self.patient("John", "Smyth", email="john@example.com")
+        for patient in (self.survivor, self.duplicate, self.triplicate):
+            Appointment.objects.create(
+                tenant=self.tenant, patient=patient, scheduled_for=timezone.now()
+            )
+        LabResult.objects.create(
+            tenant=self.tenant, patient=self.duplicate, result="HbA1c 6.1%"
+        )
+        Payment.objects.create(tenant=self.tenant, patient=self.triplicate, amount=20)
+
+    def patient(self, first_name, last_name, **fields):
+        return Patient.objects.create(
+            tenant=self.tenant,
+            first_name=first_name,
+            last_name=last_name,
+            date_of_birth=date(1980, 4, 3),
+            **fields,
+        )
+
+    def test_merge_moves_related_rows_and_fills_blanks(self):
+        DuplicatePair.objects.create(
+            tenant=self.tenant,
+            patient=self.survivor,
+            duplicate=self.duplicate,
+            score=0.8,
+        )
+        # Chained: the triplicate goes to the survivor of its survivor
+        merged = merge_patients(
+            [
+                (self.survivor.pk, self.duplicate.pk),
+                (self.duplicate.pk, self.triplicate.pk),
+            ],
+            user=self.user,
+        )
+        self.assertEqual(
+            merged,
+            {self.duplicate.pk: self.survivor.pk, self.triplicate.pk: self.survivor.pk},
+        )
+        self.assertEqual(list(Patient.objects.all()), [self.survivor])
+        self.assertEqual(self.survivor.appointments.count(), 3)
+        self.assertEqual(self.survivor.lab_results.count(), 1)
+        self.assertEqual(self.survivor.payments.count(), 1)
+        self.assertFalse(DuplicatePair.objects.exists())
+
+        self.survivor.refresh_from_db()
+        self.assertEqual(
+            (self.survivor.phone, self.survivor.phone_suffix, self.survivor.email),
+            ("07700 900123", "0900123", "john@example.com"),
+        )
+        details = sorted(
+            AuditLog.objects.filter(action="patient_merged").values_list(
+                "details", flat=True
+            )
+        )
+        self.assertEqual(
+            details,
+            [
+                f"Patient {self.duplicate.pk} (Jon Smith) merged into patient "
+                f"{self.survivor.pk}: moved 1 appointment, 1 lab result.",
+                f"Patient {self.triplicate.pk} (John Smyth) merged into patient "
+                f"{self.survivor.pk}: moved 1 appointment, 1 payment.",
+            ],
+        )
+
+    def test_merge_refuses_patients_of_other_tenants(self):
+        other = Tenant.objects.create(name="Other Merge", subdomain="merge-2")
+        stranger = Patient.objects.create(
+            tenant=other,
+            first_name="John",
+            last_name="Smith",
+            date_of_birth=date(1980, 4, 3),
+        )
+        with self.assertRaises(ValueError):
+            merge_patients([(self.survivor.pk, stranger.pk)])
+        self.assertEqual(self.survivor.appointments.count(), 1)
+
+    def test_merge_command_merges_pairs_above_the_score(self):
+        DuplicatePair.objects.create(
+            tenant=self.tenant,
+            patient=self.survivor,
+            duplicate=self.duplicate,
+            score=0.97,
+        )
+        DuplicatePair.objects.create(
+            tenant=self.tenant,
+            patient=self.survivor,
+            duplicate=self.triplicate,
+            score=0.7,
+        )
+        out = StringIO()
+        call_command("merge_duplicate_patients", min_score=0.95, stdout=out)
+        self.assertIn("Merged 1 duplicate patients", out.getvalue())
+        self.assertEqual(set(Patient.objects.all()), {self.survivor, self.triplicate})
+
+
+class PatientDetailSectionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(name="Chart Tenant", subdomain="chart")
+        CustomUser.objects.create_user(
+            username="clinician", password="testpass", tenant=self.tenant
+        )
+        self.client.login(username="clinician", password="testpass")
+        self.patient = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Ada",
+            last_name="Long",
+            date_of_birth=date(1950, 5, 1),
+        )
+        ClinicalRecord.objects.bulk_create(
+            ClinicalRecord(
+                tenant=self.tenant,
+                patient=self.patient,
+                note=f"Visit {number} " + "word " * 200,
+                plan="Long plan text",
+            )
+            for number in range(PAGE_SIZE + 5)
+        )
+
+    def section_url(self, section):
+        return reverse("patient_section", args=[self.patient.pk, section])
+
+    def test_detail_renders_counts_not_history(self):
+        response = self.client.get(reverse("patient_detail", args=[self.patient.pk]))
+        self.assertContains(response, f"Clinical Records ({PAGE_SIZE + 5})")
+        self.assertContains(response, "Appointments (0)")
+        self.assertContains(response, self.section_url("clinical_records"))
+        self.assertNotContains(response, "Visit 0")
+        # Cached until a record of the patient is written
+        with self.assertNumQueries(0):
+            section_counts(self.patient)
+        ClinicalRecord.objects.create(tenant=self.tenant, patient=self.patient)
+        self.assertEqual(section_counts(self.patient)["clinical_records"], 26)
+
+    def test_sections_page_by_keyset_without_large_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.section_url("clinical_records"))
+        self.assertNotIn('"plan"', queries.captured_queries[-1]["sql"])
+        self.assertEqual(len(response.context["rows"]), PAGE_SIZE)
+        self.assertContains(response, "Load more")
+        # Newest first (same created_at, so by id)
+        self.assertContains(response, f"Visit {PAGE_SIZE + 4} ")
+
+        response = self.client.get(
+            self.section_url("clinical_records"),
+            {"cursor": response.context["next_cursor"]},
+        )
+        self.assertEqual(len(response.context["rows"]), 5)
+        self.assertNotContains(response, "Load more")
+        self.assertContains(response, "Visit 0 ")
+
+        response = self.client.get(self.section_url("appointments"))
+        self.assertContains(response, "No appointments yet.")
+        for section in ("referrals", "lab_results", "documents"):
+            self.assertEqual(
+                self.client.get(self.section_url(section)).status_code, 200
+            )
+
+    def test_unknown_sections_and_cursors_are_not_found(self):
+        self.assertEqual(self.client.get(self.section_url("invoices")).status_code, 404)
+        response = self.client.get(
+            self.section_url("clinical_records"), {"cursor": "nonsense"}
+        )
+        self.assertEqual(response.status_code, 404)
@@ -1,4 +1,6 @@
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
@@ -7,6 +9,12 @@ from common.tenant_scope import assign_tenant, enforce_tenant, scope_queryset
 
 from .forms import PatientForm
 from .models import Patient
+from .mpi import check_patient
+from .search import search_patients
+from .sections import SECTIONS, section_counts
+
+# Matches returned to the patient pickers per search
+PICKER_RESULTS = 20
 
 
 @login_required
@@ -42,39 +50,30 @@ def patient_detail(request, pk):
         recent_ids.remove(patient.pk)
     recent_ids.insert(0, patient.pk)
     request.session["recent_patients"] = recent_ids[:5]
-    from clinical_records.models import ClinicalRecord
-    from appointments.models import Appointment
-    from referrals.models import Referral
-    from labs.models import LabResult
-    from documents.models import Document
-
-    clinical_records = scope_queryset(
-        ClinicalRecord.objects.filter(patient=patient).order_by("-created_at"),
-        request.user,
-    )
-    appointments = scope_queryset(
-        Appointment.objects.filter(patient=patient).order_by("-scheduled_for"),
-        request.user,
-    )
-    referrals = scope_queryset(
-        Referral.objects.filter(patient=patient).order_by("-id"),
-        request.user,
-    )
-    lab_results = scope_queryset(
-        LabResult.objects.filter(patient=patient).order_by("-id"),
-        request.user,
-    )
-    documents = Document.objects.filter(patient=patient).order_by("-uploaded_at")
     return render(
         request,
         "patients/patient_detail.html",
+        {"patient": patient, "counts": section_counts(patient)},
+    )
+
+
+@login_required
+def patient_section(request, pk, section):
+    """One page of a history section of patient_detail (patients.sections)."""
+    patient = enforce_tenant(get_object_or_404(Patient, pk=pk), request.user)
+    if section not in SECTIONS:
+        raise Http404("Unknown section")
+    cursor = request.GET.get("cursor")
+    rows, next_cursor = SECTIONS[section].page(patient, cursor)
+    return render(
+        request,
+        f"patients/sections/{section}.html",
         {
             "patient": patient,
-            "clinical_records": clinical_records,
-            "appointments": appointments,
-            "referrals": referrals,
-            "lab_results": lab_results,
-            "documents": documents,
+            "section": section,
+            "rows": rows,
+            "cursor": cursor,
+            "next_cursor": next_cursor,
         },
     )
 
@@ -86,6 +85,19 @@ def patient_create(request):
         if form.is_valid():
             patient = assign_tenant(form.save(commit=False), request.user)
             patient.save()
+            duplicates = [
+                pair.duplicate if pair.patient == patient else pair.patient
+                for pair in check_patient(patient)
+            ]
+            if duplicates:
+                messages.warning(
+                    request,
+                    "This patient may already be registered: "
+                    + "; ".join(
+                        f"{other.get_full_name()} (born {other.date_of_birth})"
+                        for other in duplicates
+                    ),
+                )
             return redirect(reverse("patient_detail", args=[patient.pk]))
     else:
         form = PatientForm()
@@ -99,16 +111,9 @@ def patient_list(request):
     # Search functionality
     search_query = request.GET.get('search', '').strip()
     if search_query:
-        from django.db.models import Q
-        patients = patients.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone__icontains=search_query) |
-            Q(date_of_birth__icontains=search_query)
-        )
-    
-    patients = patients.order_by("last_name", "first_name")
+        patients = search_patients(patients, search_query, ranked=True)
+    else:
+        patients = patients.order_by("last_name", "first_name")
     
     # Pagination
     paginator = Paginator(patients, 10)  # 10 patients per page
@@ -124,3 +129,26 @@ def patient_list(request):
         "patients": patients,
         "search_query": search_query
     })
+
+
+@login_required
+def patient_search(request):
+    """Best matches for the patient pickers (patients/_patient_picker.html)."""
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse({"results": []})
+    patients = search_patients(
+        scope_queryset(Patient.objects.all(), request.user), query, ranked=True
+    ).only("first_name", "last_name", "date_of_birth")[:PICKER_RESULTS]
+    return JsonResponse(
+        {
+            "results": [
+                {
+                    "id": patient.pk,
+                    "name": str(patient),
+                    "date_of_birth": patient.date_of_birth.isoformat(),
+                }
+                for patient in patients
+            ]
+        }
+    )
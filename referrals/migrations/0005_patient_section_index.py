@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("referrals", "0004_alter_clinic_id_alter_referral_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="referral",
+            index=models.Index(
+                fields=["patient", "created_at", "id"],
+                name="referrals_r_patient_23deaa_idx",
+            ),
+        ),
+    ]
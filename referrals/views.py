@@ -49,14 +49,14 @@ def create_referral(request):
     else:
         clinics = scope_queryset(Clinic.objects.all(), request.user)
     
-    patients = scope_queryset(Patient.objects.all(), request.user)
-    
     if request.method == "POST":
         patient_id = request.POST.get("patient")
         from_clinic_id = request.POST.get("from_clinic")
         to_clinic_id = request.POST.get("to_clinic")
         notes = request.POST.get("notes", "")
-        patient = get_object_or_404(Patient, id=patient_id)
+        patient = get_object_or_404(
+            scope_queryset(Patient.objects.all(), request.user), id=patient_id
+        )
         from_clinic = get_object_or_404(Clinic, id=from_clinic_id)
         to_clinic = get_object_or_404(Clinic, id=to_clinic_id)
         Referral.objects.create(
@@ -77,7 +77,6 @@ def create_referral(request):
         "referrals/create.html",
         {
             "clinics": clinics,
-            "patients": patients,
             "patient": patient,
             "clinic_types": CLINIC_TYPES
         },